@@ -0,0 +1,40 @@
+import asyncio
+import redis.asyncio as redis
+import logging
+from app.config import redis_settings
+logger = logging.getLogger(__name__)
+
+
+class CacheRedisClient:
+    """Redis для кеша результатов LLM"""
+
+    def __init__(self):
+        self.client = redis.Redis(
+            host=redis_settings.REDIS_HOST,
+            port=redis_settings.REDIS_PORT,
+            password=redis_settings.REDIS_PASSWORD,
+            db=redis_settings.REDIS_DB,
+            decode_responses=True,
+            socket_connect_timeout=5
+        )
+
+    async def get(self, key: str) -> str | None:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await self.client.set(key, value, ex=ttl)
+
+    async def warm_up(self, connections: int) -> None:
+        """Открывает connections соединений пула заранее, чтобы первые запросы не ждали connect"""
+        await asyncio.gather(*(self.client.ping() for _ in range(connections)))
+
+    async def close(self):
+        """Закрывает соединение с Redis"""
+        try:
+            await self.client.close()
+            logger.info("CacheRedisClient connection closed")
+        except Exception as e:
+            logger.error(f"CacheRedisClient close error: {e}")
+
+
+cache_redis_client = CacheRedisClient()
@@ -1,3 +1,4 @@
+import asyncio
 import redis.asyncio as redis
 import logging
 from app.config import redis_settings
@@ -23,7 +24,7 @@ class SessionRedisClient:
         """Проверяет существование сессии в Redis"""
         try:
             exists = await self.client.exists(session_id)
-            logger.info(f"Session exists check: {session_id} -> {bool(exists)}")
+            logger.debug("Session exists check -> %s", bool(exists))
             return bool(exists)
         except redis.AuthenticationError as e:
             logger.error(f"Redis authentication failed: {e}")
@@ -32,9 +33,16 @@ class SessionRedisClient:
             logger.error(f"Redis connection error: {e}")
             raise
         except Exception as e:
-            logger.error(f"Session exists error {session_id}: {e}")
+            logger.error("Session exists error: %s", e)
             raise
 
+    async def ping(self) -> bool:
+        return await self.client.ping()
+
+    async def warm_up(self, connections: int) -> None:
+        """Открывает connections соединений пула заранее, чтобы первые запросы не ждали connect"""
+        await asyncio.gather(*(self.client.ping() for _ in range(connections)))
+
     async def close(self):
         """Закрывает соединение с Redis"""
         try:
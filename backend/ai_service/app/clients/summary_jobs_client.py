@@ -0,0 +1,112 @@
+import redis.asyncio as redis
+import logging
+from app.config import redis_settings, settings
+logger = logging.getLogger(__name__)
+
+# Канал, по которому реплики text_service сбрасывают закешированные GET-ответы
+NOTE_INVALIDATION_CHANNEL = "notes:invalidate"
+
+# Записывает summary, только если заметка существует и её токен summary_job совпадает с токеном задачи:
+# update заметки перезаписывает hash, и устаревший summary не попадёт в новую версию.
+# Ответ GET меняется, поэтому ETag заметки заменяется токеном задачи - он уникален для этой версии.
+# KEYS[1] - ключ заметки, ARGV[1] - токен, ARGV[2] - summary, ARGV[3] - канал инвалидации
+SET_SUMMARY_LUA = """
+if redis.call('HGET', KEYS[1], 'summary_job') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'summary', ARGV[2], 'etag', ARGV[1])
+redis.call('HDEL', KEYS[1], 'summary_job')
+redis.call('PUBLISH', ARGV[3], KEYS[1])
+return 1
+"""
+
+# Возвращает задачу в конец очереди и подтверждает старую запись. Stream не обрезается (MAXLEN выкинул бы
+# чужие необработанные задачи): если он всё же длиннее maxlen, задача снимается, а её токен стирается
+# из заметки, чтобы не остался висеть.
+# KEYS[1] - stream, KEYS[2] - ключ заметки; ARGV[1] - группа, ARGV[2] - id записи, ARGV[3] - maxlen,
+# ARGV[4] - токен задачи, ARGV[5..] - пары поле/значение задачи
+REQUEUE_LUA = """
+redis.call('XACK', KEYS[1], ARGV[1], ARGV[2])
+redis.call('XDEL', KEYS[1], ARGV[2])
+if redis.call('XLEN', KEYS[1]) >= tonumber(ARGV[3]) then
+    if redis.call('HGET', KEYS[2], 'summary_job') == ARGV[4] then
+        redis.call('HDEL', KEYS[2], 'summary_job')
+    end
+    return 0
+end
+redis.call('XADD', KEYS[1], '*', unpack(ARGV, 5))
+return 1
+"""
+
+
+class SummaryJobsClient:
+    """Очередь задач фоновой суммаризации (Redis Streams), которую наполняет text_service"""
+
+    def __init__(self, stream: str, group: str, maxlen: int):
+        self.stream = stream
+        self.group = group
+        self.maxlen = maxlen
+        self.client = redis.Redis(
+            host=redis_settings.REDIS_HOST,
+            port=redis_settings.REDIS_PORT,
+            password=redis_settings.REDIS_PASSWORD,
+            db=redis_settings.REDIS_DB,
+            decode_responses=True,
+            socket_connect_timeout=5
+        )
+        self._set_summary = self.client.register_script(SET_SUMMARY_LUA)
+        self._requeue = self.client.register_script(REQUEUE_LUA)
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def read(self, consumer: str, block_ms: int) -> list[tuple[str, dict]]:
+        """Новая задача для consumer; пустой список - за block_ms задач не было"""
+        response = await self.client.xreadgroup(
+            self.group, consumer, {self.stream: ">"}, count=1, block=block_ms
+        )
+        return response[0][1] if response else []
+
+    async def claim_stale(self, consumer: str, min_idle_ms: int) -> list[tuple[str, dict]]:
+        """Забирает задачу, которую другой consumer взял и не подтвердил (например, упал)"""
+        _, entries, *_ = await self.client.xautoclaim(
+            self.stream, self.group, consumer, min_idle_time=min_idle_ms, count=1
+        )
+        return [(entry_id, fields) for entry_id, fields in entries if fields]
+
+    async def ack(self, entry_id: str) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.group, entry_id)
+            pipe.xdel(self.stream, entry_id)
+            await pipe.execute()
+
+    async def requeue(self, entry_id: str, fields: dict) -> bool:
+        """Ставит задачу в конец очереди заново и подтверждает старую запись. False - очередь переполнена"""
+        args = [self.group, entry_id, self.maxlen, fields["job"]]
+        for k, v in fields.items():
+            args += [k, v]
+        requeued = await self._requeue(keys=[self.stream, fields["key"]], args=args)
+        return bool(requeued)
+
+    async def set_summary(self, key: str, job: str, summary: str) -> bool:
+        """False - заметку удалили или изменили, пока задача ждала"""
+        applied = await self._set_summary(keys=[key], args=[job, summary, NOTE_INVALIDATION_CHANNEL])
+        return bool(applied)
+
+    async def close(self):
+        try:
+            await self.client.close()
+            logger.info("SummaryJobsClient connection closed")
+        except Exception as e:
+            logger.error(f"SummaryJobsClient close error: {e}")
+
+
+summary_jobs_client = SummaryJobsClient(
+    stream=settings.summary_stream,
+    group=settings.summary_group,
+    maxlen=settings.summary_stream_maxlen
+)
@@ -0,0 +1,63 @@
+import httpx
+import logging
+from app.config import settings
+logger = logging.getLogger(__name__)
+
+
+class NoteAccessError(Exception):
+    """Заметка защищена паролем - её тело нельзя получить без проверки"""
+
+
+class NoteReadOnceError(Exception):
+    """Одноразовая заметка: её тело можно получить только вместе с удалением, суммаризация отказывает"""
+
+
+class NoteTooLargeError(Exception):
+    """Заметка длиннее summarize_max_chars"""
+
+
+class TextStorageClient:
+    """Читает тело заметки из text_service по ключу через GET /api/text/raw"""
+
+    def __init__(self, base_url: str, timeout: float, max_chars: int):
+        self.max_chars = max_chars
+        self.client = httpx.AsyncClient(base_url=base_url, timeout=timeout)
+
+    async def get_text(self, key: str) -> str | None:
+        """
+        None - заметки нет. Чтение без удаления (consume=false): одноразовую заметку text_service
+        не отдаёт (409), иначе любой, кто знает ключ, сжёг бы её через суммаризацию.
+        Тело читается потоком и обрывается, как только превысит max_chars.
+        """
+        params = {"key": key, "consume": "false"}
+        async with self.client.stream("GET", "/api/text/raw", params=params) as response:
+            if response.status_code == 404:
+                return None
+            if response.status_code == 403:
+                raise NoteAccessError(key)
+            if response.status_code == 409:
+                raise NoteReadOnceError(key)
+            response.raise_for_status()
+
+            parts = []
+            size = 0
+            async for chunk in response.aiter_text():
+                size += len(chunk)
+                if size > self.max_chars:
+                    raise NoteTooLargeError(key)
+                parts.append(chunk)
+        return "".join(parts)
+
+    async def close(self):
+        try:
+            await self.client.aclose()
+            logger.info("TextStorageClient connection closed")
+        except Exception as e:
+            logger.error(f"TextStorageClient close error: {e}")
+
+
+text_storage_client = TextStorageClient(
+    base_url=settings.text_service_url,
+    timeout=settings.text_service_timeout,
+    max_chars=settings.summarize_max_chars
+)
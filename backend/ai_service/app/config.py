@@ -6,6 +6,41 @@ class Settings(BaseSettings):
     openai_model: str = "gpt-4o-mini"
     app_env: str = "development"
     log_level: str = "INFO"
+    # Кеш проверки сессий в SessionMiddleware (секунды)
+    session_cache_ttl: float = 5.0
+    session_cache_negative_ttl: float = 1.0
+    session_cache_max_size: int = 10000
+    # Кеш результатов LLM
+    ai_cache_enabled: bool = True
+    ai_cache_ttl: int = 60 * 60 * 24
+    ai_cache_max_entries: int = 1000
+    # Суммаризация больших заметок (map-reduce)
+    text_service_url: str = "http://text_service:8000"
+    text_service_timeout: float = 30.0
+    summarize_max_chars: int = 1_000_000
+    summarize_chunk_tokens: int = 3000
+    summarize_chunk_overlap: int = 200
+    summarize_reduce_tokens: int = 6000
+    summarize_max_concurrency: int = 4
+    # Планировщик вызовов провайдера
+    ai_max_in_flight: int = 8
+    ai_max_queue: int = 100
+    ai_max_queue_wait: float = 10.0
+    ai_rpm: int = 500  # 0 - без лимита
+    ai_tpm: int = 200_000
+    ai_output_tokens_estimate: int = 512
+    # Фоновая суммаризация заметок с auto_summary (stream совпадает с AUTO_SUMMARY_STREAM в text_service)
+    summary_worker_enabled: bool = True
+    summary_stream: str = "notes:summary_jobs"
+    summary_group: str = "summarizers"
+    summary_stream_maxlen: int = 10000  # совпадает с AUTO_SUMMARY_STREAM_MAXLEN
+    summary_worker_concurrency: int = 2
+    summary_worker_block_ms: int = 5000
+    summary_claim_idle_ms: int = 60_000
+    summary_max_attempts: int = 3
+    # Старт: сколько соединений пулов Redis открыть до приёма трафика; таймаут проверок в /ready (секунды)
+    warmup_connections: int = 4
+    ready_probe_timeout: float = 1.0
 
     class Config:
         env_file = ".env"
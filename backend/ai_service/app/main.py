@@ -1,20 +1,136 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-import logging
-from app.routes.text import router
-from app.middleware.cookie_middleware import SessionMiddleware
-from app.clients.session_redis_client import session_redis_client
+from time import perf_counter
+
+# Отсчёт фазы import метрики ai_startup_seconds - до импорта fastapi и клиентов,
+# поэтому остальные импорты ниже намеренно не в начале модуля (E402)
+_import_start = perf_counter()
+
+import asyncio  # noqa: E402
+from contextlib import asynccontextmanager  # noqa: E402
+from fastapi import FastAPI, Request, Response  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
+import logging  # noqa: E402
+from app.routes.text import router, build_text_service  # noqa: E402
+from app.middleware.cookie_middleware import SessionMiddleware  # noqa: E402
+from app.clients.session_redis_client import session_redis_client  # noqa: E402
+from app.clients.cache_redis_client import cache_redis_client  # noqa: E402
+from app.clients.text_storage_client import text_storage_client  # noqa: E402
+from app.clients.summary_jobs_client import summary_jobs_client  # noqa: E402
+from app.services.summary_worker import SummaryWorker, default_consumer_name  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.responses import OrjsonResponse  # noqa: E402
+from app.health import probe  # noqa: E402
+from app.metrics import AI_STARTUP_SECONDS  # noqa: E402
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
+IMPORT_SECONDS = perf_counter() - _import_start
+
+
+async def load_text_service(app: FastAPI) -> None:
+    """
+    langchain и клиент модели грузятся в потоке уже после старта: /health отвечает сразу,
+    /ready - когда TextService создан и фоновый воркер запущен.
+    Сервис создаётся ровно один раз и хранится в app.state: роуты (get_text_service) и воркер
+    делят один кеш результатов и один планировщик вызовов.
+    """
+    start = perf_counter()
+    try:
+        service = await asyncio.to_thread(build_text_service)
+        AI_STARTUP_SECONDS.labels(phase="llm").set(perf_counter() - start)
+        if settings.summary_worker_enabled:
+            app.state.summary_worker = SummaryWorker(
+                jobs=summary_jobs_client,
+                service=service,
+                storage=text_storage_client,
+                consumer=default_consumer_name(),
+                concurrency=settings.summary_worker_concurrency,
+                block_ms=settings.summary_worker_block_ms,
+                claim_idle_ms=settings.summary_claim_idle_ms,
+                max_attempts=settings.summary_max_attempts
+            )
+            await app.state.summary_worker.start()
+        app.state.text_service = service
+    except Exception:
+        logger.exception("TextService startup failed")
+        return
+    logger.info("LLM stack loaded in %.3fs", perf_counter() - start)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    AI_STARTUP_SECONDS.labels(phase="import").set(IMPORT_SECONDS)
+    app.state.summary_worker = None
+    app.state.text_service = None
+
+    start = perf_counter()
+    results = await asyncio.gather(
+        session_redis_client.warm_up(settings.warmup_connections),
+        cache_redis_client.warm_up(settings.warmup_connections),
+        return_exceptions=True
+    )
+    for result in results:
+        # Redis недоступен при старте - сервис всё равно поднимается, /ready ответит 503
+        if isinstance(result, Exception):
+            logger.warning("Connection warm-up failed: %s", result)
+    warmup_seconds = perf_counter() - start
+    AI_STARTUP_SECONDS.labels(phase="warmup").set(warmup_seconds)
+
+    loader = asyncio.create_task(load_text_service(app))
+    app.state.ready = True
+    logger.info("Startup complete: import=%.3fs warmup=%.3fs", IMPORT_SECONDS, warmup_seconds)
+    yield
+
+    app.state.ready = False
+    logger.info("Shutting down...")
+    loader.cancel()
+    await asyncio.gather(loader, return_exceptions=True)
+    if app.state.summary_worker is not None:
+        await app.state.summary_worker.stop()
+    await session_redis_client.close()
+    await cache_redis_client.close()
+    await text_storage_client.close()
+    await summary_jobs_client.close()
+    logger.info("All connections closed")
+
+
 app = FastAPI(
     title="Text Service",
     description="Service for storing and retrieving texts",
     version="1.0.0",
-    redoc_url=None
+    redoc_url=None,
+    default_response_class=OrjsonResponse,
+    lifespan=lifespan
 )
 app.include_router(router)
 
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    """Liveness: процесс жив и обслуживает event loop, зависимости не проверяются"""
+    return {"status": "ok"}
+
+
+@app.get("/ready", include_in_schema=False)
+async def ready(request: Request):
+    """Readiness: старт завершён, LLM-стек загружен и Redis отвечает"""
+    state = request.app.state
+    checks = {
+        "redis": await probe(session_redis_client.ping, settings.ready_probe_timeout),
+        "llm": {"ok": getattr(state, "text_service", None) is not None},
+    }
+    is_ready = getattr(state, "ready", False) and all(check["ok"] for check in checks.values())
+    return OrjsonResponse(
+        {"status": "ready" if is_ready else "not_ready", "checks": checks},
+        status_code=200 if is_ready else 503
+    )
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -26,13 +142,8 @@ app.add_middleware(
 app.add_middleware(
     SessionMiddleware,
     session_redis=session_redis_client,
-    exclude_paths=["/docs", "/openapi.json", "/health"]
+    exclude_paths=["/docs", "/openapi.json", "/health", "/ready", "/metrics"],
+    cache_ttl=settings.session_cache_ttl,
+    negative_cache_ttl=settings.session_cache_negative_ttl,
+    cache_max_size=settings.session_cache_max_size
 )
-
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Shutting down...")
-    await session_redis_client.close()
-    logger.info("All connections closed")
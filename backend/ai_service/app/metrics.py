@@ -0,0 +1,116 @@
+from functools import wraps
+from time import perf_counter
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 50000, 100000)
+
+
+def timed(child):
+    """Длительность async-вызова пишется в заранее привязанный (.labels(...)) child гистограммы"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                child.observe(perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+AI_CHAIN_SECONDS = Histogram(
+    "ai_chain_seconds",
+    "Correction/summarization call latency, cache hits included",
+    ["chain"],
+    buckets=LATENCY_BUCKETS
+)
+
+AI_INPUT_CHARS = Histogram(
+    "ai_input_chars",
+    "Input text length in characters",
+    ["chain"],
+    buckets=SIZE_BUCKETS
+)
+
+AI_STREAM_FIRST_CHUNK_SECONDS = Histogram(
+    "ai_stream_first_chunk_seconds",
+    "Time to the first streamed chunk from the LLM",
+    ["chain"],
+    buckets=LATENCY_BUCKETS
+)
+
+AI_STREAMS_CANCELLED = Counter(
+    "ai_streams_cancelled_total",
+    "Streaming generations stopped because the client went away"
+)
+
+AI_SUMMARY_CHUNKS = Histogram(
+    "ai_summary_chunks",
+    "Chunks per map-reduce summarization",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+AI_QUEUE_WAIT_SECONDS = Histogram(
+    "ai_queue_wait_seconds",
+    "Time a request waited for an upstream slot",
+    buckets=LATENCY_BUCKETS
+)
+
+AI_QUEUE_DEPTH = Gauge(
+    "ai_queue_depth",
+    "Requests waiting for an upstream slot"
+)
+
+AI_UPSTREAM_IN_FLIGHT = Gauge(
+    "ai_upstream_in_flight",
+    "LLM calls currently running"
+)
+
+AI_UPSTREAM_LIMIT = Gauge(
+    "ai_upstream_limit",
+    "Current adaptive limit of concurrent LLM calls"
+)
+
+AI_SHED_TOTAL = Counter(
+    "ai_shed_total",
+    "Requests rejected with 429 before reaching the provider",
+    ["reason"]
+)
+
+AI_CACHE_REQUESTS = Counter(
+    "ai_cache_requests_total",
+    "LLM result cache lookups: lru_hit, redis_hit, coalesced, miss",
+    ["result"]
+)
+
+AI_CACHE_SAVED_SECONDS = Counter(
+    "ai_cache_saved_seconds_total",
+    "Upstream LLM latency avoided by cache hits"
+)
+
+SESSION_CHECK_SECONDS = Histogram(
+    "ai_session_check_seconds",
+    "Session validation latency in SessionMiddleware",
+    ["source"],
+    buckets=LATENCY_BUCKETS
+)
+
+AI_SUMMARY_JOBS = Counter(
+    "ai_summary_jobs_total",
+    "Background summary jobs by outcome",
+    ["result"]
+)
+
+AI_SUMMARY_JOB_LAG_SECONDS = Histogram(
+    "ai_summary_job_lag_seconds",
+    "Time from enqueueing a summary job to its summary being stored",
+    buckets=LATENCY_BUCKETS
+)
+
+AI_STARTUP_SECONDS = Gauge(
+    "ai_startup_seconds",
+    "Startup duration by phase: import - app modules, warmup - Redis pools, llm - langchain stack and TextService",
+    ["phase"]
+)
@@ -1,59 +1,131 @@
 import logging
-from fastapi import Request, status
+import time
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Receive, Scope, Send
 from app.clients.session_redis_client import SessionRedisClient
+from app.metrics import SESSION_CHECK_SECONDS
 
 logger = logging.getLogger(__name__)
 
+_CHECK_CACHE = SESSION_CHECK_SECONDS.labels(source="cache")
+_CHECK_REDIS = SESSION_CHECK_SECONDS.labels(source="redis")
 
-class SessionMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, session_redis: SessionRedisClient, exclude_paths: list = None):
-        super().__init__(app)
+
+def _get_cookie(scope: Scope, name: str) -> str | None:
+    for header, value in scope["headers"]:
+        if header == b"cookie":
+            return cookie_parser(value.decode("latin-1")).get(name)
+    return None
+
+
+class SessionCache:
+    """
+    Короткоживущий кеш результатов проверки сессии.
+    Валидная сессия может приниматься ещё до ttl секунд после удаления из Redis -
+    это граница устаревания. Невалидные сессии кешируются на negative_ttl.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, max_size: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries: dict[str, tuple[bool, float]] = {}
+
+    def get(self, session_id: str) -> bool | None:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        valid, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[session_id]
+            return None
+        return valid
+
+    def put(self, session_id: str, valid: bool) -> None:
+        ttl = self.ttl if valid else self.negative_ttl
+        if ttl <= 0:
+            return
+        if len(self._entries) >= self.max_size:
+            # dict хранит порядок вставки - выбрасываем самую старую запись
+            del self._entries[next(iter(self._entries))]
+        self._entries[session_id] = (valid, time.monotonic() + ttl)
+
+
+class SessionMiddleware:
+    def __init__(
+            self,
+            app: ASGIApp,
+            session_redis: SessionRedisClient,
+            exclude_paths: list = None,
+            cache_ttl: float = 5.0,
+            negative_cache_ttl: float = 1.0,
+            cache_max_size: int = 10000
+    ):
+        self.app = app
         self.session_redis = session_redis
-        self.exclude_paths = exclude_paths or [
+        self.exclude_paths = frozenset(exclude_paths or [
             "/docs",
             "/openapi.json",
             "/health",
             "/metrics"
-        ]
+        ])
+        self.session_cache = SessionCache(cache_ttl, negative_cache_ttl, cache_max_size)
+
+    async def _session_exists(self, session_id: str) -> bool:
+        start = time.perf_counter()
+        valid = self.session_cache.get(session_id)
+        if valid is not None:
+            _CHECK_CACHE.observe(time.perf_counter() - start)
+            return valid
+        valid = await self.session_redis.exists(session_id)
+        self.session_cache.put(session_id, valid)
+        _CHECK_REDIS.observe(time.perf_counter() - start)
+        return valid
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        path = scope["path"]
 
-    async def dispatch(self, request: Request, call_next):
         # Пропускаем исключенные пути
-        if request.url.path in self.exclude_paths:
-            return await call_next(request)
+        if path in self.exclude_paths:
+            return await self.app(scope, receive, send)
 
         # Получаем session cookie
-        session_id = request.cookies.get("session")
+        session_id = _get_cookie(scope, "session")
 
         if not session_id:
-            logger.warning(f"No session cookie for {request.url.path}")
-            return JSONResponse(
+            logger.warning("No session cookie for %s", path)
+            response = JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 content={"detail": "Authentication required"}
             )
+            return await response(scope, receive, send)
 
         # Проверяем сессию
         try:
-            exists = await self.session_redis.exists(session_id)
-
-            if not exists:
-                logger.warning(f"Invalid session: {session_id}")
-                return JSONResponse(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    content={"detail": "Session expired or invalid"}
-                )
-
-            # Сохраняем session_id для использования в эндпоинтах
-            request.state.session_id = session_id
-            logger.info(f"Valid session: {session_id} for path: {request.url.path}")
-
-            response = await call_next(request)
-            return response
-
+            exists = await self._session_exists(session_id)
         except Exception as e:
-            logger.error(f"Session validation error: {e}", exc_info=True)
-            return JSONResponse(
+            logger.error("Session validation error: %s", e, exc_info=True)
+            response = JSONResponse(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 content={"detail": "Session service unavailable"}
-            )
\ No newline at end of file
+            )
+            return await response(scope, receive, send)
+
+        if not exists:
+            logger.warning("Invalid session for %s", path)
+            response = JSONResponse(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                content={"detail": "Session expired or invalid"}
+            )
+            return await response(scope, receive, send)
+
+        # Сохраняем session_id для использования в эндпоинтах
+        scope.setdefault("state", {})["session_id"] = session_id
+        logger.debug("Valid session for path: %s", path)
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,30 @@
+from typing import Any, Awaitable, Callable
+
+import orjson
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON-ответ, закодированный orjson: быстрее json.dumps и сразу в bytes"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    Потоковый ответ, который всегда вызывает on_close - даже если тело не начали отдавать:
+    клиент отключился до первого куска или не удалось отправить заголовки.
+    background в этих случаях не запускается, а незапущенный генератор тела свой finally не выполнит.
+    """
+
+    def __init__(self, content, on_close: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
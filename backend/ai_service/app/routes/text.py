@@ -1,30 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, ConfigDict
+from typing import AsyncIterator
+import json
+import logging
 from app.services.text_service import TextService
-from functools import lru_cache
+from app.services.result_cache import ResultCache
+from app.services.scheduler import UpstreamScheduler, SchedulerOverloaded
+from app.clients.cache_redis_client import cache_redis_client
+from app.clients.text_storage_client import (
+    TextStorageClient,
+    NoteAccessError,
+    NoteReadOnceError,
+    NoteTooLargeError,
+    text_storage_client
+)
+from app.config import settings
+from app.responses import ClosingStreamingResponse
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/text", tags=["Text AI"])
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # nginx не должен буферизовать поток
+    "X-Accel-Buffering": "no",
+}
+
 class TextRequest(BaseModel):
     model_config = ConfigDict(str_strip_whitespace=True)
     text: str = Field(..., min_length=1, max_length=10_000)
 
 
-@lru_cache
-def get_text_service() -> TextService:
-    return TextService()
+class NoteSummaryRequest(BaseModel):
+    key: str = Field(..., min_length=1)
+
+
+def build_text_service() -> TextService:
+    """Единственный TextService процесса создаёт lifespan (app.main); роуты получают его через get_text_service"""
+    cache = ResultCache(
+        redis=cache_redis_client,
+        ttl=settings.ai_cache_ttl,
+        max_entries=settings.ai_cache_max_entries,
+        model=settings.openai_model,
+        enabled=settings.ai_cache_enabled
+    )
+    scheduler = UpstreamScheduler(
+        max_in_flight=settings.ai_max_in_flight,
+        max_queue=settings.ai_max_queue,
+        max_wait=settings.ai_max_queue_wait,
+        rpm=settings.ai_rpm,
+        tpm=settings.ai_tpm
+    )
+    return TextService(cache=cache, scheduler=scheduler)
+
+
+def get_text_service(request: Request) -> TextService:
+    # Тот же экземпляр, что у фонового воркера: общий кеш результатов и лимит вызовов провайдера
+    service = getattr(request.app.state, "text_service", None)
+    if service is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Service is starting")
+    return service
+
+
+def get_text_storage_client() -> TextStorageClient:
+    return text_storage_client
+
+
+def _too_many_requests(e: SchedulerOverloaded) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="AI service is busy, retry later",
+        headers={"Retry-After": e.retry_after_header}
+    )
 
 
 @router.post("/text_correction", status_code=status.HTTP_200_OK)
 async def text_correction(
     request: TextRequest, 
+    http_request: Request,
     service: TextService = Depends(get_text_service)):
 
     try:
-        result = await service.text_correction(request.text)
+        result = await service.text_correction(request.text, http_request.state.session_id)
         return {"result": result}
     except HTTPException:
         raise
+    except SchedulerOverloaded as e:
+        raise _too_many_requests(e)
     except Exception as e:
         print(f"!!! OPENAI ERROR: {str(e)}")
         raise HTTPException(status_code=500, detail="AI processing failed")
@@ -32,17 +96,104 @@ async def text_correction(
 @router.post("/text_summarization", status_code=status.HTTP_200_OK)
 async def text_summarization(
     request: TextRequest,
+    http_request: Request,
     service: TextService = Depends(get_text_service)):
     
     try:
-        result = await service.text_summarization(request.text)
+        result = await service.text_summarization(request.text, http_request.state.session_id)
         return {"result": result}
     except HTTPException:
         raise
+    except SchedulerOverloaded as e:
+        raise _too_many_requests(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI processing failed: {str(e)}")
     
 
+@router.post("/summarize_note", status_code=status.HTTP_200_OK)
+async def summarize_note(
+    request: NoteSummaryRequest,
+    http_request: Request,
+    service: TextService = Depends(get_text_service),
+    storage: TextStorageClient = Depends(get_text_storage_client)):
+    """Суммаризация заметки по ключу; тело берётся из text_service, длина не ограничена 10 000 символами"""
+    try:
+        text = await storage.get_text(request.key)
+    except NoteAccessError:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Note is password protected")
+    except NoteReadOnceError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Read-once note can't be summarized")
+    except NoteTooLargeError:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Note is too large")
+    except Exception as e:
+        logger.error("Text storage error: %s", e)
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Text storage unavailable")
+    if text is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Text not found")
+
+    try:
+        result = await service.note_summarization(text, http_request.state.session_id)
+        return {"result": result}
+    except SchedulerOverloaded as e:
+        raise _too_many_requests(e)
+    except Exception as e:
+        logger.error("AI processing failed: %s", e)
+        raise HTTPException(status_code=500, detail="AI processing failed")
+
+
+async def _sse(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Server-Sent Events: data-событие на каждый кусок текста, в конце event: done.
+    При отключении клиента Starlette отменяет эту корутину, отмена доходит до astream.
+    """
+    try:
+        async for chunk in chunks:
+            yield f"data: {json.dumps({'delta': chunk}, ensure_ascii=False)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    except Exception as e:
+        # Статус 200 уже отправлен - ошибку можно сообщить только событием
+        logger.error("AI stream failed: %s", e)
+        yield f"event: error\ndata: {json.dumps({'detail': 'AI processing failed'})}\n\n"
+    finally:
+        await chunks.aclose()
+
+
+@router.post("/text_correction/stream", response_class=StreamingResponse)
+async def text_correction_stream(
+    request: TextRequest,
+    http_request: Request,
+    service: TextService = Depends(get_text_service)):
+
+    try:
+        chunks = await service.text_correction_stream(request.text, http_request.state.session_id)
+    except SchedulerOverloaded as e:
+        raise _too_many_requests(e)
+    return ClosingStreamingResponse(
+        _sse(chunks),
+        on_close=chunks.aclose,
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+@router.post("/text_summarization/stream", response_class=StreamingResponse)
+async def text_summarization_stream(
+    request: TextRequest,
+    http_request: Request,
+    service: TextService = Depends(get_text_service)):
+
+    try:
+        chunks = await service.text_summarization_stream(request.text, http_request.state.session_id)
+    except SchedulerOverloaded as e:
+        raise _too_many_requests(e)
+    return ClosingStreamingResponse(
+        _sse(chunks),
+        on_close=chunks.aclose,
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
 @router.post("/hello", status_code=status.HTTP_200_OK)
 async def hello():
     try:
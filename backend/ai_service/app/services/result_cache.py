@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from app.metrics import AI_CACHE_REQUESTS, AI_CACHE_SAVED_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_LRU_HIT = AI_CACHE_REQUESTS.labels(result="lru_hit")
+_REDIS_HIT = AI_CACHE_REQUESTS.labels(result="redis_hit")
+_COALESCED = AI_CACHE_REQUESTS.labels(result="coalesced")
+_MISS = AI_CACHE_REQUESTS.labels(result="miss")
+
+
+def normalize_text(text: str) -> str:
+    """Одинаковый по смыслу ввод даёт одинаковый ключ: NFC, \\n вместо \\r\\n, без краевых пробелов"""
+    return unicodedata.normalize("NFC", text).replace("\r\n", "\n").strip()
+
+
+class ResultCache:
+    """
+    Кеш результатов LLM по SHA-256 от (операция, модель, версия промпта, текст).
+    Порядок: LRU в процессе -> запрос, уже выполняющийся в этом процессе -> Redis -> вызов модели.
+    Одинаковые одновременные запросы ждут один общий вызов (single-flight).
+    Ошибки Redis не ломают запрос - кеш просто пропускается.
+    """
+
+    def __init__(self, redis, ttl: int, max_entries: int, model: str, enabled: bool = True):
+        self.redis = redis
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.model = model
+        self.enabled = enabled
+        # key -> (результат, время вызова модели)
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    def key(self, operation: str, prompt_version: str, text: str) -> str:
+        digest = hashlib.sha256()
+        for part in (operation, self.model, prompt_version, normalize_text(text)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return f"ai:result:{digest.hexdigest()}"
+
+    async def get_or_compute(
+            self,
+            operation: str,
+            prompt_version: str,
+            text: str,
+            compute: Callable[[], Awaitable[str]]
+    ) -> str:
+        if not self.enabled:
+            return await compute()
+
+        key = self.key(operation, prompt_version, text)
+
+        result = self._lookup_local(key)
+        if result is not None:
+            return result
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            _COALESCED.inc()
+        else:
+            task = asyncio.create_task(self._load(key, compute))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shield: отмена одного ожидающего не отменяет общий вызов для остальных
+        return await asyncio.shield(task)
+
+    async def lookup(self, key: str) -> str | None:
+        """LRU, затем Redis; None - промах (он же учитывается в метриках)"""
+        if not self.enabled:
+            return None
+        result = self._lookup_local(key)
+        if result is None:
+            result = await self._lookup_redis(key)
+        if result is None:
+            _MISS.inc()
+        return result
+
+    async def store(self, key: str, result: str, latency: float) -> None:
+        """Сохраняет результат, полученный в обход get_or_compute (например, потоком)"""
+        if not self.enabled:
+            return
+        self._put(key, result, latency)
+        try:
+            await self.redis.set(key, json.dumps({"result": result, "latency": latency}), self.ttl)
+        except Exception as e:
+            logger.warning("AI cache write failed: %s", e)
+
+    def _lookup_local(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        _LRU_HIT.inc()
+        AI_CACHE_SAVED_SECONDS.inc(entry[1])
+        return entry[0]
+
+    async def _lookup_redis(self, key: str) -> str | None:
+        try:
+            cached = await self.redis.get(key)
+        except Exception as e:
+            logger.warning("AI cache read failed: %s", e)
+            return None
+        if cached is None:
+            return None
+        data = json.loads(cached)
+        _REDIS_HIT.inc()
+        AI_CACHE_SAVED_SECONDS.inc(data["latency"])
+        self._put(key, data["result"], data["latency"])
+        return data["result"]
+
+    async def _load(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        cached = await self._lookup_redis(key)
+        if cached is not None:
+            return cached
+
+        _MISS.inc()
+        start = time.perf_counter()
+        result = await compute()
+        await self.store(key, result, time.perf_counter() - start)
+        return result
+
+    def _put(self, key: str, result: str, latency: float) -> None:
+        self._entries[key] = (result, latency)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,209 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from app.metrics import (
+    AI_QUEUE_WAIT_SECONDS,
+    AI_QUEUE_DEPTH,
+    AI_UPSTREAM_IN_FLIGHT,
+    AI_UPSTREAM_LIMIT,
+    AI_SHED_TOTAL
+)
+
+_SHED_QUEUE_FULL = AI_SHED_TOTAL.labels(reason="queue_full")
+_SHED_DEADLINE = AI_SHED_TOTAL.labels(reason="deadline")
+_SHED_TIMEOUT = AI_SHED_TOTAL.labels(reason="timeout")
+
+
+class SchedulerOverloaded(Exception):
+    """Запрос отклонён до обращения к провайдеру; retry_after - через сколько секунд стоит повторить"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Upstream overloaded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Ответ провайдера 429 (openai.RateLimitError и подобные несут status_code)"""
+    return getattr(error, "status_code", None) == 429
+
+
+class TokenBucket:
+    """Лимит в единицах в минуту (RPM/TPM); запас - не больше минутного объёма. 0 - без лимита"""
+
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: int) -> float:
+        """Сколько секунд ждать, пока в ведре наберётся amount"""
+        if self.rate == 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def consume(self, amount: int) -> None:
+        if self.rate:
+            self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("future", "session", "tokens", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, session: str, tokens: int):
+        self.future = future
+        self.session = session
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+
+
+class UpstreamScheduler:
+    """
+    Допуск запросов к провайдеру LLM:
+    - не больше limit одновременных вызовов; limit адаптивный (AIMD): 429 от провайдера делит его пополам,
+      каждый успешный вызов понемногу возвращает к max_in_flight;
+    - ожидающие стоят в очередях по сессиям, слоты раздаются по кругу, чтобы одна сессия не занимала всё;
+    - запросы и токены ограничены ведрами RPM/TPM;
+    - очередь ограничена max_queue, а запрос, который по оценке не дождётся слота за max_wait,
+      отклоняется сразу (SchedulerOverloaded -> 429 с Retry-After).
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, max_wait: float, rpm: int, tpm: int):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._limit = float(max_in_flight)
+        self._in_flight = 0
+        self._queued = 0
+        # session -> очередь; порядок ключей - порядок обхода по кругу
+        self._queues: OrderedDict[str, deque[_Waiter]] = OrderedDict()
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._timer: asyncio.TimerHandle | None = None
+        # Скользящая средняя длительности вызова для оценки ожидания
+        self._service_time = 1.0
+        AI_UPSTREAM_LIMIT.set(self._limit)
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self._limit))
+
+    def estimate_wait(self, tokens: int) -> float:
+        rounds = (self._queued + 1) / self.limit if self._in_flight >= self.limit else 0
+        rate_delay = max(self._requests.delay(self._queued + 1), self._tokens.delay(tokens))
+        return rounds * self._service_time + rate_delay
+
+    async def acquire(self, session: str | None, tokens: int) -> None:
+        session = session or ""
+        if not self._queued and self._in_flight < self.limit and self._rate_delay(tokens) == 0:
+            self._grant(tokens)
+            AI_QUEUE_WAIT_SECONDS.observe(0)
+            return
+
+        if self._queued >= self.max_queue:
+            _SHED_QUEUE_FULL.inc()
+            raise SchedulerOverloaded(self.estimate_wait(tokens))
+        estimate = self.estimate_wait(tokens)
+        if estimate > self.max_wait:
+            _SHED_DEADLINE.inc()
+            raise SchedulerOverloaded(estimate)
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), session, tokens)
+        self._queues.setdefault(session, deque()).append(waiter)
+        self._queued += 1
+        AI_QUEUE_DEPTH.set(self._queued)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.max_wait)
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Слот уже выдан, но ждущий ушёл - возвращаем его
+                self.release()
+            else:
+                waiter.future.cancel()
+                self._remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                _SHED_TIMEOUT.inc()
+                raise SchedulerOverloaded(self.estimate_wait(tokens))
+            raise
+        AI_QUEUE_WAIT_SECONDS.observe(time.monotonic() - waiter.enqueued_at)
+
+    def release(self, duration: float | None = None, rate_limited: bool = False) -> None:
+        self._in_flight -= 1
+        AI_UPSTREAM_IN_FLIGHT.set(self._in_flight)
+        if rate_limited:
+            self._limit = max(1.0, self._limit / 2)
+        elif duration is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * duration
+            self._limit = min(float(self.max_in_flight), self._limit + 1 / self._limit)
+        AI_UPSTREAM_LIMIT.set(self._limit)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, session: str | None, tokens: int):
+        await self.acquire(session, tokens)
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.release(rate_limited=is_rate_limited(e))
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.release(duration=time.monotonic() - start)
+
+    def _rate_delay(self, tokens: int) -> float:
+        return max(self._requests.delay(1), self._tokens.delay(tokens))
+
+    def _grant(self, tokens: int) -> None:
+        self._requests.consume(1)
+        self._tokens.consume(tokens)
+        self._in_flight += 1
+        AI_UPSTREAM_IN_FLIGHT.set(self._in_flight)
+
+    def _dispatch(self) -> None:
+        while self._queues and self._in_flight < self.limit:
+            session, queue = next(iter(self._queues.items()))
+            waiter = queue[0]
+            delay = self._rate_delay(waiter.tokens)
+            if delay > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+                return
+            queue.popleft()
+            self._queued -= 1
+            # Сессия уходит в конец круга
+            del self._queues[session]
+            if queue:
+                self._queues[session] = queue
+            self._grant(waiter.tokens)
+            waiter.future.set_result(None)
+        AI_QUEUE_DEPTH.set(self._queued)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _remove(self, waiter: _Waiter) -> None:
+        queue = self._queues.get(waiter.session)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self._queued -= 1
+        if not queue:
+            del self._queues[waiter.session]
+        AI_QUEUE_DEPTH.set(self._queued)
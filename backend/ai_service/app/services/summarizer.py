@@ -0,0 +1,119 @@
+import asyncio
+from typing import TYPE_CHECKING, Awaitable, Callable
+
+from app.metrics import AI_SUMMARY_CHUNKS
+
+# langchain и tiktoken импортируются при создании суммаризатора и первом разбиении, а не при старте сервиса
+if TYPE_CHECKING:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+def tiktoken_counter(model: str) -> Callable[[str], int]:
+    import tiktoken
+
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+class MapReduceSummarizer:
+    """
+    Суммаризация текстов длиннее одного запроса к модели:
+    map - текст режется на куски по chunk_tokens токенов, каждый суммаризируется (не более max_concurrency одновременно);
+    collapse - если частичные итоги вместе длиннее reduce_tokens, они группируются и сжимаются повторно;
+    reduce - оставшиеся итоги сводятся в одно резюме.
+    """
+
+    def __init__(
+            self,
+            llm,
+            model: str,
+            chunk_tokens: int,
+            chunk_overlap: int,
+            reduce_tokens: int,
+            max_concurrency: int,
+            count_tokens: Callable[[str], int] | None = None
+    ):
+        self.model = model
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.reduce_tokens = reduce_tokens
+        self.max_concurrency = max_concurrency
+        # Кодировка tiktoken загружается при первом использовании, а не при старте
+        self._count_tokens = count_tokens
+        self._splitter: "RecursiveCharacterTextSplitter | None" = None
+
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_core.output_parsers import StrOutputParser
+
+        map_prompt = ChatPromptTemplate.from_template(
+            "Summarize this part of a longer text in a few sentences. "
+            "Keep names, numbers and key facts:\n\n{text}"
+        )
+        self.map_chain = map_prompt | llm | StrOutputParser()
+
+        reduce_prompt = ChatPromptTemplate.from_template(
+            "The following are summaries of consecutive parts of one text. "
+            "Combine them into 2-3 clear, concise sentences:\n\n{text}"
+        )
+        self.reduce_chain = reduce_prompt | llm | StrOutputParser()
+
+    def count_tokens(self, text: str) -> int:
+        if self._count_tokens is None:
+            self._count_tokens = tiktoken_counter(self.model)
+        return self._count_tokens(text)
+
+    def split(self, text: str) -> list[str]:
+        if self._splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+            self._splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_tokens,
+                chunk_overlap=self.chunk_overlap,
+                length_function=self.count_tokens
+            )
+        return self._splitter.split_text(text)
+
+    async def summarize(self, text: str, invoke: Callable[..., Awaitable[str]] | None = None) -> str:
+        """invoke(chain, text) - вызов цепочки; по умолчанию chain.ainvoke, можно пропустить через планировщик"""
+        invoke = invoke or self._invoke
+        chunks = self.split(text)
+        AI_SUMMARY_CHUNKS.observe(len(chunks))
+        summaries = await self._map(chunks, invoke)
+
+        while len(summaries) > 1 and self.count_tokens("\n\n".join(summaries)) > self.reduce_tokens:
+            groups = self._group(summaries)
+            if len(groups) == len(summaries):
+                # Каждый итог уже сам по себе на пределе - группировка не сократит их число
+                break
+            summaries = await self._map(["\n\n".join(group) for group in groups], invoke)
+
+        return await invoke(self.reduce_chain, "\n\n".join(summaries))
+
+    async def _map(self, texts: list[str], invoke) -> list[str]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(text: str) -> str:
+            async with semaphore:
+                return await invoke(self.map_chain, text)
+
+        return await asyncio.gather(*(run(text) for text in texts))
+
+    @staticmethod
+    async def _invoke(chain, text: str) -> str:
+        return await chain.ainvoke({"text": text})
+
+    def _group(self, summaries: list[str]) -> list[list[str]]:
+        """Соседние итоги объединяются в группы не длиннее reduce_tokens"""
+        groups: list[list[str]] = [[]]
+        size = 0
+        for summary in summaries:
+            tokens = self.count_tokens(summary)
+            if groups[-1] and size + tokens > self.reduce_tokens:
+                groups.append([])
+                size = 0
+            groups[-1].append(summary)
+            size += tokens
+        return groups
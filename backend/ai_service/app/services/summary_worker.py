@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+
+from app.clients.text_storage_client import NoteAccessError, NoteReadOnceError, NoteTooLargeError
+from app.metrics import AI_SUMMARY_JOBS, AI_SUMMARY_JOB_LAG_SECONDS
+from app.services.scheduler import SchedulerOverloaded
+
+logger = logging.getLogger(__name__)
+
+_DONE = AI_SUMMARY_JOBS.labels(result="done")
+_STALE = AI_SUMMARY_JOBS.labels(result="stale")
+_RETRIED = AI_SUMMARY_JOBS.labels(result="retried")
+_FAILED = AI_SUMMARY_JOBS.labels(result="failed")
+
+
+def default_consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class SummaryWorker:
+    """
+    Пул фоновых обработчиков задач auto_summary из Redis Streams.
+    Задача: key, job (токен), creator; тело заметки читается из text_service без удаления (storage).
+    Summary пишется прямо в hash заметки, если её не удалили и не перезаписали.
+    Упавшая задача возвращается в очередь до max_attempts раз,
+    задачу упавшего процесса забирает другой consumer через claim_idle_ms.
+    """
+
+    def __init__(
+            self,
+            jobs,
+            service,
+            storage,
+            consumer: str,
+            concurrency: int,
+            block_ms: int,
+            claim_idle_ms: int,
+            max_attempts: int
+    ):
+        self.jobs = jobs
+        self.service = service
+        self.storage = storage
+        self.consumer = consumer
+        self.concurrency = concurrency
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_attempts = max_attempts
+        self._tasks: list[asyncio.Task] = []
+        self._running = False
+
+    async def start(self) -> None:
+        await self.jobs.ensure_group()
+        self._running = True
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        logger.info("Summary worker started: consumer=%s concurrency=%d", self.consumer, self.concurrency)
+
+    async def stop(self) -> None:
+        # Флаг на случай, если отмену проглотит блокирующий вызов клиента Redis
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        # Незавершённые задачи остаются неподтверждёнными и будут забраны повторно
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self) -> None:
+        while self._running:
+            try:
+                entries = await self.jobs.read(self.consumer, self.block_ms)
+                if not entries:
+                    entries = await self.jobs.claim_stale(self.consumer, self.claim_idle_ms)
+                for entry_id, fields in entries:
+                    await self.process(entry_id, fields)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Summary worker error: %s", e)
+                await asyncio.sleep(1)
+
+    async def process(self, entry_id: str, fields: dict) -> None:
+        attempt = int(fields.get("attempt", 0))
+        try:
+            text = await self.storage.get_text(fields["key"])
+            if text is None:
+                # Заметку удалили, пока задача ждала
+                _STALE.inc()
+                await self.jobs.ack(entry_id)
+                return
+            result = await self.service.note_summarization(text, fields.get("creator"))
+        except SchedulerOverloaded as e:
+            # Перегрузка - не ошибка задачи: ждём и ставим её обратно без увеличения attempt
+            await asyncio.sleep(e.retry_after)
+            await self._requeue(entry_id, fields)
+            return
+        except (NoteAccessError, NoteReadOnceError, NoteTooLargeError) as e:
+            # Заметку изменили после постановки задачи - повтор не поможет
+            logger.warning("Summary job skipped key=%s: %s", fields.get("key"), type(e).__name__)
+            _FAILED.inc()
+            await self.jobs.ack(entry_id)
+            return
+        except Exception as e:
+            if attempt + 1 >= self.max_attempts:
+                logger.error("Summary job failed key=%s attempts=%d: %s", fields.get("key"), attempt + 1, e)
+                _FAILED.inc()
+                await self.jobs.ack(entry_id)
+                return
+            logger.warning("Summary job retry key=%s attempt=%d: %s", fields.get("key"), attempt + 1, e)
+            _RETRIED.inc()
+            await asyncio.sleep(min(2 ** attempt, 30))
+            await self._requeue(entry_id, {**fields, "attempt": attempt + 1})
+            return
+
+        applied = await self.jobs.set_summary(fields["key"], fields["job"], result["result"])
+        await self.jobs.ack(entry_id)
+        if applied:
+            _DONE.inc()
+            # id записи stream начинается с времени постановки в мс
+            AI_SUMMARY_JOB_LAG_SECONDS.observe(time.time() - int(entry_id.split("-")[0]) / 1000)
+        else:
+            _STALE.inc()
+
+    async def _requeue(self, entry_id: str, fields: dict) -> None:
+        if not await self.jobs.requeue(entry_id, fields):
+            logger.error("Summary job dropped key=%s: queue is full", fields.get("key"))
+            _FAILED.inc()
@@ -1,20 +1,105 @@
 from app.config import settings
-from typing import Dict
+from typing import AsyncIterator, Dict
+from time import perf_counter
+import asyncio
+
+from app.metrics import (
+    AI_CHAIN_SECONDS,
+    AI_INPUT_CHARS,
+    AI_STREAM_FIRST_CHUNK_SECONDS,
+    AI_STREAMS_CANCELLED,
+    timed
+)
+from app.services.result_cache import ResultCache
+from app.services.summarizer import MapReduceSummarizer
+from app.services.scheduler import UpstreamScheduler, is_rate_limited
+
+# Менять при любом изменении промптов - старые результаты в кеше перестанут совпадать
+PROMPT_VERSION = "1"
+# Тексты до этой длины суммаризируются одним запросом (совпадает с лимитом TextRequest)
+DIRECT_SUMMARY_MAX_CHARS = 10_000
+
+_CORRECTION_CHARS = AI_INPUT_CHARS.labels(chain="correction")
+_SUMMARIZATION_CHARS = AI_INPUT_CHARS.labels(chain="summarization")
+_MAP_REDUCE_CHARS = AI_INPUT_CHARS.labels(chain="map_reduce")
+_FIRST_CHUNK = {
+    "correction": AI_STREAM_FIRST_CHUNK_SECONDS.labels(chain="correction"),
+    "summarization": AI_STREAM_FIRST_CHUNK_SECONDS.labels(chain="summarization"),
+}
+
+class _SlotRelease:
+    """Освобождает слот планировщика ровно один раз, кто бы ни вызвал первым"""
+
+    def __init__(self, scheduler: UpstreamScheduler):
+        self.scheduler = scheduler
+        self.released = False
+
+    def __call__(self, duration: float | None = None, rate_limited: bool = False) -> None:
+        if not self.released:
+            self.released = True
+            self.scheduler.release(duration=duration, rate_limited=rate_limited)
+
+
+class _SlotStream:
+    """
+    Поток ответа, под который уже занят слот планировщика.
+    Незапущенный async-генератор при aclose() не выполняет свой finally: если ответ так и не начали
+    отдавать (клиент ушёл раньше, не отправились заголовки), слот освобождает aclose() этой обёртки.
+    """
+
+    def __init__(self, chunks: AsyncIterator[str], release: _SlotRelease):
+        self._chunks = chunks
+        self._release = release
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        return self._chunks.__anext__()
+
+    async def aclose(self) -> None:
+        try:
+            await self._chunks.aclose()
+        finally:
+            self._release()
 
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 
 class TextService:
-    def __init__(self):
-        self.llm = ChatOpenAI(
+    def __init__(
+            self,
+            cache: ResultCache | None = None,
+            llm=None,
+            count_tokens=None,
+            scheduler: UpstreamScheduler | None = None
+    ):
+        self.cache = cache
+        self.scheduler = scheduler
+        # llm можно подменить (например, фейковой моделью в тестах)
+        if llm is None:
+            # langchain_openai тянет весь SDK openai (~1.5 с импорта): грузится при создании сервиса, а не при старте
+            from langchain_openai import ChatOpenAI
+
+            llm = ChatOpenAI(
+                model=settings.openai_model,
+                api_key=settings.openai_api_key,
+                temperature=0.0,
+            )
+        self.llm = llm
+        self._build_chains()
+        self.summarizer = MapReduceSummarizer(
+            self.llm,
             model=settings.openai_model,
-            api_key=settings.openai_api_key,
-            temperature=0.0, 
+            chunk_tokens=settings.summarize_chunk_tokens,
+            chunk_overlap=settings.summarize_chunk_overlap,
+            reduce_tokens=settings.summarize_reduce_tokens,
+            max_concurrency=settings.summarize_max_concurrency,
+            count_tokens=count_tokens
         )
-        self._build_chains()
 
     def _build_chains(self):
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_core.output_parsers import StrOutputParser
+
         correction_prompt = ChatPromptTemplate.from_template(
             "Fix grammar, spelling, punctuation, and improve clarity. "
             "Return only the corrected text, no explanations:\n\n{text}"
@@ -27,10 +112,119 @@ class TextService:
         self.summarization_chain = summarization_prompt | self.llm | StrOutputParser()
 
 
-    async def text_correction(self, text: str) -> Dict[str, str]:
-        corrected = await self.correction_chain.ainvoke({"text": text})
+    @timed(AI_CHAIN_SECONDS.labels(chain="correction"))
+    async def text_correction(self, text: str, session_id: str | None = None) -> Dict[str, str]:
+        _CORRECTION_CHARS.observe(len(text))
+        corrected = await self._cached(
+            "correction", text, lambda: self._invoke(self.correction_chain, text, session_id)
+        )
         return {"result": corrected}
 
-    async def text_summarization(self, text: str) -> Dict[str, str]:
-        summary = await self.summarization_chain.ainvoke({"text": text})
-        return {"result": summary}
\ No newline at end of file
+    @timed(AI_CHAIN_SECONDS.labels(chain="summarization"))
+    async def text_summarization(self, text: str, session_id: str | None = None) -> Dict[str, str]:
+        _SUMMARIZATION_CHARS.observe(len(text))
+        summary = await self._cached(
+            "summarization", text, lambda: self._invoke(self.summarization_chain, text, session_id)
+        )
+        return {"result": summary}
+
+    @timed(AI_CHAIN_SECONDS.labels(chain="map_reduce"))
+    async def note_summarization(self, text: str, session_id: str | None = None) -> Dict[str, str]:
+        """Суммаризация текста любой длины: короткий - одним запросом, длинный - через map-reduce"""
+        if len(text) <= DIRECT_SUMMARY_MAX_CHARS:
+            return await self.text_summarization(text, session_id)
+        _MAP_REDUCE_CHARS.observe(len(text))
+
+        async def invoke(chain, part: str) -> str:
+            return await self._invoke(chain, part, session_id)
+
+        summary = await self._cached(
+            "summarization_map_reduce", text, lambda: self.summarizer.summarize(text, invoke)
+        )
+        return {"result": summary}
+
+    async def _cached(self, operation: str, text: str, compute) -> str:
+        if self.cache is None:
+            return await compute()
+        return await self.cache.get_or_compute(operation, PROMPT_VERSION, text, compute)
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # ~4 символа на токен плюс ожидаемый ответ - для ведра TPM точности хватает
+        return len(text) // 4 + settings.ai_output_tokens_estimate
+
+    async def _invoke(self, chain, text: str, session_id: str | None) -> str:
+        if self.scheduler is None:
+            return await chain.ainvoke({"text": text})
+        async with self.scheduler.slot(session_id, self._estimate_tokens(text)):
+            return await chain.ainvoke({"text": text})
+
+    async def text_correction_stream(self, text: str, session_id: str | None = None) -> AsyncIterator[str]:
+        _CORRECTION_CHARS.observe(len(text))
+        return await self._open_stream("correction", text, self.correction_chain, session_id)
+
+    async def text_summarization_stream(self, text: str, session_id: str | None = None) -> AsyncIterator[str]:
+        _SUMMARIZATION_CHARS.observe(len(text))
+        return await self._open_stream("summarization", text, self.summarization_chain, session_id)
+
+    async def _open_stream(self, operation: str, text: str, chain, session_id: str | None) -> AsyncIterator[str]:
+        """
+        Кеш проверяется и слот планировщика берётся до начала ответа,
+        чтобы перегрузку можно было вернуть обычным 429, а не событием в потоке.
+        """
+        start = perf_counter()
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(operation, PROMPT_VERSION, text)
+            cached = await self.cache.lookup(key)
+            if cached is not None:
+                return self._single_chunk(cached)
+
+        if self.scheduler is None:
+            return self._stream(operation, text, chain, key, start, release=None)
+        await self.scheduler.acquire(session_id, self._estimate_tokens(text))
+        release = _SlotRelease(self.scheduler)
+        return _SlotStream(self._stream(operation, text, chain, key, start, release), release)
+
+    @staticmethod
+    async def _single_chunk(text: str) -> AsyncIterator[str]:
+        yield text
+
+    async def _stream(
+            self,
+            operation: str,
+            text: str,
+            chain,
+            key: str | None,
+            start: float,
+            release: _SlotRelease | None
+    ) -> AsyncIterator[str]:
+        """
+        Отдаёт результат частями по мере генерации через astream.
+        Если клиент ушёл, генератор отменяется, и aclose() закрывает запрос к провайдеру.
+        Полностью полученный результат попадает в кеш.
+        """
+        parts = []
+        stream = chain.astream({"text": text})
+        duration = None
+        rate_limited = False
+        try:
+            async for chunk in stream:
+                if not parts:
+                    _FIRST_CHUNK[operation].observe(perf_counter() - start)
+                parts.append(chunk)
+                yield chunk
+            duration = perf_counter() - start
+        except (asyncio.CancelledError, GeneratorExit):
+            AI_STREAMS_CANCELLED.inc()
+            raise
+        except Exception as e:
+            rate_limited = is_rate_limited(e)
+            raise
+        finally:
+            await stream.aclose()
+            if release is not None:
+                release(duration=duration, rate_limited=rate_limited)
+
+        if key is not None:
+            await self.cache.store(key, "".join(parts), duration)
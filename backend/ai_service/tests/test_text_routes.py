@@ -1,40 +1,481 @@
+import asyncio
+import json
+import fakeredis
+import httpx
 import pytest
-from httpx import AsyncClient
+from httpx import AsyncClient, ASGITransport
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
 from app.main import app
+from app.routes.text import get_text_service, get_text_storage_client, _sse
+from app.responses import ClosingStreamingResponse
+from app.clients.text_storage_client import NoteAccessError, TextStorageClient
+from app.services.text_service import TextService
+from app.services.scheduler import UpstreamScheduler, SchedulerOverloaded
+from app.services.summary_worker import SummaryWorker
+from app.clients.summary_jobs_client import REQUEUE_LUA, SummaryJobsClient
+from app.clients.session_redis_client import session_redis_client
+from app.metrics import AI_STREAMS_CANCELLED
 
 
 @pytest.fixture
-async def client():
-    async with AsyncClient(app=app, base_url="http://test") as ac:
+def responses():
+    return ["Corrected text here"]
+
+
+class FakeTextStorage:
+    def __init__(self, notes: dict):
+        self.notes = notes
+
+    async def get_text(self, key: str) -> str | None:
+        note = self.notes.get(key)
+        if note == "locked":
+            raise NoteAccessError(key)
+        return note
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+@pytest.fixture
+def notes():
+    return {
+        "short": "Short note.",
+        "large": " ".join(f"word{i}" for i in range(8000)),
+        "locked": "locked",
+    }
+
+
+@pytest.fixture
+async def client(responses, notes, monkeypatch):
+    async def session_exists(session_id: str) -> bool:
+        return True
+
+    monkeypatch.setattr(session_redis_client, "exists", session_exists)
+    service = TextService(llm=FakeListChatModel(responses=responses), count_tokens=count_words)
+    app.dependency_overrides[get_text_service] = lambda: service
+    app.dependency_overrides[get_text_storage_client] = lambda: FakeTextStorage(notes)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test", cookies={"session": "test"}) as ac:
         yield ac
+    app.dependency_overrides.clear()
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = "message", {}
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((event, data))
+    return events
+
 
 @pytest.mark.parametrize("text", ["", "   ", "\t\n"])
 async def test_text_correction_empty(client: AsyncClient, text: str):
-    response = await client.post("/v1/text/text_correction", json={"text": text})
-    assert response.status_code == 422  
+    response = await client.post("/api/v1/text/text_correction", json={"text": text})
+    assert response.status_code == 422
 
 
 async def test_text_correction_too_long(client: AsyncClient):
     long_text = "a" * 10_001
-    response = await client.post("/v1/text/text_correction", json={"text": long_text})
+    response = await client.post("/api/v1/text/text_correction", json={"text": long_text})
     assert response.status_code == 422
 
 
 async def test_text_correction_valid(client: AsyncClient):
-    response = await client.post("/v1/text/text_correction", json={"text": "hello worlt"})
+    response = await client.post("/api/v1/text/text_correction", json={"text": "hello worlt"})
     assert response.status_code == 200
     data = response.json()
     assert "result" in data
-    assert "Corrected text here" in data["result"]["text"]
+    assert "Corrected text here" in data["result"]["result"]
+
 
+@pytest.mark.parametrize("responses", [["Summarized text here"]])
 async def test_text_summarization_valid(client: AsyncClient):
-    response = await client.post("/v1/text/text_summarization", json={"text": "Long text..."})
+    response = await client.post("/api/v1/text/text_summarization", json={"text": "Long text..."})
     assert response.status_code == 200
     data = response.json()
     assert "result" in data
-    assert "Summarized text here" in data["result"]["text"]
+    assert "Summarized text here" in data["result"]["result"]
+
+
+async def test_text_correction_stream(client: AsyncClient):
+    response = await client.post("/api/v1/text/text_correction/stream", json={"text": "hello worlt"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert events[-1][0] == "done"
+    deltas = [data["delta"] for event, data in events if event == "message"]
+    assert len(deltas) > 1
+    assert "".join(deltas) == "Corrected text here"
+
+
+@pytest.mark.parametrize("responses", [["Summarized text here"]])
+async def test_text_summarization_stream(client: AsyncClient):
+    response = await client.post("/api/v1/text/text_summarization/stream", json={"text": "Long text..."})
+    assert response.status_code == 200
+    events = parse_sse(response.text)
+    assert "".join(data["delta"] for event, data in events if event == "message") == "Summarized text here"
+
+
+async def test_text_stream_empty(client: AsyncClient):
+    response = await client.post("/api/v1/text/text_correction/stream", json={"text": "  "})
+    assert response.status_code == 422
+
+
+async def test_stream_cancel_stops_generation():
+    service = TextService(llm=FakeListChatModel(responses=["abcdef"], sleep=0.01))
+    cancelled = AI_STREAMS_CANCELLED._value.get()
+
+    chunks = await service.text_correction_stream("hello")
+    assert await chunks.__anext__() == "a"
+    await chunks.aclose()
+
+    assert AI_STREAMS_CANCELLED._value.get() == cancelled + 1
+
+
+async def test_stream_dropped_before_start_releases_slot():
+    scheduler = make_scheduler(max_in_flight=1)
+    service = TextService(llm=FakeListChatModel(responses=["abcdef"]), scheduler=scheduler)
+
+    chunks = await service.text_correction_stream("hello")
+    assert scheduler._in_flight == 1
+    # Ответ так и не начали отдавать: генератор не запускался, его finally не выполнится
+    await chunks.aclose()
+    assert scheduler._in_flight == 0
+
+    # Повторное закрытие и завершившийся поток не освобождают слот второй раз
+    chunks = await service.text_correction_stream("hello")
+    assert "".join([chunk async for chunk in chunks]) == "abcdef"
+    await chunks.aclose()
+    assert scheduler._in_flight == 0
+
+
+async def test_stream_response_releases_slot_when_send_fails():
+    scheduler = make_scheduler(max_in_flight=1)
+    service = TextService(llm=FakeListChatModel(responses=["abcdef"]), scheduler=scheduler)
+    chunks = await service.text_correction_stream("hello")
+    response = ClosingStreamingResponse(_sse(chunks), on_close=chunks.aclose, media_type="text/event-stream")
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        # Клиент ушёл до отправки заголовков
+        raise OSError("connection reset")
+
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    with pytest.raises(Exception):
+        await response(scope, receive, send)
+    assert scheduler._in_flight == 0
+
+
+@pytest.mark.parametrize("responses", [["Summarized text here"]])
+async def test_summarize_note_short(client: AsyncClient):
+    response = await client.post("/api/v1/text/summarize_note", json={"key": "short"})
+    assert response.status_code == 200
+    assert response.json()["result"]["result"] == "Summarized text here"
+
+
+@pytest.mark.parametrize("responses", [["Summarized text here"]])
+async def test_summarize_note_large(client: AsyncClient):
+    response = await client.post("/api/v1/text/summarize_note", json={"key": "large"})
+    assert response.status_code == 200
+    assert response.json()["result"]["result"] == "Summarized text here"
+
+
+async def test_summarize_note_errors(client: AsyncClient):
+    response = await client.post("/api/v1/text/summarize_note", json={"key": "missing"})
+    assert response.status_code == 404
+    response = await client.post("/api/v1/text/summarize_note", json={"key": "locked"})
+    assert response.status_code == 403
+
+
+async def test_summarize_note_refuses_read_once(client: AsyncClient):
+    requests = []
+
+    def text_service(request: httpx.Request) -> httpx.Response:
+        # text_service отвечает 409 на чтение без удаления одноразовой заметки и не удаляет её
+        requests.append(request)
+        if request.url.params.get("consume") == "false":
+            return httpx.Response(409, json={"detail": "Read-once note can only be read by opening it"})
+        return httpx.Response(200, text="Secret read-once note")
+
+    storage = TextStorageClient(base_url="http://text", timeout=5.0, max_chars=1000)
+    storage.client = httpx.AsyncClient(base_url="http://text", transport=httpx.MockTransport(text_service))
+    app.dependency_overrides[get_text_storage_client] = lambda: storage
+
+    response = await client.post("/api/v1/text/summarize_note", json={"key": "once"})
+    assert response.status_code == 409
+    assert [(r.url.path, dict(r.url.params)) for r in requests] == [
+        ("/api/text/raw", {"key": "once", "consume": "false"})
+    ]
+
+
+async def test_map_reduce_splits_and_collapses():
+    # Все ответы одинаковые; список длинный, чтобы llm.i равнялся числу вызовов
+    llm = FakeListChatModel(responses=["part " * 40] * 100)
+    service = TextService(llm=llm, count_tokens=count_words)
+    summarizer = service.summarizer
+    summarizer.chunk_tokens, summarizer.chunk_overlap, summarizer.reduce_tokens = 100, 0, 150
+    text = " ".join(f"word{i}" for i in range(1000))
+
+    assert len(summarizer.split(text)) == 10
+    summary = await summarizer.summarize(text)
+
+    # 10 map + 4 collapse (группы по 3 итога по 40 слов) + 2 collapse + reduce
+    assert summary.strip() == ("part " * 40).strip()
+    assert llm.i == 10 + 4 + 2 + 1
+
+
+def make_scheduler(max_in_flight: int = 2, max_queue: int = 100, max_wait: float = 10.0) -> UpstreamScheduler:
+    return UpstreamScheduler(max_in_flight=max_in_flight, max_queue=max_queue, max_wait=max_wait, rpm=0, tpm=0)
+
+
+async def test_scheduler_limits_in_flight():
+    scheduler = make_scheduler(max_in_flight=2)
+    service = TextService(llm=FakeListChatModel(responses=["ok"], sleep=0.02), scheduler=scheduler)
+    active, peak = 0, 0
+
+    async def call(i: int):
+        nonlocal active, peak
+        async with scheduler.slot("s", 1):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(call(i) for i in range(6)))
+    assert peak == 2
+
+    # Через сервис: разные тексты, чтобы не сработал кэш
+    results = await asyncio.gather(*(service.text_correction(f"text {i}", "s") for i in range(5)))
+    assert len(results) == 5
+    assert scheduler._in_flight == 0 and scheduler._queued == 0
+
+
+async def test_scheduler_round_robin_between_sessions():
+    scheduler = make_scheduler(max_in_flight=1)
+    order = []
+
+    async def call(session: str, i: int):
+        async with scheduler.slot(session, 1):
+            order.append(f"{session}{i}")
+            await asyncio.sleep(0.01)
+
+    # Сессия a ставит в очередь сразу три запроса, b - один, но b не ждёт всех запросов a
+    tasks = [asyncio.create_task(call("a", i)) for i in range(3)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(call("b", 0)))
+    await asyncio.gather(*tasks)
+    assert order == ["a0", "a1", "b0", "a2"]
+
+
+async def test_scheduler_sheds_when_queue_full():
+    scheduler = make_scheduler(max_in_flight=1, max_queue=1)
+    await scheduler.acquire("a", 1)
+    waiting = asyncio.create_task(scheduler.acquire("b", 1))
+    await asyncio.sleep(0)
+
+    with pytest.raises(SchedulerOverloaded) as e:
+        await scheduler.acquire("c", 1)
+    assert int(e.value.retry_after_header) >= 1
+
+    scheduler.release(duration=0.01)
+    await waiting
+    scheduler.release(duration=0.01)
+    assert scheduler._in_flight == 0
+
+
+async def test_scheduler_halves_limit_on_rate_limit():
+    scheduler = make_scheduler(max_in_flight=8)
+
+    class RateLimitError(Exception):
+        status_code = 429
+
+    with pytest.raises(RateLimitError):
+        async with scheduler.slot("a", 1):
+            raise RateLimitError()
+    assert scheduler.limit == 4
+
+    for _ in range(30):
+        async with scheduler.slot("a", 1):
+            pass
+    assert scheduler.limit == 8
+
+
+async def test_route_returns_429_when_overloaded(client: AsyncClient):
+    scheduler = make_scheduler(max_in_flight=1, max_queue=0)
+    service = TextService(llm=FakeListChatModel(responses=["ok"], sleep=0.05), scheduler=scheduler)
+    app.dependency_overrides[get_text_service] = lambda: service
+
+    first, second = await asyncio.gather(
+        client.post("/api/v1/text/text_correction", json={"text": "first"}),
+        client.post("/api/v1/text/text_correction", json={"text": "second"})
+    )
+    statuses = sorted([first.status_code, second.status_code])
+    assert statuses == [200, 429]
+    rejected = first if first.status_code == 429 else second
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+    response = await client.post("/api/v1/text/text_correction/stream", json={"text": "third"})
+    assert response.status_code == 200
+
+
+class FakeSummaryJobs:
+    """Очередь задач и hash заметок в памяти"""
+
+    def __init__(self, notes: dict):
+        self.notes = notes
+        self.queue = []
+        self.acked = []
+
+    async def requeue(self, entry_id: str, fields: dict) -> bool:
+        self.acked.append(entry_id)
+        self.queue.append(fields)
+        return True
+
+    async def ack(self, entry_id: str) -> None:
+        self.acked.append(entry_id)
+
+    async def set_summary(self, key: str, job: str, summary: str) -> bool:
+        note = self.notes.get(key)
+        if note is None or note.get("summary_job") != job:
+            return False
+        note["summary"] = summary
+        note["etag"] = job
+        del note["summary_job"]
+        return True
+
+
+def make_worker(jobs: FakeSummaryJobs, llm, bodies: dict) -> SummaryWorker:
+    return SummaryWorker(
+        jobs=jobs,
+        service=TextService(llm=llm),
+        storage=FakeTextStorage(bodies),
+        consumer="test",
+        concurrency=1,
+        block_ms=10,
+        claim_idle_ms=1000,
+        max_attempts=2
+    )
+
+
+async def test_summary_worker_stores_summary():
+    notes = {"a": {"summary_job": "j1"}, "b": {}, "c": {"summary_job": "j4"}}
+    jobs = FakeSummaryJobs(notes)
+    bodies = {"a": "note a", "b": "note b", "c": "locked"}
+    worker = make_worker(jobs, FakeListChatModel(responses=["Summary"]), bodies)
+
+    await worker.process("1-0", {"key": "a", "job": "j1", "creator": "s"})
+    # Заметку b перезаписали после постановки задачи - токена больше нет
+    await worker.process("2-0", {"key": "b", "job": "j2", "creator": "s"})
+    await worker.process("3-0", {"key": "gone", "job": "j3", "creator": "s"})
+    # На c после постановки поставили пароль - тело не отдаётся, задача снимается без повтора
+    await worker.process("4-0", {"key": "c", "job": "j4", "creator": "s"})
+
+    assert notes == {"a": {"summary": "Summary", "etag": "j1"}, "b": {}, "c": {"summary_job": "j4"}}
+    assert jobs.acked == ["1-0", "2-0", "3-0", "4-0"]
+    assert jobs.queue == []
+
+
+async def test_summary_worker_retries_then_gives_up(monkeypatch):
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(asyncio, "sleep", no_sleep)
+
+    class BrokenModel(FakeListChatModel):
+        def _call(self, *args, **kwargs):
+            raise RuntimeError("provider down")
+
+    notes = {"a": {"summary_job": "j1"}}
+    jobs = FakeSummaryJobs(notes)
+    worker = make_worker(jobs, BrokenModel(responses=["unused"]), {"a": "note a"})
+
+    await worker.process("1-0", {"key": "a", "job": "j1", "creator": "s"})
+    assert jobs.queue == [{"key": "a", "job": "j1", "creator": "s", "attempt": 1}]
+
+    await worker.process("2-0", jobs.queue.pop())
+    assert jobs.queue == []
+    assert jobs.acked == ["1-0", "2-0"]
+    assert notes == {"a": {"summary_job": "j1"}}
+
+
+async def test_requeue_never_trims_pending_jobs():
+    jobs = SummaryJobsClient(stream="jobs", group="g", maxlen=2)
+    jobs.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    jobs._requeue = jobs.client.register_script(REQUEUE_LUA)
+    await jobs.ensure_group()
+    await jobs.client.hset("a", "summary_job", "j1")
+    await jobs.client.xadd("jobs", {"key": "a", "job": "j1", "creator": "s"})
+
+    [(entry_id, fields)] = await jobs.read("w", 10)
+    assert await jobs.requeue(entry_id, {**fields, "attempt": 1})
+    [(entry_id, fields)] = await jobs.read("w", 10)
+    assert fields == {"key": "a", "job": "j1", "creator": "s", "attempt": "1"}
+
+    # Пока задача ждала повтора, очередь заполнили другие
+    await jobs.client.xadd("jobs", {"key": "b", "job": "j2", "creator": "s"})
+    await jobs.client.xadd("jobs", {"key": "c", "job": "j3", "creator": "s"})
+    assert not await jobs.requeue(entry_id, fields)
+
+    remaining = await jobs.client.xrange("jobs")
+    assert [f["key"] for _, f in remaining] == ["b", "c"]
+    assert await jobs.client.hget("a", "summary_job") is None
+    await jobs.client.aclose()
 
 async def test_hello(client: AsyncClient):
-    response = await client.post("/v1/text/hello")
+    response = await client.post("/api/v1/text/hello")
     assert response.status_code == 200
-    assert response.json() == {"result": "all alright"}
\ No newline at end of file
+    assert response.json() == {"result": "all alright"}
+
+
+async def test_health(client: AsyncClient):
+    response = await client.get("/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+async def test_routes_share_service_built_by_lifespan(client: AsyncClient, monkeypatch):
+    app.dependency_overrides.pop(get_text_service)
+    monkeypatch.setattr(app.state, "text_service", None, raising=False)
+    response = await client.post("/api/v1/text/text_correction", json={"text": "hello"})
+    assert response.status_code == 503
+
+    service = TextService(llm=FakeListChatModel(responses=["Corrected"]))
+    monkeypatch.setattr(app.state, "text_service", service)
+    response = await client.post("/api/v1/text/text_correction", json={"text": "hello"})
+    assert response.status_code == 200
+    assert response.json()["result"]["result"] == "Corrected"
+
+
+async def test_ready_waits_for_startup_and_dependencies(client: AsyncClient, monkeypatch):
+    async def ping() -> bool:
+        return True
+
+    async def ping_down() -> bool:
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(session_redis_client, "ping", ping)
+    monkeypatch.setattr(app.state, "ready", True, raising=False)
+    monkeypatch.setattr(app.state, "text_service", None, raising=False)
+    response = await client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"]["redis"]["ok"] is True
+
+    monkeypatch.setattr(app.state, "text_service", TextService(llm=FakeListChatModel(responses=["ok"])))
+    response = await client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+    monkeypatch.setattr(session_redis_client, "ping", ping_down)
+    response = await client.get("/ready")
+    assert response.status_code == 503
+    redis_check = response.json()["checks"]["redis"]
+    assert redis_check["ok"] is False
+    assert redis_check["error"] == "ConnectionError"
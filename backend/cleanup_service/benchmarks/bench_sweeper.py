@@ -0,0 +1,72 @@
+"""
+Пропускна здатність sweeper-а на великому беклозі notes:expiry.
+
+Заповнює Redis N простроченими великими нотатками і запускає --replicas
+sweeper-ів паралельно (як окремі репліки), доки беклог не спорожніє.
+Об'єктів у MinIO немає - DeleteObjects для відсутніх ключів відпрацьовує як звичайне видалення.
+
+Запуск з каталогу cleanup_service проти Redis/MinIO з .env:
+    python -m benchmarks.bench_sweeper --backlog 1000000 --replicas 4
+"""
+import argparse
+import asyncio
+import time
+
+from clients.minio_factory import create_minio_client
+from clients.redis_factory import create_redis_client
+from config import cleanup_settings, minio_settings
+from services.sweeper import EXPIRY_ZSET, ExpirySweeper
+
+FILL_CHUNK = 10_000
+
+
+async def fill(redis, backlog: int) -> None:
+    expired = int(time.time() * 1000) - 60_000
+    for start in range(0, backlog, FILL_CHUNK):
+        async with redis.pipeline(transaction=False) as pipe:
+            members = {}
+            for i in range(start, min(start + FILL_CHUNK, backlog)):
+                key = f"bench:sweep:{i}"
+                pipe.hset(key, mapping={"link_text": key, "size": 20000, "expiresAt": expired})
+                members[key] = expired
+            pipe.zadd(EXPIRY_ZSET, members)
+            await pipe.execute()
+
+
+async def drain(sweeper: ExpirySweeper) -> int:
+    total = 0
+    while processed := await sweeper.sweep_once():
+        total += processed
+    return total
+
+
+async def main(backlog: int, replicas: int, batch_size: int) -> None:
+    redis = create_redis_client()
+    minio = await create_minio_client()
+    if not await minio.bucket_exists(minio_settings.MINIO_BUCKET):
+        await minio.make_bucket(minio_settings.MINIO_BUCKET)
+
+    start = time.perf_counter()
+    await fill(redis, backlog)
+    print(f"filled {backlog} entries in {time.perf_counter() - start:.1f}s")
+
+    sweepers = [
+        ExpirySweeper(redis, minio, minio_settings.MINIO_BUCKET, batch_size, cleanup_settings.CLEANUP_LEASE_TTL)
+        for _ in range(replicas)
+    ]
+    start = time.perf_counter()
+    swept = sum(await asyncio.gather(*(drain(s) for s in sweepers)))
+    elapsed = time.perf_counter() - start
+    print(f"swept {swept} notes in {elapsed:.1f}s -> {swept / elapsed:.0f} notes/s, backlog left {await sweepers[0].update_backlog()}")
+
+    await redis.aclose()
+    await minio.close_session()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backlog", type=int, default=1_000_000)
+    parser.add_argument("--replicas", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=cleanup_settings.CLEANUP_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(main(args.backlog, args.replicas, args.batch_size))
@@ -0,0 +1,22 @@
+import aiohttp
+from miniopy_async import Minio
+from config import minio_settings
+
+
+async def create_minio_client() -> Minio:
+    settings = minio_settings
+
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=settings.MINIO_POOL_SIZE,
+            limit_per_host=settings.MINIO_POOL_SIZE
+        )
+    )
+
+    return Minio(
+        endpoint=settings.MINIO_ENDPOINT,
+        access_key=settings.MINIO_ACCESS_KEY,
+        secret_key=settings.MINIO_SECRET_KEY,
+        secure=settings.MINIO_SECURE,
+        session=session,
+    )
@@ -0,0 +1,46 @@
+from pydantic_settings import BaseSettings
+
+
+class RedisSettings(BaseSettings):
+    REDIS_HOST: str
+    REDIS_PORT: int
+    REDIS_DB: int
+    REDIS_PASSWORD: str
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        extra = "ignore"
+
+
+class MinioSettings(BaseSettings):
+    MINIO_ENDPOINT: str
+    MINIO_ACCESS_KEY: str
+    MINIO_SECRET_KEY: str
+    MINIO_SECURE: bool
+    MINIO_BUCKET: str
+    MINIO_POOL_SIZE: int = 8
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        extra = "ignore"
+
+
+class CleanupSettings(BaseSettings):
+    CLEANUP_BATCH_SIZE: int = 500
+    # Пауза між проходами, коли черга прострочених порожня (секунди)
+    CLEANUP_IDLE_INTERVAL: float = 1.0
+    # Скільки секунд батч належить репліці; після цього його забирає інша
+    CLEANUP_LEASE_TTL: int = 60
+    CLEANUP_METRICS_PORT: int = 9100
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        extra = "ignore"
+
+
+redis_settings = RedisSettings()
+minio_settings = MinioSettings()
+cleanup_settings = CleanupSettings()
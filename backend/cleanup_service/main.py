@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import signal
+
+from prometheus_client import start_http_server
+
+from clients.minio_factory import create_minio_client
+from clients.redis_factory import create_redis_client
+from config import cleanup_settings, minio_settings
+from services.sweeper import ExpirySweeper
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def run() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    redis = create_redis_client()
+    minio = await create_minio_client()
+    sweeper = ExpirySweeper(
+        redis=redis,
+        minio=minio,
+        bucket=minio_settings.MINIO_BUCKET,
+        batch_size=cleanup_settings.CLEANUP_BATCH_SIZE,
+        lease_ttl=cleanup_settings.CLEANUP_LEASE_TTL
+    )
+    start_http_server(cleanup_settings.CLEANUP_METRICS_PORT)
+    logger.info("Cleanup service started")
+
+    try:
+        while not stop.is_set():
+            try:
+                processed = await sweeper.sweep_once()
+                await sweeper.update_backlog()
+            except Exception as e:
+                logger.error(f"Sweep failed: {e}", exc_info=True)
+                processed = 0
+            # Повний батч - черга ще не розібрана, продовжуємо без паузи
+            if processed < cleanup_settings.CLEANUP_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(stop.wait(), cleanup_settings.CLEANUP_IDLE_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+    finally:
+        await redis.aclose()
+        await minio.close_session()
+        logger.info("Cleanup service stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
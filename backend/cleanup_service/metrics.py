@@ -0,0 +1,26 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+NOTES_DELETED = Counter(
+    "cleanup_notes_deleted_total",
+    "Expired note hashes deleted from Redis"
+)
+
+OBJECTS_DELETED = Counter(
+    "cleanup_objects_deleted_total",
+    "Expired note objects removed from MinIO"
+)
+
+OBJECT_DELETE_ERRORS = Counter(
+    "cleanup_object_delete_errors_total",
+    "MinIO objects that failed to delete"
+)
+
+BACKLOG = Gauge(
+    "cleanup_backlog",
+    "Entries in notes:expiry that are already due"
+)
+
+BATCH_SECONDS = Histogram(
+    "cleanup_batch_seconds",
+    "Time to process one claimed batch"
+)
@@ -0,0 +1,123 @@
+import logging
+import time
+
+from miniopy_async.deleteobjects import DeleteObject
+
+from metrics import BACKLOG, BATCH_SECONDS, NOTES_DELETED, OBJECTS_DELETED, OBJECT_DELETE_ERRORS
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_ZSET = "notes:expiry"
+LEASE_ZSET = "notes:expiry:leases"
+BLOB_PREFIX = "notes:blob:"
+
+# Забирає батч прострочених ключів в оренду: переносить їх з notes:expiry
+# у notes:expiry:leases зі score = кінець оренди. Першими йдуть прострочені
+# оренди - батчі реплік, що впали посеред обробки.
+# KEYS[1] - notes:expiry, KEYS[2] - leases; ARGV[1] - now (мс), ARGV[2] - lease_until (мс), ARGV[3] - limit
+CLAIM_BATCH_LUA = """
+local batch = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])
+local remaining = tonumber(ARGV[3]) - #batch
+if remaining > 0 then
+    local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, remaining)
+    if #due > 0 then
+        redis.call('ZREM', KEYS[1], unpack(due))
+        for _, key in ipairs(due) do
+            batch[#batch + 1] = key
+        end
+    end
+end
+for _, key in ipairs(batch) do
+    redis.call('ZADD', KEYS[2], ARGV[2], key)
+end
+return batch
+"""
+
+# Видаляє hash-і батчу одним викликом. Hash видаляється лише якщо його expiresAt
+# справді минув: нотатку могли оновити з новим TTL, поки батч був в оренді.
+# Тіло з полем blob спільне для нотаток з тим самим текстом (notes:blob:<sha256>):
+# з нього знімається посилання, а об'єкт видаляється лише разом з останнім.
+# Ключі notes:blob:* не передаються в KEYS, тож скрипт розрахований на Redis без кластера.
+# Повертає {кількість видалених hash-ів, об'єкти для видалення з MinIO}; для вже відсутніх
+# hash-ів додається ключ - ім'я об'єкта нотаток, створених до дедуплікації.
+# KEYS[1] - leases, KEYS[2..] - ключі нотаток; ARGV[1] - now (мс), ARGV[2] - префікс notes:blob:
+DELETE_EXPIRED_LUA = """
+local now = tonumber(ARGV[1])
+local deleted = 0
+local objects = {}
+for i = 2, #KEYS do
+    local key = KEYS[i]
+    local data = redis.call('HMGET', key, 'expiresAt', 'link_text', 'blob')
+    if data[1] then
+        if tonumber(data[1]) <= now then
+            redis.call('DEL', key)
+            deleted = deleted + 1
+            if data[3] then
+                local blob_key = ARGV[2] .. data[3]
+                if redis.call('HINCRBY', blob_key, 'refs', -1) <= 0 then
+                    local object = redis.call('HGET', blob_key, 'object')
+                    if object then
+                        objects[#objects + 1] = object
+                    end
+                    redis.call('DEL', blob_key)
+                end
+            else
+                objects[#objects + 1] = data[2] or key
+            end
+        end
+    elseif redis.call('EXISTS', key) == 0 then
+        objects[#objects + 1] = key
+    end
+end
+redis.call('ZREM', KEYS[1], unpack(KEYS, 2))
+return {deleted, objects}
+"""
+
+
+class ExpirySweeper:
+    """
+    Прибирає великі нотатки з notes:expiry: hash у Redis і тіло в MinIO, якщо на нього більше ніхто не посилається.
+    Кілька реплік працюють паралельно - кожна бере свій батч в оренду.
+    """
+
+    def __init__(self, redis, minio, bucket: str, batch_size: int, lease_ttl: int):
+        self.redis = redis
+        self.minio = minio
+        self.bucket = bucket
+        self.batch_size = batch_size
+        self.lease_ttl = lease_ttl
+        self._claim_batch = redis.register_script(CLAIM_BATCH_LUA)
+        self._delete_expired = redis.register_script(DELETE_EXPIRED_LUA)
+
+    async def sweep_once(self) -> int:
+        """Обробляє один батч. Повертає кількість ключів у батчі"""
+        now = int(time.time() * 1000)
+        keys = await self._claim_batch(
+            keys=[EXPIRY_ZSET, LEASE_ZSET],
+            args=[now, now + self.lease_ttl * 1000, self.batch_size]
+        )
+        if not keys:
+            return 0
+
+        with BATCH_SECONDS.time():
+            deleted, objects = await self._delete_expired(keys=[LEASE_ZSET, *keys], args=[now, BLOB_PREFIX])
+            NOTES_DELETED.inc(deleted)
+            if objects:
+                await self._remove_objects(objects)
+
+        logger.info(f"Swept batch size={len(keys)} objects={len(objects)}")
+        return len(keys)
+
+    async def _remove_objects(self, names: list[str]) -> None:
+        errors = 0
+        # remove_objects ледачий: запити йдуть лише під час ітерації по помилках
+        async for error in self.minio.remove_objects(self.bucket, [DeleteObject(name) for name in names]):
+            errors += 1
+            logger.error(f"MinIO delete failed object={error.name}: {error.message}")
+        OBJECTS_DELETED.inc(len(names) - errors)
+        OBJECT_DELETE_ERRORS.inc(errors)
+
+    async def update_backlog(self) -> int:
+        backlog = await self.redis.zcount(EXPIRY_ZSET, "-inf", int(time.time() * 1000))
+        BACKLOG.set(backlog)
+        return backlog
@@ -0,0 +1,120 @@
+import time
+
+import fakeredis
+import pytest
+
+from services.sweeper import BLOB_PREFIX, EXPIRY_ZSET, LEASE_ZSET, ExpirySweeper
+
+
+class FakeMinio:
+    def __init__(self):
+        self.removed = []
+
+    async def remove_objects(self, bucket, objects):
+        self.removed.extend(obj._name for obj in objects)
+        for _ in ():
+            yield
+
+
+@pytest.fixture
+async def redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+def minio():
+    return FakeMinio()
+
+
+@pytest.fixture
+def sweeper(redis, minio):
+    return ExpirySweeper(redis, minio, bucket="notes", batch_size=10, lease_ttl=60)
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+async def add_note(redis, key: str, expires_at: int, **fields):
+    await redis.hset(key, mapping={"expiresAt": expires_at, "link_text": key, **fields})
+    await redis.zadd(EXPIRY_ZSET, {key: expires_at})
+
+
+async def test_claim_moves_due_keys_to_leases(sweeper, redis):
+    now = now_ms()
+    await add_note(redis, "due", now - 1000)
+    await add_note(redis, "later", now + 60_000)
+
+    batch = await sweeper._claim_batch(keys=[EXPIRY_ZSET, LEASE_ZSET], args=[now, now + 60_000, 10])
+
+    assert batch == ["due"]
+    assert await redis.zrange(EXPIRY_ZSET, 0, -1) == ["later"]
+    assert await redis.zscore(LEASE_ZSET, "due") == now + 60_000
+
+
+async def test_claim_takes_over_expired_lease(sweeper, redis):
+    now = now_ms()
+    await add_note(redis, "a", now - 1000)
+    await add_note(redis, "b", now - 1000)
+
+    # Репліка взяла батч і впала, не видаливши його
+    first = await sweeper._claim_batch(keys=[EXPIRY_ZSET, LEASE_ZSET], args=[now, now + 60_000, 10])
+    assert sorted(first) == ["a", "b"]
+
+    # Поки оренда діє, інша репліка батч не бачить
+    assert await sweeper._claim_batch(keys=[EXPIRY_ZSET, LEASE_ZSET], args=[now + 1000, now + 61_000, 10]) == []
+
+    # Після кінця оренди батч забирається повторно з новим терміном
+    later = now + 61_000
+    second = await sweeper._claim_batch(keys=[EXPIRY_ZSET, LEASE_ZSET], args=[later, later + 60_000, 10])
+    assert sorted(second) == ["a", "b"]
+    assert await redis.zscore(LEASE_ZSET, "a") == later + 60_000
+
+
+async def test_sweep_deletes_expired_note_and_object(sweeper, redis, minio):
+    await add_note(redis, "old", now_ms() - 1000)
+
+    assert await sweeper.sweep_once() == 1
+
+    assert await redis.exists("old") == 0
+    assert await redis.zcard(LEASE_ZSET) == 0
+    assert minio.removed == ["old"]
+
+
+async def test_sweep_skips_note_extended_during_lease(sweeper, redis, minio):
+    now = now_ms()
+    await add_note(redis, "note", now - 1000)
+    await sweeper._claim_batch(keys=[EXPIRY_ZSET, LEASE_ZSET], args=[now, now + 60_000, 10])
+
+    # Поки батч в оренді, нотатку оновили з новим TTL
+    extended = now + 3_600_000
+    await redis.hset("note", "expiresAt", extended)
+    await redis.zadd(EXPIRY_ZSET, {"note": extended})
+
+    deleted, objects = await sweeper._delete_expired(keys=[LEASE_ZSET, "note"], args=[now, BLOB_PREFIX])
+
+    assert (deleted, objects) == (0, [])
+    assert await redis.exists("note") == 1
+    assert await redis.zcard(LEASE_ZSET) == 0
+    assert await redis.zscore(EXPIRY_ZSET, "note") == extended
+
+
+
+async def test_sweep_releases_shared_blob_only_with_last_reference(sweeper, redis, minio):
+    now = now_ms()
+    blob_key = BLOB_PREFIX + "abc"
+    await redis.hset(blob_key, mapping={"object": "blob-object", "codec": "zstd", "bytes": 100, "refs": 2})
+    await add_note(redis, "first", now - 1000, link_text="blob-object", blob="abc")
+    await add_note(redis, "second", now + 60_000, link_text="blob-object", blob="abc")
+
+    assert await sweeper.sweep_once() == 1
+    assert minio.removed == []
+    assert await redis.hget(blob_key, "refs") == "1"
+
+    await redis.hset("second", "expiresAt", now - 1)
+    await redis.zadd(EXPIRY_ZSET, {"second": now - 1})
+    assert await sweeper.sweep_once() == 1
+    assert minio.removed == ["blob-object"]
+    assert await redis.exists(blob_key) == 0
@@ -0,0 +1,11 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON response encoded with orjson: faster than json.dumps and produces bytes directly"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
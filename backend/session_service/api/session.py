@@ -4,12 +4,12 @@ from api.router import session_router
 from services.session_logic import auth
 logger = logging.getLogger(__name__)
 from fastapi import HTTPException, Response, Request
-from fastapi.responses import JSONResponse
+from api.responses import OrjsonResponse
 
 
 @session_router.post("/create")
 async def create_session(request: Request):
-    response = JSONResponse(content={"status": "success"})
+    response = OrjsonResponse(content={"status": "success"})
     existing_session = request.cookies.get("session")
 
     if existing_session:
@@ -30,7 +30,7 @@ async def create_session(request: Request):
 @session_router.post("/session_refresh", status_code=status.HTTP_200_OK)
 async def session_refresh(request: Request):
     try:
-        response = JSONResponse(content={"status": "success"})
+        response = OrjsonResponse(content={"status": "success"})
         response = await auth.refresh_cookie(request, response)
         return response
     except ValueError as e:
@@ -4,6 +4,7 @@ import logging
 from typing import Optional
 from functools import lru_cache
 from .redis_factory import create_redis_client
+from metrics import REDIS_CALL_SECONDS, timed
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +18,7 @@ class RedisClient:
     def __init__(self, client: redis.Redis = None):
         self.client = client or get_redis_client()
 
+    @timed(REDIS_CALL_SECONDS.labels(command="set"))
     async def create_session(self, session_id: str, ttl: Optional[int] = None):
         try:
             await self.client.set(name=session_id, value="active", ex=ttl)
@@ -25,6 +27,7 @@ class RedisClient:
             logger.error(f"Redis session creation error {session_id}: {e}")
             raise
 
+    @timed(REDIS_CALL_SECONDS.labels(command="expire"))
     async def refresh_session(self, session_id: str, ttl: int):
         logger.info(f"Refreshing session: {session_id} with new TTL: {ttl}")
         try:
@@ -34,6 +37,7 @@ class RedisClient:
             logger.error(f"✗ Failed to refresh session {session_id}: {e}", exc_info=True)
             raise
 
+    @timed(REDIS_CALL_SECONDS.labels(command="exists"))
     async def exists(self, key: str) -> bool:
         try:
             exists = await self.client.exists(key)
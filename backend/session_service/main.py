@@ -1,9 +1,12 @@
 from fastapi import FastAPI
 from api.session import session_router
+from api.responses import OrjsonResponse
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import make_asgi_app
 
-app = FastAPI(title="Session service")
+app = FastAPI(title="Session service", default_response_class=OrjsonResponse)
 app.include_router(session_router)
+app.mount("/metrics", make_asgi_app())
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -0,0 +1,34 @@
+from functools import wraps
+from time import perf_counter
+from prometheus_client import Histogram
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def timed(child):
+    """Records the duration of an async call into a pre-bound histogram child"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                child.observe(perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+SESSION_OPERATION_SECONDS = Histogram(
+    "session_operation_seconds",
+    "Session endpoint handling time, by operation",
+    ["operation"],
+    buckets=LATENCY_BUCKETS
+)
+
+REDIS_CALL_SECONDS = Histogram(
+    "session_redis_call_seconds",
+    "Session Redis client call latency",
+    ["command"],
+    buckets=LATENCY_BUCKETS
+)
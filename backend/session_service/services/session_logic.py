@@ -2,6 +2,7 @@ import logging
 from uuid import uuid4
 from client.redis_client import redis_client
 from fastapi import HTTPException, Response, Request
+from metrics import SESSION_OPERATION_SECONDS, timed
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +13,7 @@ class Authentication:
         self.session_ttl = 60 * 60 * 24
         logger.info(f"Authentication initialized with TTL: {self.session_ttl}")
 
+    @timed(SESSION_OPERATION_SECONDS.labels(operation="create"))
     async def set_cookie(self, response):
         logger.info("=== set_cookie called ===")
         try:
@@ -29,6 +31,7 @@ class Authentication:
             logger.error(f"✗ Failed in set_cookie: {e}", exc_info=True)
             raise
 
+    @timed(SESSION_OPERATION_SECONDS.labels(operation="refresh"))
     async def refresh_cookie(self, request: Request, response: Response):
         existing_session = request.cookies.get("session", None)
 
@@ -0,0 +1,80 @@
+"""
+Скільки байтів економить стиснення і скільки CPU коштує на один запит.
+
+Запуск з каталогу text_service:
+    python -m benchmarks.bench_compression
+    python -m benchmarks.bench_compression --samples ./notes --train-dict zstd.dict
+
+--samples - каталог з прикладами нотаток (по одній у файлі), інакше синтетичний текст.
+--train-dict - навчити словник на прикладах і зберегти (далі COMPRESSION_DICT_PATH).
+"""
+import argparse
+import random
+import time
+from pathlib import Path
+
+from utils.compression import compress, decompress, train_dictionary
+
+WORDS = (
+    "the note text service redis minio key value error warning info debug request "
+    "response user session password summary expires token line file path return "
+    "def class import async await self data size ttl traceback exception"
+).split()
+
+SIZES = [256, 1024, 4096, 10240, 102400, 1048576]
+
+
+def synthetic_text(size: int, rng: random.Random) -> bytes:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words).encode("utf-8")[:size]
+
+
+def load_samples(path: str) -> list[bytes]:
+    return [p.read_bytes() for p in sorted(Path(path).iterdir()) if p.is_file()]
+
+
+def bench(payload: bytes, iterations: int) -> tuple[int, float, float, str | None]:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        compressed, codec = compress(payload)
+    compress_us = (time.perf_counter() - start) / iterations * 1e6
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        decompress(compressed, codec)
+    decompress_us = (time.perf_counter() - start) / iterations * 1e6
+    return len(compressed), compress_us, decompress_us, codec
+
+
+def main(samples_dir: str | None, train_dict: str | None, iterations: int) -> None:
+    rng = random.Random(42)
+    if samples_dir:
+        payloads = load_samples(samples_dir)
+    else:
+        payloads = [synthetic_text(size, rng) for size in SIZES]
+
+    if train_dict:
+        dict_samples = payloads if samples_dir else [synthetic_text(512, rng) for _ in range(2000)]
+        Path(train_dict).write_bytes(train_dictionary(dict_samples))
+        print(f"dictionary written to {train_dict}")
+
+    print(f"{'size':>9} {'stored':>9} {'saved':>7} {'codec':>12} {'comp us':>9} {'decomp us':>10}")
+    for payload in payloads:
+        n = max(1, iterations * 1024 // max(len(payload), 1024))
+        stored, compress_us, decompress_us, codec = bench(payload, n)
+        saved = 1 - stored / len(payload) if payload else 0
+        print(f"{len(payload):>9} {stored:>9} {saved:>6.1%} {str(codec):>12} {compress_us:>9.1f} {decompress_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples")
+    parser.add_argument("--train-dict")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    main(args.samples, args.train_dict, args.iterations)
@@ -0,0 +1,216 @@
+"""
+Навантажувальні сценарії повного шляху запиту: SessionMiddleware -> text_service -> Redis/MinIO,
+опційно далі в ai_service. Для кожного сценарію - RPS і p50/p95/p99 у JSON (benchmarks.report).
+
+Сценарії:
+    create_small     POST /api/text/ з нотаткою ~1 KB
+    get_small        GET /api/text/ заздалегідь створених малих нотаток
+    get_large        GET великої нотатки (MinIO), --large-size байт
+    read_once        GET одноразових нотаток, кожна читається один раз
+    password_verify  POST /api/text/verify (bcrypt)
+    mixed            суміш: 70% get_small, 15% create_small, 10% get_large, 5% password_verify
+    ai_summarize     POST ai_service /api/v1/text/summarize_note (лише з --ai-url, кличе LLM)
+
+За замовчуванням застосунок запускається в процесі (httpx.ASGITransport) проти Redis і MinIO з .env,
+наприклад контейнерів з docker-compose; сесія записується прямо в Redis.
+З --url навантаження йде по HTTP на запущений сервіс (напряму чи через nginx),
+сесія створюється через session_service (--session-url, за замовчуванням той самий адрес).
+
+Запуск з каталогу text_service:
+    python -m benchmarks.bench_load --requests 2000 --concurrency 50 --output load.json
+    python -m benchmarks.bench_load --url http://localhost --scenarios get_small,mixed
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+import httpx
+
+from benchmarks.bench_compression import synthetic_text
+from benchmarks.report import summarize, write_report
+
+SCENARIOS = ["create_small", "get_small", "get_large", "read_once", "password_verify", "mixed", "ai_summarize"]
+MIXED_WEIGHTS = {"get_small": 70, "create_small": 15, "get_large": 10, "password_verify": 5}
+PASSWORD = "bench-password"
+TTL = 3600
+
+
+class LoadContext:
+    """Клієнти і заздалегідь створені нотатки для сценаріїв"""
+
+    def __init__(self, client: httpx.AsyncClient, ai_client: httpx.AsyncClient | None, args):
+        self.client = client
+        self.ai_client = ai_client
+        self.args = args
+        self.rng = random.Random(0)
+        self.small_text = synthetic_text(1024, self.rng).decode("utf-8")
+        self.large_text = synthetic_text(args.large_size, self.rng).decode("utf-8")
+        self.small_keys: list[str] = []
+        self.large_keys: list[str] = []
+        self.read_once_keys: list[str] = []
+        self.password_key: str | None = None
+
+    async def create(self, text: str, only_one_read: bool = False, password: str | None = None) -> str:
+        response = await self.client.post(
+            "/api/text/",
+            json={"text": text, "ttl": TTL, "only_one_read": only_one_read, "password": password}
+        )
+        response.raise_for_status()
+        return response.json()["key"]
+
+    async def prepare(self, scenarios: list[str]) -> None:
+        needs = set(scenarios)
+        if "mixed" in needs:
+            needs |= set(MIXED_WEIGHTS)
+        if needs & {"get_small", "ai_summarize"}:
+            self.small_keys = await asyncio.gather(*(self.create(self.small_text) for _ in range(100)))
+        if "get_large" in needs:
+            self.large_keys = await asyncio.gather(*(self.create(self.large_text) for _ in range(10)))
+        if "password_verify" in needs:
+            self.password_key = await self.create(self.small_text, password=PASSWORD)
+        if "read_once" in needs:
+            semaphore = asyncio.Semaphore(self.args.concurrency)
+
+            async def create_once() -> str:
+                async with semaphore:
+                    return await self.create(self.small_text, only_one_read=True)
+
+            # Кожен запит (і прогрівальний теж) забирає свою нотатку
+            count = self.args.requests + self.args.warmup
+            self.read_once_keys = await asyncio.gather(*(create_once() for _ in range(count)))
+
+    async def create_small(self) -> int:
+        response = await self.client.post(
+            "/api/text/",
+            json={"text": self.small_text, "ttl": TTL, "only_one_read": False}
+        )
+        return response.status_code
+
+    async def get_small(self) -> int:
+        response = await self.client.get("/api/text/", params={"key": self.rng.choice(self.small_keys)})
+        return response.status_code
+
+    async def get_large(self) -> int:
+        response = await self.client.get("/api/text/", params={"key": self.rng.choice(self.large_keys)})
+        return response.status_code
+
+    async def read_once(self) -> int:
+        response = await self.client.get("/api/text/", params={"key": self.read_once_keys.pop()})
+        return response.status_code
+
+    async def password_verify(self) -> int:
+        response = await self.client.post(
+            "/api/text/verify",
+            params={"key": self.password_key},
+            json={"password": PASSWORD}
+        )
+        return response.status_code
+
+    async def mixed(self) -> int:
+        name = self.rng.choices(list(MIXED_WEIGHTS), weights=list(MIXED_WEIGHTS.values()))[0]
+        return await getattr(self, name)()
+
+    async def ai_summarize(self) -> int:
+        response = await self.ai_client.post(
+            "/api/v1/text/summarize_note",
+            json={"key": self.rng.choice(self.small_keys)}
+        )
+        return response.status_code
+
+
+async def run_scenario(request, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                status = await request()
+            except httpx.HTTPError:
+                status = None
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status is None or status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def open_session(args) -> tuple[httpx.AsyncBaseTransport | None, dict]:
+    """Транспорт для клієнта і cookie сесії"""
+    if args.url is None:
+        # Імпорт тут: застосунок створює клієнти Redis/MinIO з .env
+        from main import app
+        from clients.session_redis_client import session_redis_client
+
+        session_id = str(uuid.uuid4())
+        await session_redis_client.client.set(session_id, "bench", ex=TTL)
+        return httpx.ASGITransport(app=app), {"session": session_id}
+
+    async with httpx.AsyncClient(base_url=args.session_url or args.url) as client:
+        response = await client.post("/api/session/create")
+        response.raise_for_status()
+        return None, {"session": response.cookies["session"]}
+
+
+async def main(args) -> None:
+    scenarios = args.scenarios.split(",") if args.scenarios else [s for s in SCENARIOS if s != "ai_summarize"]
+    if "ai_summarize" in scenarios and not args.ai_url:
+        raise SystemExit("ai_summarize needs --ai-url")
+
+    transport, cookies = await open_session(args)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url=args.url or "http://bench",
+        cookies=cookies,
+        limits=limits,
+        timeout=60
+    ) as client:
+        ai_client = None
+        if args.ai_url:
+            ai_client = httpx.AsyncClient(base_url=args.ai_url, cookies=cookies, limits=limits, timeout=120)
+        try:
+            context = LoadContext(client, ai_client, args)
+            await context.prepare(scenarios)
+            results = {}
+            for name in scenarios:
+                request = getattr(context, name)
+                if args.warmup:
+                    await run_scenario(request, args.warmup, args.concurrency)
+                results[name] = await run_scenario(request, args.requests, args.concurrency)
+        finally:
+            if ai_client is not None:
+                await ai_client.aclose()
+
+    write_report(
+        "load",
+        {
+            "target": args.url or "in-process",
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "large_size": args.large_size,
+        },
+        results,
+        args.output
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="адреса запущеного text_service або nginx; без неї - в процесі")
+    parser.add_argument("--session-url", help="адреса session_service, якщо відрізняється від --url")
+    parser.add_argument("--ai-url", help="адреса ai_service для сценарію ai_summarize")
+    parser.add_argument("--scenarios", help=f"через кому з {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--large-size", type=int, default=256 * 1024)
+    parser.add_argument("--output", help="файл для JSON, інакше stdout")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""
+CPU на логування одного запиту: попередні eager f-string INFO логи з синхронним
+StreamHandler проти ледачих логів через чергу з семплюванням (logging_config).
+thread_time - час потоку event loop, process_time - разом з потоком QueueListener.
+Вивід іде в /dev/null, тож вимірюється саме форматування і диспетчеризація.
+
+Запуск з каталогу text_service:
+    python -m benchmarks.bench_logging --requests 20000 --text-size 10240
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+from logging_config import setup_logging, RouteSampler
+
+logger = logging.getLogger("bench")
+
+
+def legacy_request(key: str, value: dict, path: str) -> None:
+    """Набір логів одного POST + GET до переходу на ледаче логування"""
+    logger.info(f"✓ Valid session: 3f1c2a9e-5b7d-4c8e-9a1f-2d3e4f5a6b7c for path: {path}")
+    logger.info(f"HSET {key} -> {value}")
+    logger.info(f"EXISTS key={key} exists={True}")
+    logger.info(f"✓ Public request allowed: GET {path}")
+    logger.info(f"GET HASH key={key} -> Found")
+
+
+def lazy_request(key: str, value: dict, path: str) -> None:
+    logger.debug("✓ Valid session for path: %s", path)
+    logger.debug("HSET %s fields=%d replace=%s", key, len(value), False)
+    logger.debug("EXISTS key=%s exists=%s", key, True)
+    logger.debug("✓ Public request allowed: %s %s", "GET", path)
+    logger.debug("GET HASH key=%s -> Found", key)
+
+
+def measure(request, sampler: RouteSampler | None, requests: int, value: dict, drain=None) -> tuple[float, float]:
+    """drain - зупинка listener: process_time враховує і дописування черги"""
+    path = "/api/text/"
+    thread_start = time.thread_time()
+    process_start = time.process_time()
+    for i in range(requests):
+        if sampler is not None:
+            sampler.sample(path)
+        request(f"k{i:04d}", value, path)
+    thread_cpu = time.thread_time() - thread_start
+    if drain is not None:
+        drain()
+    process_cpu = time.process_time() - process_start
+    return thread_cpu / requests * 1e6, process_cpu / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--text-size", type=int, default=10240)
+    parser.add_argument("--sample-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    value = {
+        "text": "x" * args.text_size,
+        "creator": "3f1c2a9e-5b7d-4c8e-9a1f-2d3e4f5a6b7c",
+        "size": args.text_size,
+        "only_one_read": False,
+        "password": "$2b$12$" + "a" * 53,
+        "summary": None,
+    }
+    devnull = open(os.devnull, "w")
+    root = logging.getLogger()
+
+    root.handlers[:] = [logging.StreamHandler(devnull)]
+    root.setLevel(logging.INFO)
+    results = [("legacy f-string INFO, sync handler", *measure(legacy_request, None, args.requests, value))]
+
+    stderr, sys.stderr = sys.stderr, devnull
+    try:
+        listener = setup_logging(level="INFO")
+        results.append(("lazy, level INFO", *measure(lazy_request, None, args.requests, value, listener.stop)))
+
+        for rate in (1.0, args.sample_rate):
+            listener = setup_logging(level="DEBUG")
+            sampler = RouteSampler(1.0, {"/api/text/": rate})
+            results.append((
+                f"lazy, level DEBUG, sample {rate}",
+                *measure(lazy_request, sampler, args.requests, value, listener.stop)
+            ))
+    finally:
+        sys.stderr = stderr
+
+    print(f"{args.requests} requests, text {args.text_size} bytes")
+    print(f"{'variant':<40} {'loop us/req':>12} {'total us/req':>13}")
+    for name, thread_us, process_us in results:
+        print(f"{name:<40} {thread_us:>12.2f} {process_us:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
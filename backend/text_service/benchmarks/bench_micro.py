@@ -0,0 +1,214 @@
+"""
+Мікробенчмарки гарячих шляхів без мережі:
+- кодування запису для HSET (RedisService.build_small_record + RedisClient._record) і розбір HGETALL
+  у компактному форматі (packed) і старому полі-на-атрибут (hash);
+- generate_key;
+- bcrypt hash/verify (раунди з BCRYPT_ROUNDS);
+- SessionMiddleware: прохід запиту до застосунку з кешованою сесією, публічний і без cookie;
+- серіалізація відповіді GET за розміром тексту: response_model + JSONResponse (json.dumps),
+  response_model + OrjsonResponse і готове тіло encode_text_get_response, через FastAPI-роут.
+
+Кожен бенчмарк - --rounds замірів по number викликів; перцентилі рахуються по часу одного виклику в замірі.
+
+Запуск з каталогу text_service:
+    python -m benchmarks.bench_micro --output micro.json
+    python -m benchmarks.bench_micro --only generate_key,session_cached
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from clients.redis_client import RedisClient
+from config import password_settings
+from middleware.cookie_middleware import SessionMiddleware
+from schemas.text import TextCreateRequest, TextGetResponse, encode_text_get_response
+from services.redis_service import RedisService
+from utils.responses import EncodedJSONResponse, OrjsonResponse
+from utils.utils import generate_key, hash_password, verify_password
+from benchmarks.bench_compression import synthetic_text
+from benchmarks.report import summarize, write_report
+
+PUBLIC_METHODS = {"/api/text/": ["GET"], "/api/text/verify": ["POST"]}
+
+
+def note_request(size: int) -> TextCreateRequest:
+    text = synthetic_text(size, random.Random(size)).decode("utf-8")
+    return TextCreateRequest(text=text, ttl=3600, only_one_read=False, summary="short summary")
+
+
+def _client(record_format: str) -> RedisClient:
+    # Лише кодування: з'єднання з Redis не відкривається
+    client = RedisClient.__new__(RedisClient)
+    client.record_format = record_format
+    return client
+
+
+def encode_record(size: int, record_format: str):
+    data = note_request(size)
+    client = _client(record_format)
+
+    def run():
+        record = RedisService.build_small_record(data, creator="bench", size=size, password=None)
+        client._record(record)
+    return run
+
+
+def decode_record(size: int, record_format: str):
+    data = note_request(size)
+    record = RedisService.build_small_record(data, creator="bench", size=size, password=None)
+    # HGETALL повертає bytes
+    raw = {
+        k.encode(): v if isinstance(v, bytes) else v.encode()
+        for k, v in _client(record_format)._record(record).items()
+    }
+
+    def run():
+        # _decode забирає поле r зі словника
+        RedisService._decompress(RedisClient._decode(dict(raw)))
+    return run
+
+
+class _SessionStore:
+    async def exists(self, session_id: str) -> bool:
+        return session_id == "valid"
+
+
+async def _app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+def session_dispatch(method: str, cookie: bytes | None):
+    middleware = SessionMiddleware(_app, session_redis=_SessionStore(), public_methods=PUBLIC_METHODS)
+    headers = [(b"host", b"bench")]
+    if cookie is not None:
+        headers.append((b"cookie", cookie))
+
+    async def run():
+        scope = {"type": "http", "method": method, "path": "/api/text/", "headers": headers, "state": {}}
+        await middleware(scope, _receive, _send)
+    return run
+
+
+def serialize_response(size: int, mode: str):
+    text = synthetic_text(size, random.Random(size)).decode("utf-8")
+    app = FastAPI()
+
+    if mode == "encoded":
+        @app.get("/", response_model=TextGetResponse)
+        async def route():
+            return EncodedJSONResponse(encode_text_get_response(text, size, "short summary"))
+    else:
+        response_class = OrjsonResponse if mode == "orjson" else JSONResponse
+
+        @app.get("/", response_model=TextGetResponse, response_class=response_class)
+        async def route():
+            return TextGetResponse(text=text, size=size, summary="short summary")
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/", "raw_path": b"/", "root_path": "",
+        "query_string": b"", "headers": [], "http_version": "1.1", "scheme": "http",
+        "server": ("bench", 80), "client": ("bench", 1), "state": {},
+    }
+
+    async def run():
+        await app(dict(scope), _receive, _send)
+    return run
+
+
+def password_hash():
+    return lambda: hash_password("bench-password", password_settings.BCRYPT_ROUNDS)
+
+
+def password_verify():
+    hashed = hash_password("bench-password", password_settings.BCRYPT_ROUNDS)
+    return lambda: verify_password("bench-password", hashed)
+
+
+# name -> (фабрика, викликів на замір)
+BENCHMARKS = {
+    "encode_record_1k": (lambda: encode_record(1024, "packed"), 1000),
+    "encode_record_10k": (lambda: encode_record(10 * 1024 - 1, "packed"), 200),
+    "decode_record_1k": (lambda: decode_record(1024, "packed"), 1000),
+    "decode_record_10k": (lambda: decode_record(10 * 1024 - 1, "packed"), 200),
+    "encode_record_hash_1k": (lambda: encode_record(1024, "hash"), 1000),
+    "decode_record_hash_1k": (lambda: decode_record(1024, "hash"), 1000),
+    "decode_record_hash_10k": (lambda: decode_record(10 * 1024 - 1, "hash"), 200),
+    "generate_key": (lambda: lambda: generate_key(3600), 10000),
+    "password_hash": (password_hash, 1),
+    "password_verify": (password_verify, 1),
+    "session_cached": (lambda: session_dispatch("POST", b"session=valid"), 2000),
+    "session_public": (lambda: session_dispatch("GET", None), 2000),
+    "session_missing": (lambda: session_dispatch("POST", None), 2000),
+}
+for _label, _size, _number in (("1k", 1024, 2000), ("10k", 10 * 1024, 1000), ("100k", 100 * 1024, 200)):
+    for _mode in ("json", "orjson", "encoded"):
+        BENCHMARKS[f"serialize_{_mode}_{_label}"] = (
+            lambda size=_size, mode=_mode: serialize_response(size, mode), _number
+        )
+
+
+async def measure(fn, number: int, rounds: int) -> dict:
+    is_async = asyncio.iscoroutinefunction(fn)
+    # Прогрів: кеш сесій, словник zstd, ліниві імпорти
+    if is_async:
+        await fn()
+    else:
+        fn()
+
+    per_call_ms = []
+    total = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        if is_async:
+            for _ in range(number):
+                await fn()
+        else:
+            for _ in range(number):
+                fn()
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        per_call_ms.append(elapsed / number * 1000)
+    stats = summarize(per_call_ms, total)
+    # summarize рахує заміри, а не виклики
+    stats["requests"] = number * rounds
+    stats["rps"] = round(number * rounds / total, 1)
+    return stats
+
+
+async def main(rounds: int, only: list[str] | None, output: str | None) -> None:
+    # Записи логів створюються як у сервісі, але нікуди не пишуться
+    logging.getLogger().addHandler(logging.NullHandler())
+    results = {}
+    for name, (factory, number) in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        results[name] = await measure(factory(), number, rounds)
+    write_report(
+        "micro",
+        {"rounds": rounds, "bcrypt_rounds": password_settings.BCRYPT_ROUNDS},
+        results,
+        output
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--only", help="список бенчмарків через кому")
+    parser.add_argument("--output", help="файл для JSON, інакше stdout")
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.only.split(",") if args.only else None, args.output))
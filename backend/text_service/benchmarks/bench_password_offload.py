@@ -0,0 +1,71 @@
+"""
+p50/p99 незахищених GET (RedisClient.get) поки паралельно йдуть перевірки паролів:
+bcrypt прямо в корутині проти PasswordService (пул процесів).
+
+Запуск з каталогу text_service проти Redis з .env:
+    python -m benchmarks.bench_password_offload --gets 500 --verifiers 4
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from clients.redis_client import RedisClient
+from config import password_settings
+from services.password_service import PasswordService
+from utils.utils import hash_password, verify_password
+
+KEY = "bench:password:plain"
+NOTE = {"text": "x" * 512, "creator": "bench", "size": 512, "only_one_read": False}
+
+
+async def inline_verify(hashed: str) -> None:
+    verify_password("secret", hashed)
+
+
+async def run(client: RedisClient, verify, hashed: str, gets: int, verifiers: int) -> list[float]:
+    stop = asyncio.Event()
+
+    async def verifier():
+        while not stop.is_set():
+            await verify(hashed)
+            await asyncio.sleep(0)
+
+    tasks = [asyncio.create_task(verifier()) for _ in range(verifiers)]
+    timings = []
+    for _ in range(gets):
+        start = time.perf_counter()
+        await client.get(KEY)
+        timings.append((time.perf_counter() - start) * 1000)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{name:<8} GET p50={statistics.median(timings):.3f}ms p99={p99:.3f}ms")
+
+
+async def main(gets: int, verifiers: int) -> None:
+    hashed = hash_password("secret", password_settings.BCRYPT_ROUNDS)
+    service = PasswordService(
+        executor=password_settings.PASSWORD_EXECUTOR,
+        workers=password_settings.PASSWORD_WORKERS,
+        max_concurrency=password_settings.PASSWORD_MAX_CONCURRENCY,
+        rounds=password_settings.BCRYPT_ROUNDS
+    )
+    async with RedisClient() as client:
+        await client.set(KEY, NOTE, ttl=600, replace=True)
+        report("inline", await run(client, inline_verify, hashed, gets, verifiers))
+        report("offload", await run(client, lambda h: service.verify("secret", h), hashed, gets, verifiers))
+    service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gets", type=int, default=500)
+    parser.add_argument("--verifiers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.gets, args.verifiers))
@@ -0,0 +1,62 @@
+"""
+Порівняння read-once GET: старий шлях (HGETALL + EXISTS + ZREM + DEL)
+проти одного EVALSHA (RedisClient.get_and_claim).
+
+Запуск з каталогу text_service проти Redis з .env:
+    python -m benchmarks.bench_read_once --iterations 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from clients.redis_client import RedisClient, EXPIRY_ZSET
+
+NOTE = {
+    "text": "x" * 512,
+    "creator": "bench",
+    "size": 512,
+    "only_one_read": True,
+    "password": None,
+    "summary": None,
+}
+
+
+async def legacy_read_once(client: RedisClient, key: str) -> None:
+    await client.get(key)
+    if await client.redis.exists(key):
+        await client.redis.zrem(EXPIRY_ZSET, key)
+        await client.redis.delete(key)
+
+
+async def claim_read_once(client: RedisClient, key: str) -> None:
+    await client.get_and_claim(key)
+
+
+async def measure(client: RedisClient, fn, iterations: int) -> list[float]:
+    timings = []
+    for i in range(iterations):
+        key = f"bench:read_once:{i}"
+        await client.set(key, NOTE, ttl=60)
+        start = time.perf_counter()
+        await fn(client, key)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{name:<10} p50={statistics.median(timings):.3f}ms p99={p99:.3f}ms")
+
+
+async def main(iterations: int) -> None:
+    async with RedisClient() as client:
+        report("legacy", await measure(client, legacy_read_once, iterations))
+        report("evalsha", await measure(client, claim_read_once, iterations))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().iterations))
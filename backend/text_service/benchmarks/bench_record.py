@@ -0,0 +1,85 @@
+"""
+Формат запису нотатки в Redis: компактний (packed, одне поле r) проти поля-на-атрибут (hash).
+Для кожного розміру малої нотатки записує --notes нотаток кожним форматом у Redis з .env і виводить
+пам'ять Redis на нотатку (MEMORY USAGE), час HGETALL + розбору і лише розбору на один GET.
+Ключі створюються з префіксом bench:record: і видаляються після заміру.
+
+Запуск з каталогу text_service:
+    python -m benchmarks.bench_record
+    python -m benchmarks.bench_record --notes 2000 --sizes 64,1024,8192
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from clients.redis_client import RedisClient
+from schemas.text import TextCreateRequest
+from services.redis_service import RedisService
+from benchmarks.bench_compression import synthetic_text
+
+FORMATS = ["hash", "packed"]
+SIZES = [64, 512, 1024, 4096, 10239]
+PREFIX = "bench:record:"
+
+
+async def bench(client: RedisClient, size: int, notes: int) -> dict:
+    text = synthetic_text(size, random.Random(size)).decode("utf-8")
+    data = TextCreateRequest(text=text, ttl=3600, only_one_read=False, summary="short summary")
+    record = RedisService.build_small_record(data, creator="bench-session-id", size=size, password=None)
+    keys = [f"{PREFIX}{client.record_format}:{size}:{i}" for i in range(notes)]
+    try:
+        for start in range(0, notes, 500):
+            await client.create_many([(key, record, 3600) for key in keys[start:start + 500]])
+
+        async with client.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.memory_usage(key, samples=0)
+            memory = await pipe.execute()
+
+        raw = []
+        start = time.perf_counter()
+        for key in keys:
+            raw.append(await client.redis.hgetall(key))
+            RedisService._decompress(RedisClient._decode(dict(raw[-1])))
+        get_us = (time.perf_counter() - start) / notes * 1e6
+
+        start = time.perf_counter()
+        for data in raw:
+            RedisService._decompress(RedisClient._decode(data))
+        decode_us = (time.perf_counter() - start) / notes * 1e6
+    finally:
+        for start in range(0, notes, 500):
+            await client.redis.delete(*keys[start:start + 500])
+
+    return {
+        "bytes_per_note": sum(memory) / notes,
+        "fields": len(raw[0]),
+        "get_us": get_us,
+        "decode_us": decode_us,
+    }
+
+
+async def main(sizes: list[int], notes: int) -> None:
+    clients = {record_format: RedisClient(record_format=record_format) for record_format in FORMATS}
+    print(f"{'size':>7} {'format':>7} {'fields':>7} {'bytes/note':>11} {'GET us':>8} {'decode us':>10}")
+    try:
+        for size in sizes:
+            for record_format, client in clients.items():
+                stats = await bench(client, size, notes)
+                print(
+                    f"{size:>7} {record_format:>7} {stats['fields']:>7} {stats['bytes_per_note']:>11.0f} "
+                    f"{stats['get_us']:>8.1f} {stats['decode_us']:>10.2f}"
+                )
+    finally:
+        for client in clients.values():
+            await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--sizes", help="розміри тексту в байтах через кому")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else SIZES
+    asyncio.run(main(sizes, args.notes))
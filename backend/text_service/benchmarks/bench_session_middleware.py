@@ -0,0 +1,110 @@
+"""
+Requests/sec через SessionMiddleware: попередня реалізація на BaseHTTPMiddleware
+проти pure ASGI, без кешу сесій і з кешем.
+Redis замінено in-memory сховищем із затримкою --rtt-ms, щоб імітувати мережу.
+
+Запуск з каталогу text_service:
+    python -m benchmarks.bench_session_middleware --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware.cookie_middleware import SessionMiddleware
+
+PUBLIC_METHODS = {"/api/text/": ["GET"], "/api/text/verify": ["POST"]}
+EXCLUDE_PATHS = ["/docs", "/openapi.json", "/redoc", "/health"]
+
+
+class FakeSessionStore:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+
+    async def exists(self, session_id: str) -> bool:
+        await asyncio.sleep(self.rtt)
+        return session_id == "valid"
+
+
+class LegacySessionMiddleware(BaseHTTPMiddleware):
+    """Логіка SessionMiddleware до переходу на pure ASGI"""
+
+    def __init__(self, app, session_redis, exclude_paths, public_methods):
+        super().__init__(app)
+        self.session_redis = session_redis
+        self.exclude_paths = exclude_paths
+        self.public_methods = public_methods
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method == "OPTIONS":
+            return await call_next(request)
+        if any(request.url.path.startswith(p) for p in self.exclude_paths):
+            return await call_next(request)
+        for public_path, methods in self.public_methods.items():
+            if request.url.path.startswith(public_path) and request.method in methods:
+                request.state.session_id = None
+                return await call_next(request)
+        session_id = request.cookies.get("session")
+        if not session_id:
+            return JSONResponse(status_code=401, content={"detail": "Authentication required"})
+        if not await self.session_redis.exists(session_id):
+            return JSONResponse(status_code=401, content={"detail": "Session expired or invalid"})
+        request.state.session_id = session_id
+        return await call_next(request)
+
+
+def build_app(middleware, store, **kwargs) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/text/")
+    async def create(request: Request):
+        return {"session": request.state.session_id}
+
+    app.add_middleware(
+        middleware,
+        session_redis=store,
+        exclude_paths=EXCLUDE_PATHS,
+        public_methods=PUBLIC_METHODS,
+        **kwargs
+    )
+    return app
+
+
+async def run(app: FastAPI, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies={"session": "valid"}) as client:
+        queue = iter(range(requests))
+
+        async def worker():
+            for _ in queue:
+                response = await client.post("/api/text/")
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int, concurrency: int, rtt_ms: float) -> None:
+    store = FakeSessionStore(rtt_ms / 1000)
+    variants = {
+        "legacy": build_app(LegacySessionMiddleware, store),
+        "asgi": build_app(SessionMiddleware, store, cache_ttl=0, negative_cache_ttl=0),
+        "asgi+cache": build_app(SessionMiddleware, store),
+    }
+    for name, app in variants.items():
+        rps = await run(app, requests, concurrency)
+        print(f"{name:<12} {rps:>9.0f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.rtt_ms))
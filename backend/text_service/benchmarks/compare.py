@@ -0,0 +1,64 @@
+"""
+Порівняння двох JSON-звітів bench_micro/bench_load (наприклад, main проти гілки).
+Код виходу 1, якщо p95 чи p99 зросли або RPS впав більше ніж на --threshold відсотків.
+
+Запуск з каталогу text_service:
+    python -m benchmarks.compare base.json new.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# Метрика -> чи краще, коли вона більша
+METRICS = {"rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False}
+# Регресією вважаються лише хвости і пропускна здатність, p50 виводиться для довідки
+GATED = {"rps", "p95_ms", "p99_ms"}
+
+
+def change(base: float, new: float) -> float:
+    return (new - base) / base * 100 if base else 0.0
+
+
+def compare(base: dict, new: dict, threshold: float) -> list[str]:
+    regressions = []
+    print(f"base {base.get('commit')}  ->  new {new.get('commit')}  ({base['suite']})")
+    print(f"{'name':<28}" + "".join(f"{metric:>26}" for metric in METRICS))
+    for name, new_stats in new["results"].items():
+        base_stats = base["results"].get(name)
+        if base_stats is None:
+            print(f"{name:<28} (new)")
+            continue
+        row = f"{name:<28}"
+        for metric, higher_is_better in METRICS.items():
+            delta = change(base_stats[metric], new_stats[metric])
+            worse = -delta if higher_is_better else delta
+            mark = "!" if metric in GATED and worse > threshold else " "
+            row += f"{base_stats[metric]:.6g} -> {new_stats[metric]:.6g} {delta:+.0f}%{mark}".rjust(26)
+            if mark == "!":
+                regressions.append(f"{name} {metric} {delta:+.1f}%")
+        print(row)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="допустиме погіршення, %%")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if base["suite"] != new["suite"]:
+        sys.exit(f"different suites: {base['suite']} vs {new['suite']}")
+
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print("regressions: " + ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
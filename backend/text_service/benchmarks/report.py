@@ -0,0 +1,66 @@
+"""
+Спільний формат результатів бенчмарків: перцентилі затримок, RPS і метадані запуску в JSON,
+щоб результати двох комітів можна було порівняти (benchmarks.compare).
+"""
+import json
+import platform
+import subprocess
+import sys
+import time
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Перцентиль за методом nearest-rank; samples мають бути відсортовані"""
+    if not samples:
+        return 0.0
+    rank = max(1, round(q / 100 * len(samples)))
+    return samples[min(rank, len(samples)) - 1]
+
+
+def summarize(latencies_ms: list[float], elapsed: float, errors: int = 0) -> dict:
+    samples = sorted(latencies_ms)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(samples) / len(samples), 4) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50), 4),
+        "p95_ms": round(percentile(samples, 95), 4),
+        "p99_ms": round(percentile(samples, 99), 4),
+        "max_ms": round(samples[-1], 4) if samples else 0.0,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(suite: str, params: dict, results: dict, output: str | None) -> None:
+    """Друкує таблицю в stderr, JSON - у файл output або stdout"""
+    report = {
+        "suite": suite,
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+    print(f"{'name':<28} {'rps':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>7}", file=sys.stderr)
+    for name, stats in results.items():
+        print(
+            f"{name:<28} {stats['rps']:>10.1f} {stats['p50_ms']:>10.4f} "
+            f"{stats['p95_ms']:>10.4f} {stats['p99_ms']:>10.4f} {stats['errors']:>7}",
+            file=sys.stderr
+        )
+    data = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
@@ -1,8 +1,13 @@
+import asyncio
 import logging
-from minio import Minio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from miniopy_async import Minio
 from io import BytesIO
 from clients.minio_factory import create_minio_client
+from utils.streams import ClosingStream
 from config import minio_settings
+from metrics import MINIO_CALL_SECONDS, MINIO_IN_FLIGHT, timed
 
 logger = logging.getLogger(__name__)
 
@@ -10,64 +15,164 @@ logger = logging.getLogger(__name__)
 class MinioClient:
     def __init__(self):
         self.bucket = minio_settings.MINIO_BUCKET
-        self.client: Minio = create_minio_client()
+        self._client: Minio | None = None
+        self._init_lock = asyncio.Lock()
+        # Обмежує кількість одночасних запитів до MinIO з одного воркера
+        self._semaphore = asyncio.Semaphore(minio_settings.MINIO_MAX_CONCURRENCY)
 
-    def set(self, object_name: str, data: bytes):
+    async def _get_client(self) -> Minio:
+        # Клієнт і aiohttp-сесія створюються всередині event loop при першому виклику
+        if self._client is None:
+            async with self._init_lock:
+                if self._client is None:
+                    self._client = await create_minio_client()
+        return self._client
+
+    @asynccontextmanager
+    async def _slot(self):
+        async with self._semaphore:
+            MINIO_IN_FLIGHT.inc()
+            try:
+                yield
+            finally:
+                MINIO_IN_FLIGHT.dec()
+
+    @timed(MINIO_CALL_SECONDS.labels(operation="put"))
+    async def set(self, object_name: str, data: bytes):
         try:
-            data_stream = BytesIO(data)
-            self.client.put_object(
-                bucket_name=self.bucket,
-                object_name=object_name,
-                data=data_stream,
-                length=len(data)
-            )
-            logger.info(f"UPLOAD {object_name} size={len(data)}")
+            client = await self._get_client()
+            async with self._slot():
+                await client.put_object(
+                    bucket_name=self.bucket,
+                    object_name=object_name,
+                    data=BytesIO(data),
+                    length=len(data)
+                )
+            logger.debug("UPLOAD %s size=%d", object_name, len(data))
         except Exception as e:
             raise Exception(f"Minio UPLOAD error object_name={object_name}: {e}")
 
-    def get(self, object_name: str) -> bytes:
+    @timed(MINIO_CALL_SECONDS.labels(operation="put_stream"))
+    async def put_stream(self, object_name: str, reader) -> None:
+        """
+        Multipart-завантаження з файлоподібного reader з async read().
+        Розмір невідомий наперед, у пам'яті тримається лише одна частина.
+        """
         try:
-            response = self.client.get_object(self.bucket, object_name)
-            data = response.read()
-            response.close()
-            response.release_conn()
+            client = await self._get_client()
+            async with self._slot():
+                await client.put_object(
+                    bucket_name=self.bucket,
+                    object_name=object_name,
+                    data=reader,
+                    length=-1,
+                    part_size=minio_settings.MINIO_PART_SIZE,
+                    num_parallel_uploads=1
+                )
+            logger.debug("UPLOAD STREAM %s", object_name)
+        except UnicodeDecodeError:
+            raise
+        except Exception as e:
+            raise Exception(f"Minio UPLOAD STREAM error object_name={object_name}: {e}")
 
-            logger.info(f"GET {object_name}")
+    @timed(MINIO_CALL_SECONDS.labels(operation="get"))
+    async def get(self, object_name: str) -> bytes:
+        try:
+            client = await self._get_client()
+            async with self._slot():
+                response = await client.get_object(self.bucket, object_name)
+                try:
+                    data = await response.read()
+                finally:
+                    response.release()
+
+            logger.debug("GET %s", object_name)
             return data
         except Exception as e:
             raise Exception(f"Minio GET error object_name={object_name}: {e}")
 
-    def delete(self, object_name: str) -> bool:
+    @timed(MINIO_CALL_SECONDS.labels(operation="stream_open"))
+    async def stream(self, object_name: str) -> tuple[dict, AsyncIterator[bytes]]:
+        """
+        Відкриває об'єкт і віддає його частинами, не тримаючи весь вміст у пам'яті.
+        Семафор тут не береться: з'єднання зайняте весь час віддачі, його обмежує пул aiohttp.
+        """
+        try:
+            client = await self._get_client()
+            response = await client.get_object(self.bucket, object_name)
+        except Exception as e:
+            raise Exception(f"Minio STREAM error object_name={object_name}: {e}")
+
+        headers = {
+            "Content-Length": response.headers["Content-Length"],
+            "ETag": response.headers["ETag"],
+        }
+        logger.debug("STREAM %s size=%s", object_name, headers['Content-Length'])
+        # З'єднання повертається в пул і тоді, коли віддачу так і не почали
+        return headers, ClosingStream(self._iter_response(response), on_close=response.release)
+
+    @staticmethod
+    async def _iter_response(response) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in response.content.iter_chunked(minio_settings.MINIO_STREAM_CHUNK_SIZE):
+                yield chunk
+        finally:
+            response.release()
+
+    @timed(MINIO_CALL_SECONDS.labels(operation="delete"))
+    async def delete(self, object_name: str) -> bool:
         try:
-            exist = self._exists(object_name)
+            exist = await self._exists(object_name)
             if exist:
-                self.client.remove_object(self.bucket, object_name)
-                logger.info(f"DELETE {object_name}")
+                client = await self._get_client()
+                async with self._slot():
+                    await client.remove_object(self.bucket, object_name)
+                logger.debug("DELETE %s", object_name)
                 return True
             return False
 
         except Exception as e:
             raise Exception(f"Minio DELETE error object_name={object_name}: {e}")
 
-    def update(self, object_name: str, data: bytes) -> bool:
+    async def update(self, object_name: str, data: bytes) -> bool:
         try:
-            exist = self._exists(object_name)
+            exist = await self._exists(object_name)
             if exist:
-                self.set(object_name, data)
-                logger.info(f"UPDATE {object_name}")
+                await self.set(object_name, data)
+                logger.debug("UPDATE %s", object_name)
                 return True
             return False
 
         except Exception as e:
             raise Exception(f"Minio UPDATE error object_name={object_name}: {e}")
 
-    def _exists(self, object_name: str) -> bool:
+    @timed(MINIO_CALL_SECONDS.labels(operation="stat"))
+    async def _exists(self, object_name: str) -> bool:
         try:
-            stat = self.client.stat_object(self.bucket, object_name)
+            client = await self._get_client()
+            async with self._slot():
+                stat = await client.stat_object(self.bucket, object_name)
             return stat is not None
         except Exception as e:
-            logger.debug(f"Object {object_name} not found: {e}")
+            logger.debug("Object %s not found: %s", object_name, e)
             return False
 
+    async def ping(self) -> bool:
+        # Без семафора: перевірка готовності міряє сам MinIO, а не чергу запитів воркера
+        client = await self._get_client()
+        return await client.bucket_exists(self.bucket)
+
+    async def warm_up(self, connections: int) -> None:
+        """Створює клієнт і відкриває connections keep-alive з'єднань пулу aiohttp до прийому трафіку"""
+        client = await self._get_client()
+        await asyncio.gather(*(client.bucket_exists(self.bucket) for _ in range(connections)))
+        logger.info("MinIO pool warmed up: connections=%d", connections)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close_session()
+            self._client = None
+            logger.info("Close MinIO connection")
+
 
 minio_client = MinioClient()
@@ -1,18 +1,30 @@
-from minio import Minio
+import aiohttp
+from miniopy_async import Minio
 from config import minio_settings
 
 
-def create_minio_client() -> Minio:
+async def create_minio_client() -> Minio:
     settings = minio_settings
 
+    # Власний connector: пул keep-alive з'єднань до MinIO замість дефолтного
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=settings.MINIO_POOL_SIZE,
+            limit_per_host=settings.MINIO_POOL_SIZE,
+            keepalive_timeout=settings.MINIO_KEEPALIVE_TIMEOUT
+        ),
+        timeout=aiohttp.ClientTimeout(total=settings.MINIO_REQUEST_TIMEOUT)
+    )
+
     client = Minio(
         endpoint=settings.MINIO_ENDPOINT,
         access_key=settings.MINIO_ACCESS_KEY,
         secret_key=settings.MINIO_SECRET_KEY,
         secure=settings.MINIO_SECURE,
+        session=session,
     )
 
-    if not client.bucket_exists(settings.MINIO_BUCKET):
-        client.make_bucket(settings.MINIO_BUCKET)
+    if not await client.bucket_exists(settings.MINIO_BUCKET):
+        await client.make_bucket(settings.MINIO_BUCKET)
 
     return client
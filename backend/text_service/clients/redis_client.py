@@ -1,14 +1,159 @@
+import asyncio
 import logging
 from typing import Optional
 
 from clients.redis_factory import create_redis_client
+from config import app_settings
+from metrics import REDIS_CALL_SECONDS, REDIS_POOL_CONNECTIONS, timed
+from utils.record import RECORD_FIELD, pack_record, unpack_record
 
 logger = logging.getLogger(__name__)
 
+EXPIRY_ZSET = "notes:expiry"
+# notes:blob:<sha256> - спільне тіло великих нотаток: object (ім'я в MinIO), codec, bytes, refs
+BLOB_PREFIX = "notes:blob:"
+# Резерв великої нотатки, тіло якої ще завантажується: читання бачать її як відсутню
+PENDING_FIELD = "pending"
+
+# Читає hash і, якщо нотатка одноразова та без пароля, видаляє її в тому ж виклику.
+# Компактний запис (поле r) несе це як біт 1 другого байта заголовка, старий - окремими полями.
+# Для нотаток, що лишились, додає псевдополе pttl (залишок TTL в мс) для кешу.
+# Нотатка з полем pending (тіло ще завантажується) - як відсутня і не видаляється.
+# KEYS[1] - ключ нотатки, KEYS[2] - notes:expiry
+GET_AND_CLAIM_LUA = """
+local data = redis.call('HGETALL', KEYS[1])
+if #data == 0 then
+    return data
+end
+local claim = false
+local only_one_read, password
+for i = 1, #data, 2 do
+    if data[i] == 'pending' then
+        return {}
+    elseif data[i] == 'r' then
+        claim = string.byte(data[i + 1], 2) % 2 == 1
+    elseif data[i] == 'only_one_read' then
+        only_one_read = data[i + 1]
+    elseif data[i] == 'password' then
+        password = data[i + 1]
+    end
+end
+if claim or (only_one_read == '1' and (password == nil or password == '')) then
+    redis.call('DEL', KEYS[1])
+    redis.call('ZREM', KEYS[2], KEYS[1])
+else
+    data[#data + 1] = 'pttl'
+    data[#data + 1] = tostring(redis.call('PTTL', KEYS[1]))
+end
+return data
+"""
+
+# Створює нотатку лише якщо ключ вільний: резервація і запис в одному виклику.
+# KEYS[1] - ключ нотатки, KEYS[2] - notes:expiry
+# ARGV[1] - "zadd" (велика нотатка) або "expire", ARGV[2] - expiresAt або ttl,
+# ARGV[3..] - пари поле/значення для HSET
+CREATE_NX_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+if ARGV[1] == 'zadd' then
+    redis.call('ZADD', KEYS[2], ARGV[2], KEYS[1])
+else
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+# Ставить задачу на summary, лише якщо нотатка ще існує. Поле summary_job - токен задачі:
+# ai_service запише summary, тільки якщо токен не змінився (update перезаписує hash).
+# Stream не обрізається (MAXLEN викинув би задачі, яких ще не обробили, і лишив би їхні токени
+# в нотатках) - коли він повний, нова задача не ставиться.
+# KEYS[1] - ключ нотатки, KEYS[2] - stream задач
+# ARGV[1] - токен, ARGV[2] - максимальна довжина stream, ARGV[3..] - пари поле/значення задачі
+# Повертає 1 - поставлено, 0 - нотатки вже немає, -1 - черга повна
+ENQUEUE_SUMMARY_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+if redis.call('XLEN', KEYS[2]) >= tonumber(ARGV[2]) then
+    return -1
+end
+redis.call('HSET', KEYS[1], 'summary_job', ARGV[1])
+redis.call('XADD', KEYS[2], '*', unpack(ARGV, 3))
+return 1
+"""
+
+# Нове посилання на вже збережене тіло. KEYS[1] - notes:blob:<sha256>
+# Повертає {object, codec, bytes} або nil, якщо такого тіла ще немає
+ACQUIRE_BLOB_LUA = """
+local blob = redis.call('HMGET', KEYS[1], 'object', 'codec', 'bytes')
+if not blob[1] then
+    return nil
+end
+redis.call('HINCRBY', KEYS[1], 'refs', 1)
+return blob
+"""
+
+# Реєструє щойно завантажений об'єкт як тіло з посиланням. Якщо паралельне завантаження
+# того ж тексту встигло першим, посилання додається до нього - повертається {object, codec} переможця.
+# KEYS[1] - notes:blob:<sha256>, KEYS[2] (необов'язково) - нотатка, в яку записати посилання;
+# з посиланням з неї знімається pending, тож читатись вона стає лише тут
+# ARGV[1] - object, ARGV[2] - codec, ARGV[3] - bytes; з KEYS[2]: ARGV[4] - size, ARGV[5] - sha256,
+# ARGV[6] - ETag нотатки або порожній рядок
+REGISTER_BLOB_LUA = """
+if KEYS[2] and redis.call('EXISTS', KEYS[2]) == 0 then
+    return nil
+end
+if redis.call('HSETNX', KEYS[1], 'object', ARGV[1]) == 1 then
+    redis.call('HSET', KEYS[1], 'codec', ARGV[2], 'bytes', ARGV[3])
+end
+redis.call('HINCRBY', KEYS[1], 'refs', 1)
+local blob = redis.call('HMGET', KEYS[1], 'object', 'codec')
+if KEYS[2] then
+    redis.call('HSET', KEYS[2], 'size', ARGV[4], 'link_text', blob[1], 'codec', blob[2], 'blob', ARGV[5])
+    redis.call('HDEL', KEYS[2], 'pending')
+    if ARGV[6] ~= '' then
+        redis.call('HSET', KEYS[2], 'etag', ARGV[6])
+    end
+end
+return blob
+"""
+
+# Знімає посилання. Повертає ім'я об'єкта, якщо посилань не лишилось і його треба видалити.
+# KEYS[1] - notes:blob:<sha256>
+RELEASE_BLOB_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+if redis.call('HINCRBY', KEYS[1], 'refs', -1) > 0 then
+    return nil
+end
+local object = redis.call('HGET', KEYS[1], 'object')
+redis.call('DEL', KEYS[1])
+return object
+"""
+
 
 class RedisClient:
-    def __init__(self):
+    def __init__(self, record_format: str = "packed"):
+        """
+        record_format - формат запису нотаток: "packed" (одне поле r, utils.record) або "hash"
+        (поле на атрибут). Читаються обидва, тож формат можна перемикати без міграції даних.
+        """
         self.redis = create_redis_client()
+        self.record_format = record_format
+        self._get_and_claim = self.redis.register_script(GET_AND_CLAIM_LUA)
+        self._create_nx = self.redis.register_script(CREATE_NX_LUA)
+        self._enqueue_summary = self.redis.register_script(ENQUEUE_SUMMARY_LUA)
+        self._acquire_blob = self.redis.register_script(ACQUIRE_BLOB_LUA)
+        self._register_blob = self.redis.register_script(REGISTER_BLOB_LUA)
+        self._release_blob = self.redis.register_script(RELEASE_BLOB_LUA)
+        pool = self.redis.connection_pool
+        # Приватні поля пулу redis-py: публічного лічильника з'єднань немає, тому версія redis
+        # закріплена в pyproject.toml - перед оновленням перевірити, що поля не змінились
+        REDIS_POOL_CONNECTIONS.labels(state="in_use").set_function(lambda: len(pool._in_use_connections))
+        REDIS_POOL_CONNECTIONS.labels(state="idle").set_function(lambda: len(pool._available_connections))
 
     async def __aenter__(self):
         return self
@@ -16,92 +161,304 @@ class RedisClient:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.close()
 
-    async def set(self, key: str, value: dict, ttl: Optional[int] = None):
+    @timed(REDIS_CALL_SECONDS.labels(command="set"))
+    async def set(self, key: str, value: dict, ttl: Optional[int] = None, replace: bool = False) -> Optional[dict]:
+        """
+        З replace=True повертає {link_text, blob} заміненого запису (None - мала нотатка або запису не було).
+        Поля читаються в тій самій транзакції, тож кожне тіло звільняє рівно один виклик.
+        """
+        mapping = self._record(value)
+        try:
+            # Один MULTI/EXEC: запис атомарний і коштує один round trip
+            async with self.redis.pipeline(transaction=True) as pipe:
+                if replace:
+                    pipe.hmget(key, 'link_text', 'blob')
+                    pipe.delete(key)
+                    pipe.zrem(EXPIRY_ZSET, key)
+                self._queue_write(pipe, key, mapping, value, ttl)
+                results = await pipe.execute()
+            logger.debug("HSET %s fields=%d replace=%s", key, len(mapping), replace)
+            if not replace or not results[0][0]:
+                return None
+            link, digest = (v.decode('utf-8') if v else None for v in results[0])
+            return {'link_text': link, 'blob': digest}
+        except Exception as e:
+            raise Exception(f"Redis HSET error key={key}: {e}")
+
+    @timed(REDIS_CALL_SECONDS.labels(command="create"))
+    async def create(self, key: str, value: dict, ttl: Optional[int] = None) -> bool:
+        """Записує нотатку, якщо ключ ще не зайнятий. False - колізія ключа"""
+        args = self._create_args(value, ttl)
+        try:
+            created = await self._create_nx(keys=[key, EXPIRY_ZSET], args=args)
+            logger.debug("HSET NX %s created=%s", key, bool(created))
+            return bool(created)
+        except Exception as e:
+            raise Exception(f"Redis HSET NX error key={key}: {e}")
+
+    @timed(REDIS_CALL_SECONDS.labels(command="create_many"))
+    async def create_many(self, entries: list[tuple[str, dict, Optional[int]]]) -> list[bool]:
+        """create() для багатьох нотаток одним pipeline. entries - (key, value, ttl)"""
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value, ttl in entries:
+                    await self._create_nx(keys=[key, EXPIRY_ZSET], args=self._create_args(value, ttl), client=pipe)
+                results = await pipe.execute()
+            logger.debug("HSET NX batch size=%d", len(entries))
+            return [bool(created) for created in results]
+        except Exception as e:
+            raise Exception(f"Redis HSET NX batch error size={len(entries)}: {e}")
+
+    def _create_args(self, value: dict, ttl: Optional[int]) -> list:
+        if 'expiresAt' in value:
+            args = ["zadd", int(value['expiresAt'])]
+        else:
+            args = ["expire", ttl]
+        for k, v in self._record(value).items():
+            args += [k, v]
+        return args
+
+    def _record(self, value: dict) -> dict:
+        """Поля hash нотатки у налаштованому форматі"""
+        if self.record_format == "hash":
+            return self._encode(value)
+        packed, extra = pack_record(value)
+        mapping = self._encode(extra)
+        mapping[RECORD_FIELD] = packed
+        return mapping
+
+    @timed(REDIS_CALL_SECONDS.labels(command="enqueue_summaries"))
+    async def enqueue_summaries(self, stream: str, maxlen: int, jobs: list[tuple[str, str, dict]]) -> list[int]:
+        """Задачі (key, токен, поля задачі) одним pipeline. Результат на задачу - як у ENQUEUE_SUMMARY_LUA"""
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, job, fields in jobs:
+                    args = [job, maxlen]
+                    for k, v in self._encode(fields).items():
+                        args += [k, v]
+                    await self._enqueue_summary(keys=[key, stream], args=args, client=pipe)
+                results = await pipe.execute()
+            logger.debug("XADD %s jobs=%d", stream, len(jobs))
+            return [int(queued) for queued in results]
+        except Exception as e:
+            raise Exception(f"Redis XADD error stream={stream} jobs={len(jobs)}: {e}")
+
+    @timed(REDIS_CALL_SECONDS.labels(command="acquire_blob"))
+    async def acquire_blob(self, digest: str) -> Optional[tuple[str, Optional[str], int]]:
+        """(object, codec, bytes) вже збереженого тіла з доданим посиланням, None - тіла немає"""
+        try:
+            blob = await self._acquire_blob(keys=[BLOB_PREFIX + digest])
+            logger.debug("ACQUIRE BLOB %s -> %s", digest, "hit" if blob else "miss")
+            if not blob:
+                return None
+            object_name, codec, stored = (v.decode('utf-8') if v else None for v in blob)
+            return object_name, codec, int(stored or 0)
+        except Exception as e:
+            raise Exception(f"Redis ACQUIRE BLOB error digest={digest}: {e}")
+
+    @timed(REDIS_CALL_SECONDS.labels(command="register_blob"))
+    async def register_blob(
+            self,
+            digest: str,
+            object_name: str,
+            codec: Optional[str],
+            stored: int,
+            note_key: Optional[str] = None,
+            size: Optional[int] = None,
+            etag: Optional[str] = None
+    ) -> Optional[tuple[str, Optional[str]]]:
+        """
+        Реєструє завантажений об'єкт і повертає (object, codec) тіла, на яке тепер є посилання.
+        З note_key посилання, size і etag записуються в нотатку; None - нотатки вже немає.
+        """
+        keys = [BLOB_PREFIX + digest]
+        args = [object_name, codec or "", stored]
+        if note_key is not None:
+            keys.append(note_key)
+            args += [size, digest, etag or ""]
+        try:
+            blob = await self._register_blob(keys=keys, args=args)
+            logger.debug("REGISTER BLOB %s object=%s", digest, object_name)
+            if not blob:
+                return None
+            canonical, canonical_codec = (v.decode('utf-8') if v else None for v in blob)
+            return canonical, canonical_codec
+        except Exception as e:
+            raise Exception(f"Redis REGISTER BLOB error digest={digest}: {e}")
+
+    @timed(REDIS_CALL_SECONDS.labels(command="release_blob"))
+    async def release_blob(self, digest: str) -> Optional[str]:
+        """Знімає посилання; повертає ім'я об'єкта, якщо посилань не лишилось"""
+        try:
+            object_name = await self._release_blob(keys=[BLOB_PREFIX + digest])
+            logger.debug("RELEASE BLOB %s last=%s", digest, bool(object_name))
+            return object_name.decode('utf-8') if object_name else None
+        except Exception as e:
+            raise Exception(f"Redis RELEASE BLOB error digest={digest}: {e}")
+
+    @timed(REDIS_CALL_SECONDS.labels(command="set_fields"))
+    async def set_fields(self, key: str, value: dict) -> None:
+        """Оновлює окремі поля існуючого hash без зміни TTL"""
+        try:
+            await self.redis.hset(name=key, mapping=self._encode(value))
+            logger.debug("HSET FIELDS %s fields=%d", key, len(value))
+        except Exception as e:
+            raise Exception(f"Redis HSET FIELDS error key={key}: {e}")
+
+    @staticmethod
+    def _encode(value: dict) -> dict:
         mapping = {}
         for k, v in value.items():
             if v is None:
                 mapping[k] = ""
+            elif isinstance(v, bytes):
+                mapping[k] = v
             elif isinstance(v, bool):
                 mapping[k] = "1" if v else "0"
             else:
                 mapping[k] = str(v)
-        try:
-            await self.redis.hset(name=key, mapping=mapping)
-            is_large_text = 'expiresAt' in value
-            if is_large_text:
-                await self.redis.zadd("notes:expiry", {key: int(value['expiresAt'])})
-            else:
-                await self.redis.expire(key, ttl)
-            logger.info(f"HSET {key} -> {value}")
-        except Exception as e:
-            raise Exception(f"Redis HSET error key={key}: {e}")
+        return mapping
+
+    @staticmethod
+    def _queue_write(pipe, key: str, mapping: dict, value: dict, ttl: Optional[int]):
+        pipe.hset(name=key, mapping=mapping)
+        is_large_text = 'expiresAt' in value
+        if is_large_text:
+            pipe.zadd(EXPIRY_ZSET, {key: int(value['expiresAt'])})
+        else:
+            pipe.expire(key, ttl)
 
+    @timed(REDIS_CALL_SECONDS.labels(command="get"))
     async def get(self, key: str) -> Optional[dict]:
         try:
             # Отримуємо всі поля з hash
             data = await self.redis.hgetall(key)
 
-            if not data:
-                logger.info(f"GET HASH key={key} -> NOT FOUND")
+            if not data or PENDING_FIELD.encode() in data:
+                logger.debug("GET HASH key=%s -> NOT FOUND", key)
                 return None
 
-            # Конвертуємо bytes в strings і парсимо типи
-            result = {}
-            for k, v in data.items():
-                k_str = k.decode('utf-8') if isinstance(k, bytes) else k
-                v_str = v.decode('utf-8') if isinstance(v, bytes) else v
-
-                # Boolean поля (only_one_read)
-                if k_str == 'only_one_read':
-                    result[k_str] = v_str == '1'
-                # Integer поля (size, expiresAt)
-                elif k_str in ('size', 'expiresAt') and v_str.isdigit():
-                    result[k_str] = int(v_str)
-                # Пусті значення (None)
-                elif v_str == "":
-                    result[k_str] = None
-                else:
-                    result[k_str] = v_str
-
-            logger.info(f"GET HASH key={key} -> Found")
-            return result
+            logger.debug("GET HASH key=%s -> Found", key)
+            return self._decode(data)
 
         except Exception as e:
             raise Exception(f"Redis GET error key={key}: {e}")
 
+    @timed(REDIS_CALL_SECONDS.labels(command="get_and_claim"))
+    async def get_and_claim(self, key: str) -> Optional[dict]:
+        """
+        HGETALL + атомарне видалення одноразової нотатки без пароля (EVALSHA).
+        З паралельних запитів дані отримає лише один.
+        """
+        try:
+            data = await self._get_and_claim(keys=[key, EXPIRY_ZSET])
+
+            if not data:
+                logger.debug("GET CLAIM key=%s -> NOT FOUND", key)
+                return None
+
+            logger.debug("GET CLAIM key=%s -> Found", key)
+            return self._decode(dict(zip(data[::2], data[1::2])))
+
+        except Exception as e:
+            raise Exception(f"Redis GET CLAIM error key={key}: {e}")
+
+    @timed(REDIS_CALL_SECONDS.labels(command="get_and_claim_many"))
+    async def get_and_claim_many(self, keys: list[str]) -> list[Optional[dict]]:
+        """get_and_claim() для багатьох ключів одним pipeline"""
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    await self._get_and_claim(keys=[key, EXPIRY_ZSET], client=pipe)
+                results = await pipe.execute()
+            logger.debug("GET CLAIM batch size=%d", len(keys))
+            return [self._decode(dict(zip(data[::2], data[1::2]))) if data else None for data in results]
+        except Exception as e:
+            raise Exception(f"Redis GET CLAIM batch error size={len(keys)}: {e}")
+
+    @classmethod
+    def _decode(cls, data: dict) -> dict:
+        """Розбирає обидва формати: компактний (поле r + окремі поля поверх нього) і hash поле на атрибут"""
+        packed = data.pop(b'r', None)
+        if packed is None:
+            return cls._decode_fields(data.items())
+        result = unpack_record(packed)
+        # Зазвичай порожньо; окремі поля дописують скрипти (summary, blob) і великі нотатки (expiresAt)
+        if data:
+            result.update(cls._decode_fields(data.items()))
+        return result
+
+    @staticmethod
+    def _decode_fields(pairs) -> dict:
+        pairs = [(k.decode('utf-8') if isinstance(k, bytes) else k, v) for k, v in pairs]
+        compressed = any(k == 'codec' and v for k, v in pairs)
+
+        # Конвертуємо bytes в strings і парсимо типи
+        result = {}
+        for k_str, v in pairs:
+            # Стиснутий текст лишається bytes, його розпаковує RedisService
+            if k_str == 'text' and compressed:
+                result[k_str] = v
+                continue
+
+            v_str = v.decode('utf-8') if isinstance(v, bytes) else v
+
+            # Boolean поля (only_one_read)
+            if k_str == 'only_one_read':
+                result[k_str] = v_str == '1'
+            # Integer поля (size, pttl)
+            elif k_str in ('size', 'pttl') and v_str.lstrip('-').isdigit():
+                result[k_str] = int(v_str)
+            # Timestamp в мс (expiresAt)
+            elif k_str == 'expiresAt' and v_str:
+                result[k_str] = float(v_str)
+            # Пусті значення (None)
+            elif v_str == "":
+                result[k_str] = None
+            else:
+                result[k_str] = v_str
+        return result
+
     async def update(self, key: str, value: dict, ttl: Optional[int] = None):
         try:
             exists = await self._exists(key)
             if exists:
-                await self.redis.zrem("notes:expiry", key)
-                await self.redis.delete(key)
-                await self.set(key, value, ttl)
-                logger.info(f"UPDATE {key} completed")
+                await self.set(key, value, ttl, replace=True)
+                logger.debug("UPDATE %s completed", key)
                 return True
             return False
         except Exception as e:
             raise Exception(f"Redis UPDATE error key={key}: {e}")
 
-    async def delete(self, key: str):
+    @timed(REDIS_CALL_SECONDS.labels(command="delete"))
+    async def delete(self, key: str) -> Optional[dict]:
+        """
+        None - запису не було. Інакше {link_text, blob} видаленого запису (None для малої нотатки):
+        поля читаються в тому ж MULTI, що й DEL, як у set(replace=True), тож паралельний update
+        між читанням нотатки і видаленням не змусить звільнити чуже або вже звільнене тіло.
+        """
         try:
-            exists = await self._exists(key)
-            if not exists:
-                return False
-
-            await self.redis.zrem("notes:expiry", key)
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hmget(key, 'link_text', 'blob')
+                pipe.zrem(EXPIRY_ZSET, key)
+                pipe.delete(key)
+                refs, _, deleted = await pipe.execute()
 
-            await self.redis.delete(key)
+            if not deleted:
+                return None
 
-            logger.info(f"DELETE key={key}")
-            return True
+            logger.debug("DELETE key=%s", key)
+            link, digest = (v.decode('utf-8') if v else None for v in refs)
+            return {'link_text': link, 'blob': digest}
 
         except Exception as e:
             raise Exception(f"Redis DELETE error key={key}: {e}")
 
+    @timed(REDIS_CALL_SECONDS.labels(command="exists"))
     async def _exists(self, key: str) -> bool:
         try:
             exists = await self.redis.exists(key)
-            logger.info(f"EXISTS key={key} exists={exists}")
+            logger.debug("EXISTS key=%s exists=%s", key, exists)
             return bool(exists)
 
         except Exception as e:
@@ -110,16 +467,29 @@ class RedisClient:
     async def ping(self) -> bool:
         try:
             response = await self.redis.ping()
-            logger.info(f"PING success={response}")
+            logger.debug("PING success=%s", response)
             return response in (True, "PONG", b"PONG")
 
         except Exception as e:
             logger.error(f"Redis PING failed: {e}")
             return False
 
+    async def warm_up(self, connections: int) -> None:
+        """
+        Відкриває connections з'єднань пулу і завантажує Lua-скрипти до прийому трафіку,
+        щоб перші запити не чекали connect/AUTH і не отримували NOSCRIPT.
+        """
+        await asyncio.gather(*(self.redis.ping() for _ in range(connections)))
+        for script in (
+            self._get_and_claim, self._create_nx, self._enqueue_summary,
+            self._acquire_blob, self._register_blob, self._release_blob
+        ):
+            await self.redis.script_load(script.script)
+        logger.info("Redis pool warmed up: connections=%d", connections)
+
     async def close(self):
         await self.redis.close()
         await self.redis.connection_pool.disconnect()
         logger.info("Close Redis connection")
 
-redis_client = RedisClient()
+redis_client = RedisClient(record_format=app_settings.REDIS_RECORD_FORMAT)
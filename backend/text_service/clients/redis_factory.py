@@ -8,5 +8,6 @@ def create_redis_client():
         port=redis_settings.REDIS_PORT,
         db=redis_settings.REDIS_DB,
         password=redis_settings.REDIS_PASSWORD,
-        decode_responses=True
+        # Стиснуті тіла нотаток бінарні, тому відповіді декодуються в RedisClient._decode
+        decode_responses=False
     )
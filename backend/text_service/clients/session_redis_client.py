@@ -1,3 +1,4 @@
+import asyncio
 import redis.asyncio as redis
 import logging
 from config import redis_settings
@@ -27,7 +28,7 @@ class SessionRedisClient:
 
             exists = await self.client.exists(key)
             
-            logger.info(f"Session exists check: {key} -> {bool(exists)}")
+            logger.debug("Session exists check -> %s", bool(exists))
             return bool(exists)
         except redis.AuthenticationError as e:
             logger.error(f"Redis authentication failed: {e}")
@@ -36,9 +37,16 @@ class SessionRedisClient:
             logger.error(f"Redis connection error: {e}")
             raise
         except Exception as e:
-            logger.error(f"Session exists error {session_id}: {e}")
+            logger.error("Session exists error: %s", e)
             raise
 
+    async def ping(self) -> bool:
+        return await self.client.ping()
+
+    async def warm_up(self, connections: int) -> None:
+        """Відкриває connections з'єднань пулу заздалегідь, щоб перші перевірки сесій не чекали connect"""
+        await asyncio.gather(*(self.client.ping() for _ in range(connections)))
+
     async def close(self):
         """Закриває з'єднання з Redis"""
         try:
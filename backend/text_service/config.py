@@ -18,6 +18,12 @@ class MinioSettings(BaseSettings):
     MINIO_SECRET_KEY: str
     MINIO_SECURE: bool
     MINIO_BUCKET: str
+    MINIO_POOL_SIZE: int = 32
+    MINIO_MAX_CONCURRENCY: int = 16
+    MINIO_KEEPALIVE_TIMEOUT: float = 30.0
+    MINIO_REQUEST_TIMEOUT: float = 60.0
+    MINIO_STREAM_CHUNK_SIZE: int = 64 * 1024
+    MINIO_PART_SIZE: int = 5 * 1024 * 1024  # мінімальний розмір частини S3
 
     class Config:
         env_file = ".env"
@@ -27,6 +33,81 @@ class MinioSettings(BaseSettings):
 
 class AppSettings(BaseSettings):
     SIZE_THRESHOLD: int = 10240
+    # Кеш перевірки сесій у SessionMiddleware (секунди)
+    SESSION_CACHE_TTL: float = 5.0
+    SESSION_CACHE_NEGATIVE_TTL: float = 1.0
+    SESSION_CACHE_MAX_SIZE: int = 10000
+    # Пакетні запити /batch
+    BATCH_MAX_ITEMS: int = 100
+    BATCH_MINIO_CONCURRENCY: int = 8
+    # Фонова генерація summary (auto_summary): черга Redis Streams, яку читає ai_service
+    AUTO_SUMMARY_STREAM: str = "notes:summary_jobs"
+    # Максимум задач у черзі: поки ai_service не розбере чергу, нові auto_summary пропускаються
+    AUTO_SUMMARY_STREAM_MAXLEN: int = 10000
+    AUTO_SUMMARY_MAX_BYTES: int = 1_000_000
+    # Формат запису нотаток у Redis: packed (компактний, utils.record) | hash (поле на атрибут).
+    # Читаються обидва; hash - для відкату і поки працюють репліки, що не вміють читати packed
+    REDIS_RECORD_FORMAT: str = "packed"
+    # Cache-Control: max-age відповіді GET, не більше залишку TTL нотатки. Стільки секунд
+    # браузер може показувати стару версію після update; 0 - перевіряти ETag щоразу
+    HTTP_CACHE_MAX_AGE: int = 60
+    # Старт: скільки з'єднань пулів Redis і MinIO відкрити до прийому трафіку;
+    # таймаут кожної перевірки залежності в /ready (секунди)
+    WARMUP_CONNECTIONS: int = 4
+    READY_PROBE_TIMEOUT: float = 1.0
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        extra = "ignore"
+
+
+class PasswordSettings(BaseSettings):
+    PASSWORD_EXECUTOR: str = "process"  # process | thread
+    PASSWORD_WORKERS: int = 2
+    PASSWORD_MAX_CONCURRENCY: int = 4
+    BCRYPT_ROUNDS: int = 12
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        extra = "ignore"
+
+
+class CompressionSettings(BaseSettings):
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 512
+    COMPRESSION_LEVEL: int = 3
+    # Необов'язковий словник zstd для коротких нотаток
+    COMPRESSION_DICT_PATH: str | None = None
+    COMPRESSION_DICT_MAX_SIZE: int = 4096
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        extra = "ignore"
+
+
+class CacheSettings(BaseSettings):
+    NOTE_CACHE_ENABLED: bool = True
+    NOTE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    NOTE_CACHE_MAX_ENTRY_BYTES: int = 1024 * 1024
+    # Верхня межа життя запису, якщо інвалідація через pub/sub загубиться
+    NOTE_CACHE_MAX_TTL: float = 300.0
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        extra = "ignore"
+
+
+class LoggingSettings(BaseSettings):
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    LOG_MAX_FIELD_LENGTH: int = 256
+    # Частка запитів з INFO/DEBUG логами: типова і за префіксом шляху, напр. {"/api/text/": 0.05}
+    LOG_SAMPLE_RATE: float = 1.0
+    LOG_ROUTE_SAMPLE_RATES: dict[str, float] = {}
 
     class Config:
         env_file = ".env"
@@ -36,4 +117,8 @@ class AppSettings(BaseSettings):
 
 redis_settings = RedisSettings()
 minio_settings = MinioSettings()
-app_settings = AppSettings()
\ No newline at end of file
+app_settings = AppSettings()
+password_settings = PasswordSettings()
+compression_settings = CompressionSettings()
+cache_settings = CacheSettings()
+logging_settings = LoggingSettings()
\ No newline at end of file
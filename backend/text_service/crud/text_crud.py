@@ -1,13 +1,23 @@
-from fastapi import APIRouter, HTTPException, status, Request
+import time
+
+from fastapi import APIRouter, HTTPException, status, Request, Query, Header, Response
+from fastapi.responses import StreamingResponse
+from utils.responses import EncodedJSONResponse, ClosingStreamingResponse
 from services import storage_service
+from services.storage_service import ReadOnceNoteError
 from schemas.text import (
     TextCreateRequest,
     TextCreateResponse,
     TextGetResponse,
+    EncodedTextGetResponse,
     PasswordRequiredResponse,
     PasswordVerifyRequest,
-    TextUpdateRequest
+    TextUpdateRequest,
+    TextBatchCreateRequest,
+    TextBatchCreateResponse,
+    TextBatchGetResponse
 )
+from config import app_settings
 
 router_text = APIRouter()
 
@@ -18,15 +28,110 @@ async def create_text(data: TextCreateRequest, request: Request):
     return await storage_service.create_text(data, session_id)
 
 
+@router_text.post("/raw", response_model=TextCreateResponse, status_code=status.HTTP_201_CREATED)
+async def create_text_raw(
+        request: Request,
+        ttl: int = Query(gt=0),
+        only_one_read: bool = False,
+        summary: str | None = None,
+        x_note_password: str | None = Header(default=None)
+):
+    """Тіло запиту - сам текст (text/plain), читається потоком"""
+    session_id = request.state.session_id
+    try:
+        return await storage_service.create_text_stream(
+            request.stream(),
+            ttl=ttl,
+            only_one_read=only_one_read,
+            password=x_note_password,
+            summary=summary,
+            creator=session_id
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be non-empty UTF-8 text"
+        )
+
+
+def _cache_headers(result: EncodedTextGetResponse) -> dict:
+    # Одноразові нотатки і записані без ETag не кешуються ні браузером, ні nginx
+    if result.etag is None or result.expires_at is None:
+        return {"Cache-Control": "no-store"}
+    max_age = max(0, min(int(result.expires_at - time.time()), app_settings.HTTP_CACHE_MAX_AGE))
+    return {"ETag": f'"{result.etag}"', "Cache-Control": f"public, max-age={max_age}"}
+
+
 @router_text.get("/", response_model=TextGetResponse | PasswordRequiredResponse)
-async def get_text(key: str, request: Request):
-    result = await storage_service.get_text(key)
+async def get_text(
+        key: str,
+        request: Request,
+        response: Response,
+        if_none_match: str | None = Header(default=None)
+):
+    result = await storage_service.get_text(key, if_none_match)
     if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Text not found"
         )
-    return result
+    if isinstance(result, PasswordRequiredResponse):
+        response.headers["Cache-Control"] = "no-store"
+        return result
+    headers = _cache_headers(result)
+    if result.body is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # Тіло з кешу чи сховища вже закодоване: response_model лише документує схему
+    return EncodedJSONResponse(result.body, headers=headers)
+
+
+@router_text.get("/raw", response_class=StreamingResponse)
+async def get_text_raw(key: str, request: Request, consume: bool = True):
+    """consume=false - не видаляти одноразову нотатку: для неї 409 замість тіла"""
+    try:
+        result = await storage_service.get_text_stream(key, consume)
+    except ReadOnceNoteError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Read-once note can only be read by opening it"
+        )
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Text not found"
+        )
+    if isinstance(result, PasswordRequiredResponse):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Password required, use POST /verify"
+        )
+    headers, chunks = result
+    return ClosingStreamingResponse(
+        chunks,
+        on_close=chunks.aclose,
+        media_type="text/plain; charset=utf-8",
+        headers=headers
+    )
+
+
+@router_text.post("/batch", response_model=TextBatchCreateResponse, status_code=status.HTTP_201_CREATED)
+async def create_texts(data: TextBatchCreateRequest, request: Request):
+    """Статус кожного елемента - у відповіді, в тому ж порядку"""
+    session_id = request.state.session_id
+    items = await storage_service.create_texts(data.items, session_id)
+    return TextBatchCreateResponse(items=items)
+
+
+@router_text.get("/batch", response_model=TextBatchGetResponse)
+async def get_texts(request: Request, keys: list[str] = Query(min_length=1)):
+    """keys передаються повтором параметра: ?keys=a&keys=b"""
+    if len(keys) > app_settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many keys, max {app_settings.BATCH_MAX_ITEMS}"
+        )
+    items = await storage_service.get_texts(keys)
+    return TextBatchGetResponse(items=items)
 
 
 @router_text.post("/verify", response_model=TextGetResponse)
@@ -0,0 +1,112 @@
+import json
+import logging
+import queue
+import random
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+REDACTED = "[redacted]"
+# Поля extra, значення яких ніколи не потрапляють у лог
+REDACT_FIELDS = frozenset({"password", "text", "value", "session_id", "cookie"})
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName"}
+
+# Чи відібрано поточний запит для INFO/DEBUG логів
+_sampled: ContextVar[bool] = ContextVar("log_sampled", default=True)
+
+
+class RouteSampler:
+    """
+    Частка запитів, для яких пишуться INFO/DEBUG логи, за префіксом шляху.
+    Рішення приймається один раз на запит, тож відібраний запит логується повністю.
+    """
+
+    def __init__(self, default_rate: float, route_rates: dict[str, float]):
+        self.default_rate = default_rate
+        # Найдовший префікс перевіряється першим
+        self._routes = sorted(route_rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def rate(self, path: str) -> float:
+        for prefix, rate in self._routes:
+            if path.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def sample(self, path: str) -> None:
+        rate = self.rate(path)
+        _sampled.set(rate >= 1.0 or random.random() < rate)
+
+
+class SampledFilter(logging.Filter):
+    """
+    WARNING і вище пишуться завжди, решта - лише для відібраних запитів.
+    Стоїть на обробнику root, тож діє на всі логери, не змінюючи їх класу:
+    запис невідібраного запиту відкидається до постановки в чергу.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or _sampled.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """Один JSON-рядок на запис; поля з REDACT_FIELDS приховуються, довгі значення обрізаються"""
+
+    def __init__(self, max_field_length: int = 256):
+        super().__init__()
+        self.max_field_length = max_field_length
+
+    def _truncate(self, value):
+        if isinstance(value, (bytes, bytearray)):
+            return f"<{len(value)} bytes>"
+        if isinstance(value, str) and len(value) > self.max_field_length:
+            return f"{value[:self.max_field_length]}...(+{len(value) - self.max_field_length})"
+        return value
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": self._truncate(record.getMessage()),
+        }
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_ATTRS:
+                entry[name] = REDACTED if name in REDACT_FIELDS else self._truncate(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Стандартний QueueHandler форматує запис ще в потоці event loop.
+    Тут запис кладеться в чергу як є - форматування і I/O робить потік QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(
+        level: str = "INFO",
+        json_format: bool = True,
+        max_field_length: int = 256
+) -> QueueListener:
+    """Перенаправляє root logger у чергу; повертає запущений listener, його треба зупинити при shutdown"""
+    log_queue = queue.SimpleQueue()
+
+    stream = logging.StreamHandler()
+    if json_format:
+        stream.setFormatter(JsonFormatter(max_field_length))
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    handler = _DeferredQueueHandler(log_queue)
+    handler.addFilter(SampledFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -1,32 +1,119 @@
-from fastapi import FastAPI
-from crud.text_crud import router_text
-from middleware.cookie_middleware import SessionMiddleware
-from clients.redis_client import redis_client
-from clients.session_redis_client import session_redis_client
-import logging
+from time import perf_counter
+
+# Відлік фази import метрики text_startup_seconds - до імпорту fastapi, клієнтів і сервісів,
+# тому решта імпортів нижче навмисно не на початку модуля (E402)
+_import_start = perf_counter()
+
+import asyncio  # noqa: E402
+from contextlib import asynccontextmanager  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from prometheus_client import make_asgi_app  # noqa: E402
+from crud.text_crud import router_text  # noqa: E402
+from middleware.cookie_middleware import SessionMiddleware  # noqa: E402
+from middleware.sampling_middleware import LogSamplingMiddleware  # noqa: E402
+from clients.redis_client import redis_client  # noqa: E402
+from clients.minio_client import minio_client  # noqa: E402
+from clients.session_redis_client import session_redis_client  # noqa: E402
+from services import password_service, note_cache  # noqa: E402
+from utils.responses import OrjsonResponse  # noqa: E402
+from utils.health import probe  # noqa: E402
+from metrics import STARTUP_SECONDS  # noqa: E402
+from config import app_settings, logging_settings  # noqa: E402
+from logging_config import setup_logging, RouteSampler  # noqa: E402
+import logging  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Text Service", version="1.0.0")
+IMPORT_SECONDS = perf_counter() - _import_start
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Налаштовується при старті, а не при імпорті: імпорт main (тести, бенчмарки) не чіпає root logger
+    log_listener = setup_logging(
+        level=logging_settings.LOG_LEVEL,
+        json_format=logging_settings.LOG_JSON,
+        max_field_length=logging_settings.LOG_MAX_FIELD_LENGTH
+    )
+    STARTUP_SECONDS.labels(phase="import").set(IMPORT_SECONDS)
+    start = perf_counter()
+    connections = app_settings.WARMUP_CONNECTIONS
+    results = await asyncio.gather(
+        redis_client.warm_up(connections),
+        session_redis_client.warm_up(connections),
+        minio_client.warm_up(connections),
+        password_service.warm_up(),
+        return_exceptions=True
+    )
+    for result in results:
+        # Залежність недоступна при старті - сервіс однаково піднімається, /ready відповість 503
+        if isinstance(result, Exception):
+            logger.warning("Connection warm-up failed: %s", result)
+    note_cache.start()
+    warmup_seconds = perf_counter() - start
+    STARTUP_SECONDS.labels(phase="warmup").set(warmup_seconds)
+    app.state.ready = True
+    logger.info("Startup complete: import=%.3fs warmup=%.3fs", IMPORT_SECONDS, warmup_seconds)
+    yield
+
+    # Балансувальник перестає слати запити, поки закриваються з'єднання
+    app.state.ready = False
+    logger.info("Shutting down...")
+    await note_cache.stop()
+    await redis_client.close()
+    await minio_client.close()
+    await session_redis_client.close()
+    password_service.close()
+    logger.info("All connections closed")
+    log_listener.stop()
+
+
+app = FastAPI(title="Text Service", version="1.0.0", default_response_class=OrjsonResponse, lifespan=lifespan)
 
 # Підключаємо роутер з префіксом
 app.include_router(router_text, prefix="/api/text", tags=["text"])
+app.mount("/metrics", make_asgi_app())
+
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    """Liveness: процес живий і обслуговує event loop, залежності не перевіряються"""
+    return {"status": "ok"}
+
+
+@app.get("/ready", include_in_schema=False)
+async def ready(request: Request):
+    """Readiness: старт завершено, Redis нотаток, Redis сесій і MinIO відповідають"""
+    timeout = app_settings.READY_PROBE_TIMEOUT
+    redis_check, session_check, minio_check = await asyncio.gather(
+        probe(redis_client.ping, timeout),
+        probe(session_redis_client.ping, timeout),
+        probe(minio_client.ping, timeout)
+    )
+    checks = {"redis": redis_check, "session_redis": session_check, "minio": minio_check}
+    is_ready = getattr(request.app.state, "ready", False) and all(check["ok"] for check in checks.values())
+    return OrjsonResponse(
+        {"status": "ready" if is_ready else "not_ready", "checks": checks},
+        status_code=200 if is_ready else 503
+    )
 
 # Підключаємо SessionMiddleware з публічними методами
 app.add_middleware(
     SessionMiddleware,
     session_redis=session_redis_client,
-    exclude_paths=["/docs", "/openapi.json", "/redoc", "/health"],
+    exclude_paths=["/docs", "/openapi.json", "/redoc", "/health", "/ready", "/metrics"],
     public_methods={
         # ВАЖЛИВО: Вказуємо повний шлях разом з /api
         "/api/text/": ["GET"],        
         "/api/text/verify": ["POST"]  
-    }
+    },
+    cache_ttl=app_settings.SESSION_CACHE_TTL,
+    negative_cache_ttl=app_settings.SESSION_CACHE_NEGATIVE_TTL,
+    cache_max_size=app_settings.SESSION_CACHE_MAX_SIZE
 )
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Shutting down...")
-    await redis_client.close()
-    await session_redis_client.close()
-    logger.info("All connections closed")
\ No newline at end of file
+# Додається останнім - виконується першим, до перевірки сесії
+app.add_middleware(
+    LogSamplingMiddleware,
+    sampler=RouteSampler(logging_settings.LOG_SAMPLE_RATE, logging_settings.LOG_ROUTE_SAMPLE_RATES)
+)
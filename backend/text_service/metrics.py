@@ -0,0 +1,134 @@
+from functools import wraps
+from time import perf_counter
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (256, 1024, 4096, 10240, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def timed(child):
+    """
+    Декоратор async-функції: тривалість виклику йде в готовий (.labels(...)) child гістограми.
+    Мітки прив'язуються один раз при імпорті, на гарячому шляху лише observe().
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                child.observe(perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+KEY_ALLOCATION_RETRIES = Histogram(
+    "text_key_allocation_retries",
+    "Key collisions retried per create, by TTL bucket",
+    ["ttl"],
+    buckets=(0, 1, 2, 3, 5, 8, 13)
+)
+
+PASSWORD_QUEUE_DEPTH = Gauge(
+    "text_password_queue_depth",
+    "Password hash/verify calls waiting for a free executor slot"
+)
+
+PASSWORD_IN_FLIGHT = Gauge(
+    "text_password_in_flight",
+    "Password hash/verify calls running in the executor"
+)
+
+PASSWORD_WAIT_SECONDS = Histogram(
+    "text_password_wait_seconds",
+    "Time spent waiting for a free executor slot",
+    ["operation"]
+)
+
+NOTE_CACHE_REQUESTS = Counter(
+    "text_note_cache_requests_total",
+    "Hot-note cache lookups",
+    ["result"]
+)
+
+NOTE_CACHE_BYTES = Gauge(
+    "text_note_cache_bytes",
+    "Text bytes held in the hot-note cache"
+)
+
+NOTE_CACHE_ENTRIES = Gauge(
+    "text_note_cache_entries",
+    "Notes held in the hot-note cache"
+)
+
+STAGE_SECONDS = Histogram(
+    "text_stage_seconds",
+    "Time spent in each stage of a storage operation",
+    ["operation", "stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+REDIS_CALL_SECONDS = Histogram(
+    "text_redis_call_seconds",
+    "Note Redis client call latency",
+    ["command"],
+    buckets=LATENCY_BUCKETS
+)
+
+MINIO_CALL_SECONDS = Histogram(
+    "text_minio_call_seconds",
+    "MinIO client call latency, including the wait for a concurrency slot",
+    ["operation"],
+    buckets=LATENCY_BUCKETS
+)
+
+SESSION_CHECK_SECONDS = Histogram(
+    "text_session_check_seconds",
+    "Session validation latency in SessionMiddleware",
+    ["source"],
+    buckets=LATENCY_BUCKETS
+)
+
+PAYLOAD_BYTES = Histogram(
+    "text_payload_bytes",
+    "Note body size in bytes (uncompressed)",
+    ["operation"],
+    buckets=SIZE_BUCKETS
+)
+
+REDIS_POOL_CONNECTIONS = Gauge(
+    "text_redis_pool_connections",
+    "Note Redis pool connections",
+    ["state"]
+)
+
+MINIO_IN_FLIGHT = Gauge(
+    "text_minio_in_flight",
+    "MinIO requests holding a concurrency slot"
+)
+
+CONDITIONAL_GETS = Counter(
+    "text_conditional_get_total",
+    "GET requests with If-None-Match: not_modified - answered 304 without loading the body",
+    ["result"]
+)
+
+DEDUP_REQUESTS = Counter(
+    "text_dedup_requests_total",
+    "Large note bodies stored by content hash: hit - an identical body was already stored",
+    ["result"]
+)
+
+DEDUP_BYTES_AVOIDED = Counter(
+    "text_dedup_bytes_avoided_total",
+    "Stored (compressed) bytes not written thanks to dedup: upload - PUT skipped, "
+    "storage - a concurrent duplicate upload was discarded",
+    ["kind"]
+)
+
+STARTUP_SECONDS = Gauge(
+    "text_startup_seconds",
+    "Startup duration by phase: import - app modules, warmup - Redis/MinIO pools, Lua scripts and password executor",
+    ["phase"]
+)
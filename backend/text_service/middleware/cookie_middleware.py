@@ -1,20 +1,77 @@
 import logging
-from fastapi import Request, status
+import re
+import time
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Receive, Scope, Send
+from metrics import SESSION_CHECK_SECONDS
 
 logger = logging.getLogger(__name__)
 
+_CHECK_CACHE = SESSION_CHECK_SECONDS.labels(source="cache")
+_CHECK_REDIS = SESSION_CHECK_SECONDS.labels(source="redis")
 
-class SessionMiddleware(BaseHTTPMiddleware):
+
+def _compile_prefixes(prefixes) -> re.Pattern | None:
+    """Один регулярний вираз замість лінійного перебору startswith"""
+    if not prefixes:
+        return None
+    return re.compile("|".join(re.escape(prefix) for prefix in prefixes))
+
+
+def _get_cookie(scope: Scope, name: str) -> str | None:
+    for header, value in scope["headers"]:
+        if header == b"cookie":
+            return cookie_parser(value.decode("latin-1")).get(name)
+    return None
+
+
+class SessionCache:
+    """
+    Короткоживучий кеш результатів перевірки сесії.
+    Валідна сесія може прийматись ще до ttl секунд після того, як зникла з Redis -
+    це і є межа застарілості. Невалідні сесії кешуються на negative_ttl.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, max_size: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries: dict[str, tuple[bool, float]] = {}
+
+    def get(self, session_id: str) -> bool | None:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        valid, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[session_id]
+            return None
+        return valid
+
+    def put(self, session_id: str, valid: bool) -> None:
+        ttl = self.ttl if valid else self.negative_ttl
+        if ttl <= 0:
+            return
+        if len(self._entries) >= self.max_size:
+            # dict зберігає порядок вставки - викидаємо найстаріший запис
+            del self._entries[next(iter(self._entries))]
+        self._entries[session_id] = (valid, time.monotonic() + ttl)
+
+
+class SessionMiddleware:
     def __init__(
             self,
-            app,
+            app: ASGIApp,
             session_redis,
             exclude_paths: list = None,
-            public_methods: dict = None
+            public_methods: dict = None,
+            cache_ttl: float = 5.0,
+            negative_cache_ttl: float = 1.0,
+            cache_max_size: int = 10000
     ):
-        super().__init__(app)
+        self.app = app
         self.session_redis = session_redis
         self.exclude_paths = exclude_paths or [
             "/docs",
@@ -25,65 +82,87 @@ class SessionMiddleware(BaseHTTPMiddleware):
         ]
         # Формат: {"шлях": ["GET", "POST"]}
         self.public_methods = public_methods or {}
+        self.session_cache = SessionCache(cache_ttl, negative_cache_ttl, cache_max_size)
+
+        self._excluded = _compile_prefixes(self.exclude_paths)
+        # {"GET": re(префікси публічних шляхів для GET)}
+        prefixes_by_method: dict[str, list[str]] = {}
+        for public_path, methods in self.public_methods.items():
+            for method in methods:
+                prefixes_by_method.setdefault(method, []).append(public_path)
+        self._public = {method: _compile_prefixes(prefixes) for method, prefixes in prefixes_by_method.items()}
         logger.info(f"SessionMiddleware initialized with public_methods: {self.public_methods}")
 
     def _is_public_request(self, path: str, method: str) -> bool:
         """Перевірка чи запит публічний (не потребує сесії)"""
-        for public_path, methods in self.public_methods.items():
-            if path.startswith(public_path) and method in methods:
-                logger.debug(f"Public request matched: {method} {path}")
-                return True
-        return False
+        pattern = self._public.get(method)
+        return pattern is not None and pattern.match(path) is not None
 
     def _is_excluded_path(self, path: str) -> bool:
         """Перевірка чи шлях повністю виключено"""
-        return any(path.startswith(excluded) for excluded in self.exclude_paths)
+        return self._excluded is not None and self._excluded.match(path) is not None
 
-    async def dispatch(self, request: Request, call_next):
-        # Пропускаємо OPTIONS для CORS
-        if request.method == "OPTIONS":
-            return await call_next(request)
+    async def _session_exists(self, session_id: str) -> bool:
+        start = time.perf_counter()
+        valid = self.session_cache.get(session_id)
+        if valid is not None:
+            _CHECK_CACHE.observe(time.perf_counter() - start)
+            return valid
+        valid = await self.session_redis.exists(session_id)
+        self.session_cache.put(session_id, valid)
+        _CHECK_REDIS.observe(time.perf_counter() - start)
+        return valid
 
-        # Пропускаємо повністю виключені шляхи
-        if self._is_excluded_path(request.url.path):
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        path = scope["path"]
+
+        # Пропускаємо OPTIONS для CORS і повністю виключені шляхи
+        if method == "OPTIONS" or self._is_excluded_path(path):
+            return await self.app(scope, receive, send)
+
+        state = scope.setdefault("state", {})
 
         # Перевіряємо чи це публічний запит
-        if self._is_public_request(request.url.path, request.method):
-            request.state.session_id = None  # Публічний запит без сесії
-            logger.info(f"✓ Public request allowed: {request.method} {request.url.path}")
-            return await call_next(request)
+        if self._is_public_request(path, method):
+            state["session_id"] = None  # Публічний запит без сесії
+            logger.debug("✓ Public request allowed: %s %s", method, path)
+            return await self.app(scope, receive, send)
 
         # Отримуємо session cookie
-        session_id = request.cookies.get("session")
+        session_id = _get_cookie(scope, "session")
 
         if not session_id:
-            logger.warning(f"✗ No session cookie for {request.url.path}")
-            return JSONResponse(
+            logger.warning("✗ No session cookie for %s", path)
+            response = JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 content={"detail": "Authentication required"}
             )
+            return await response(scope, receive, send)
 
         # Перевіряємо сесію
         try:
-            exists = await self.session_redis.exists(session_id)
-
-            if not exists:
-                logger.warning(f"✗ Invalid session: {session_id}")
-                return JSONResponse(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    content={"detail": "Session expired or invalid"}
-                )
-
-            request.state.session_id = session_id
-            logger.info(f"✓ Valid session: {session_id} for path: {request.url.path}")
-
-            response = await call_next(request)
-            return response
-
+            exists = await self._session_exists(session_id)
         except Exception as e:
-            logger.error(f"✗ Session validation error: {e}", exc_info=True)
-            return JSONResponse(
+            logger.error("✗ Session validation error: %s", e, exc_info=True)
+            response = JSONResponse(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 content={"detail": "Session service unavailable"}
-            )
\ No newline at end of file
+            )
+            return await response(scope, receive, send)
+
+        if not exists:
+            logger.warning("✗ Invalid session for %s", path)
+            response = JSONResponse(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                content={"detail": "Session expired or invalid"}
+            )
+            return await response(scope, receive, send)
+
+        state["session_id"] = session_id
+        logger.debug("✓ Valid session for path: %s", path)
+
+        await self.app(scope, receive, send)
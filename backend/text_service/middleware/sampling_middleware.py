@@ -0,0 +1,16 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from logging_config import RouteSampler
+
+
+class LogSamplingMiddleware:
+    """Вирішує на початку запиту, чи писати для нього INFO/DEBUG логи"""
+
+    def __init__(self, app: ASGIApp, sampler: RouteSampler):
+        self.app = app
+        self.sampler = sampler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            self.sampler.sample(scope["path"])
+        await self.app(scope, receive, send)
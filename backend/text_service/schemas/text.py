@@ -1,5 +1,7 @@
+import orjson
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import NamedTuple, Optional, Literal
+from config import app_settings
 
 
 class TextCreateRequest(BaseModel):
@@ -8,6 +10,8 @@ class TextCreateRequest(BaseModel):
     only_one_read: bool
     password: Optional[str] = None
     summary: Optional[str] = None
+    # Summary згенерує ai_service у фоні, якщо клієнт його не передав; для нотаток з паролем ігнорується
+    auto_summary: bool = False
 
 
 class TextUpdateRequest(BaseModel):
@@ -36,6 +40,48 @@ class TextGetResponse(BaseModel):
     summary: Optional[str] = None
 
 
+def encode_text_get_response(text: str, size: int, summary: Optional[str]) -> bytes:
+    """
+    JSON тіла TextGetResponse без створення і валідації моделі: значення приходять прямо зі сховища
+    і вже мають потрібні типи. Поля мають збігатися з TextGetResponse.
+    """
+    return orjson.dumps({"text": text, "size": size, "summary": summary})
+
+
+class EncodedTextGetResponse(NamedTuple):
+    """Відповідь GET для роуту: тіло з encode_text_get_response і дані для заголовків кешування"""
+    body: Optional[bytes]  # None - спрацював If-None-Match, відповідь 304
+    etag: Optional[str]  # None - нотатку не можна кешувати (одноразова або записана без ETag)
+    expires_at: Optional[float]  # unix time, коли нотатка зникне
+
+
+# Batch shemas
+
+class TextBatchCreateRequest(BaseModel):
+    items: list[TextCreateRequest] = Field(min_length=1, max_length=app_settings.BATCH_MAX_ITEMS)
+
+
+class TextBatchCreateItem(BaseModel):
+    status: Literal["created", "error"]
+    key: Optional[str] = None
+
+
+class TextBatchCreateResponse(BaseModel):
+    items: list[TextBatchCreateItem]
+
+
+class TextBatchGetItem(BaseModel):
+    key: str
+    status: Literal["ok", "not_found", "password_required", "error"]
+    text: Optional[str] = None
+    size: Optional[int] = None
+    summary: Optional[str] = None
+
+
+class TextBatchGetResponse(BaseModel):
+    items: list[TextBatchGetItem]
+
+
 # Redis shemas
 
 class RedisTextSmall(BaseModel):
@@ -45,6 +91,8 @@ class RedisTextSmall(BaseModel):
     only_one_read: bool
     password: Optional[str] = None
     summary: Optional[str] = None
+    codec: Optional[str] = None
+    etag: Optional[str] = None
 
 
 class RedisTextLarge(BaseModel):
@@ -55,3 +103,7 @@ class RedisTextLarge(BaseModel):
     password: Optional[str] = None
     summary: Optional[str] = None
     expiresAt: float  # timestamp + ttl
+    codec: Optional[str] = None
+    # sha256 тексту: тіло лежить у спільному об'єкті з лічильником посилань (notes:blob:<sha256>)
+    blob: Optional[str] = None
+    etag: Optional[str] = None
@@ -1,18 +1,36 @@
 from clients.redis_client import redis_client
 from clients.minio_client import minio_client
+from config import password_settings, cache_settings
 
 from services.redis_service import RedisService
 from services.minio_service import MinioService
 from services.storage_service import StorageService
+from services.password_service import PasswordService
+from services.note_cache import NoteCache
 
 redis_service = RedisService(redis_client=redis_client)
 minio_service = MinioService(
     minio_client=minio_client,
     redis_client=redis_client
 )
+password_service = PasswordService(
+    executor=password_settings.PASSWORD_EXECUTOR,
+    workers=password_settings.PASSWORD_WORKERS,
+    max_concurrency=password_settings.PASSWORD_MAX_CONCURRENCY,
+    rounds=password_settings.BCRYPT_ROUNDS
+)
+note_cache = NoteCache(
+    redis=redis_client.redis,
+    max_bytes=cache_settings.NOTE_CACHE_MAX_BYTES,
+    max_entry_bytes=cache_settings.NOTE_CACHE_MAX_ENTRY_BYTES,
+    max_ttl=cache_settings.NOTE_CACHE_MAX_TTL,
+    enabled=cache_settings.NOTE_CACHE_ENABLED
+)
 storage_service = StorageService(
     redis_service=redis_service,
-    minio_service=minio_service
+    minio_service=minio_service,
+    password_service=password_service,
+    note_cache=note_cache
 )
 
-__all__ = ["storage_service"]
\ No newline at end of file
+__all__ = ["storage_service", "password_service", "note_cache"]
\ No newline at end of file
@@ -1,11 +1,76 @@
+from clients.redis_client import PENDING_FIELD
 from schemas.text import RedisTextLarge, TextCreateRequest
+from utils.compression import compress, decompress, decompress_stream
+from metrics import DEDUP_REQUESTS, DEDUP_BYTES_AVOIDED
+from utils.utils import note_etag
+from utils.streams import ClosingStream
+from typing import AsyncIterator
+import asyncio
+import hashlib
+import logging
+import secrets
 import time
 
+logger = logging.getLogger(__name__)
+
+# Тіла великих нотаток: blobs/<sha256>/<токен завантаження>, потокові - blobs/stream/<токен>,
+# бо sha256 відомий лише після завантаження. Токен робить ім'я кожного завантаження унікальним,
+# тож видалення старого тіла не зачепить нове з тим самим sha256
+BLOB_OBJECT_PREFIX = "blobs/"
+
+_DEDUP_HIT = DEDUP_REQUESTS.labels(result="hit")
+_DEDUP_MISS = DEDUP_REQUESTS.labels(result="miss")
+_AVOIDED_UPLOAD = DEDUP_BYTES_AVOIDED.labels(kind="upload")
+_AVOIDED_STORAGE = DEDUP_BYTES_AVOIDED.labels(kind="storage")
+
 
 class MinioService:
     def __init__(self, minio_client, redis_client):
         self.minio_client = minio_client
         self.redis_client = redis_client
+        self._pending_deletes: set[asyncio.Task] = set()
+
+    async def store_blob(self, text_bytes: bytes) -> tuple[str, str | None, str]:
+        """
+        Тіло за sha256 тексту з доданим посиланням: (object, codec, sha256).
+        Якщо такий текст уже збережено, ні стиснення, ні PUT не відбувається.
+        Посилання треба або записати в нотатку, або зняти через release_blob.
+        """
+        # sha256 відпускає GIL на великих буферах
+        digest = await asyncio.to_thread(lambda: hashlib.sha256(text_bytes).hexdigest())
+        blob = await self.redis_client.acquire_blob(digest)
+        if blob is not None:
+            object_name, codec, stored = blob
+            _DEDUP_HIT.inc()
+            _AVOIDED_UPLOAD.inc(stored)
+            return object_name, codec, digest
+
+        # Великі тіла стискаються в потоці: zstd відпускає GIL і не блокує event loop
+        payload, codec = await asyncio.to_thread(compress, text_bytes)
+        object_name = self._object_name(digest)
+        await self.minio_client.set(object_name, payload)
+        try:
+            canonical, canonical_codec = await self.redis_client.register_blob(
+                digest, object_name, codec, len(payload)
+            )
+        except Exception:
+            self.schedule_delete(object_name)
+            raise
+        self._count_registered(object_name, canonical, len(payload))
+        return canonical, canonical_codec, digest
+
+    def _count_registered(self, object_name: str, canonical: str, stored: int) -> None:
+        if canonical == object_name:
+            _DEDUP_MISS.inc()
+            return
+        # Паралельне завантаження того ж тексту зареєструвалось першим - наша копія зайва
+        _DEDUP_HIT.inc()
+        _AVOIDED_STORAGE.inc(stored)
+        self.schedule_delete(object_name)
+
+    @staticmethod
+    def _object_name(digest: str) -> str:
+        return f"{BLOB_OBJECT_PREFIX}{digest}/{secrets.token_hex(4)}"
 
     async def save_large_text(
         self,
@@ -13,31 +78,173 @@ class MinioService:
         data: TextCreateRequest,
         creator: str,
         size: int,
-        password: str | None
-    ) -> None:
-        text_bytes = data.text.encode("utf-8")
-        self.minio_client.set(key, text_bytes)
-
-        link = f"{key}"
-        expires_at = float((time.time()) + data.ttl)*1000
+        password: str | None,
+        blob: tuple[str, str | None, str]
+    ) -> bool:
+        """Запис нотатки з тілом із store_blob; False - колізія ключа, посилання лишається за викликачем"""
+        redis_data = self._build_record(
+            key=key,
+            creator=creator,
+            size=size,
+            ttl=data.ttl,
+            only_one_read=data.only_one_read,
+            password=password,
+            summary=data.summary,
+            blob=blob,
+            etag=note_etag(blob[2], data.summary, data.only_one_read, password)
+        )
+        return await self.redis_client.create(key, redis_data.model_dump())
 
-        redis_data = RedisTextLarge(
-            link_text=link,
+    async def replace_large_text(
+        self,
+        key: str,
+        data: TextCreateRequest,
+        creator: str,
+        size: int,
+        password: str | None,
+        blob: tuple[str, str | None, str]
+    ) -> dict | None:
+        """Перезаписує нотатку; повертає посилання заміненого запису на тіло (див. RedisClient.set)"""
+        redis_data = self._build_record(
+            key=key,
             creator=creator,
             size=size,
+            ttl=data.ttl,
             only_one_read=data.only_one_read,
             password=password,
             summary=data.summary,
-            expiresAt=expires_at
+            blob=blob,
+            etag=note_etag(blob[2], data.summary, data.only_one_read, password)
+        )
+        return await self.redis_client.set(key, redis_data.model_dump(), replace=True)
+
+    async def save_large_stream(
+        self,
+        key: str,
+        reader,
+        ttl: int,
+        only_one_read: bool,
+        creator: str,
+        password: str | None,
+        summary: str | None,
+        codec: str | None = None
+    ) -> bool:
+        """
+        Резервує ключ і заливає тіло з reader у MinIO частинами.
+        sha256 і розмір відомі лише після завантаження: тоді тіло реєструється за хешем
+        і посилання з розміром і ETag записуються в нотатку. До того резерв позначений pending
+        і читається як відсутня нотатка, тож одноразову не забере паралельний GET. Якщо такий текст уже був,
+        щойно завантажений об'єкт видаляється.
+        codec - кодек, яким reader стискає дані.
+        """
+        object_name = self._object_name("stream")
+        redis_data = self._build_record(
+            key=key,
+            creator=creator,
+            size=0,
+            ttl=ttl,
+            only_one_read=only_one_read,
+            password=password,
+            summary=summary,
+            blob=(object_name, codec, None)
         )
+        if not await self.redis_client.create(key, {**redis_data.model_dump(), PENDING_FIELD: True}):
+            return False
+        try:
+            await self.minio_client.put_stream(object_name, reader)
+            registered = await self.redis_client.register_blob(
+                reader.digest, object_name, codec, reader.stored, note_key=key, size=reader.size,
+                etag=note_etag(reader.digest, summary, only_one_read, password)
+            )
+        except Exception:
+            await self.redis_client.delete(key)
+            self.schedule_delete(object_name)
+            raise
+        if registered is None:
+            # Нотатку видалили під час завантаження
+            self.schedule_delete(object_name)
+            return True
+        self._count_registered(object_name, registered[0], reader.stored)
+        return True
 
-        await self.redis_client.set(
-            key,
-            redis_data.model_dump()
+    @staticmethod
+    def _build_record(
+        key: str,
+        creator: str,
+        size: int,
+        ttl: int,
+        only_one_read: bool,
+        password: str | None,
+        summary: str | None,
+        blob: tuple[str, str | None, str | None],
+        etag: str | None = None
+    ) -> RedisTextLarge:
+        link, codec, digest = blob
+        expires_at = float((time.time()) + ttl)*1000
+
+        return RedisTextLarge(
+            link_text=link,
+            creator=creator,
+            size=size,
+            only_one_read=only_one_read,
+            password=password,
+            summary=summary,
+            expiresAt=expires_at,
+            codec=codec,
+            blob=digest,
+            etag=etag
         )
 
-    def get_from_minio(self, key: str) -> bytes:
-        return self.minio_client.get(key)
+    async def get_from_minio(self, link: str, codec: str | None = None) -> bytes:
+        data = await self.minio_client.get(link)
+        if codec:
+            data = await asyncio.to_thread(decompress, data, codec)
+        return data
+
+    async def stream_from_minio(
+        self,
+        link: str,
+        codec: str | None = None,
+        size: int | None = None
+    ) -> tuple[dict, AsyncIterator[bytes]]:
+        headers, chunks = await self.minio_client.stream(link)
+        if codec:
+            # Клієнт отримує розпакований текст, його розмір зберігається в hash
+            headers["Content-Length"] = str(size)
+            chunks = ClosingStream(decompress_stream(chunks, codec), on_close=chunks.aclose)
+        return headers, chunks
+
+    async def release(self, redis_data: dict) -> None:
+        """
+        Знімає посилання нотатки на тіло; об'єкт видаляється разом з останнім посиланням.
+        Викликати рівно один раз на нотатку - тим, хто видалив її hash.
+        """
+        digest = redis_data.get('blob')
+        if digest:
+            object_name = await self.redis_client.release_blob(digest)
+        else:
+            # Нотатки до дедуплікації і з незавершеним потоковим завантаженням
+            object_name = redis_data['link_text']
+        if object_name:
+            await self.minio_client.delete(object_name)
+
+    async def release_blob(self, digest: str) -> None:
+        """Знімає посилання з store_blob, яке так і не потрапило в нотатку"""
+        await self.release({'blob': digest})
+
+    def schedule_release(self, redis_data: dict) -> None:
+        """release() у фоні, не затримуючи відповідь клієнту"""
+        self._track(asyncio.create_task(self.release(redis_data)))
+
+    def schedule_delete(self, object_name: str) -> None:
+        """Видаляє об'єкт у фоні, не затримуючи відповідь клієнту"""
+        self._track(asyncio.create_task(self.minio_client.delete(object_name)))
+
+    def _track(self, task: asyncio.Task) -> None:
+        self._pending_deletes.add(task)
+        task.add_done_callback(self._on_delete_done)
 
-    def delete_from_minio(self, key: str) -> bool:
-        return self.minio_client.delete(key)
+    def _on_delete_done(self, task: asyncio.Task) -> None:
+        self._pending_deletes.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Background MinIO delete failed: {task.exception()}")
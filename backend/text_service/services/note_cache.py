@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from metrics import NOTE_CACHE_BYTES, NOTE_CACHE_ENTRIES, NOTE_CACHE_REQUESTS
+from schemas.text import EncodedTextGetResponse
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "notes:invalidate"
+
+
+def note_expires_at(redis_data: dict) -> float | None:
+    """Unix time, коли нотатка зникне: велика має expiresAt (мс), мала - залишок TTL з Redis (pttl, мс)"""
+    if redis_data.get('expiresAt'):
+        return redis_data['expiresAt'] / 1000
+    pttl = redis_data.get('pttl')
+    return time.time() + pttl / 1000 if pttl and pttl > 0 else None
+
+
+class NoteCache:
+    """
+    In-process LRU кеш відповідей GET для звичайних нотаток
+    (не одноразових і без пароля), обмежений сумарним розміром тексту.
+    Зберігає вже закодовану відповідь разом з ETag (schemas.text.EncodedTextGetResponse).
+    Запис живе не довше за TTL самої нотатки і max_ttl.
+    Оновлення/видалення публікуються в Redis pub/sub, щоб усі репліки скинули ключ.
+    """
+
+    def __init__(self, redis, max_bytes: int, max_entry_bytes: int, max_ttl: float, enabled: bool = True):
+        self.redis = redis
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.max_ttl = max_ttl
+        self.enabled = enabled
+        self._entries: OrderedDict[str, tuple[EncodedTextGetResponse, float, int]] = OrderedDict()
+        self._bytes = 0
+        # Лічильник інвалідацій: відповідь, прочитана до інвалідації, в кеш не потрапляє
+        self.version = 0
+        self._listener: asyncio.Task | None = None
+        self._hit = NOTE_CACHE_REQUESTS.labels(result="hit")
+        self._miss = NOTE_CACHE_REQUESTS.labels(result="miss")
+
+    def get(self, key: str) -> EncodedTextGetResponse | None:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            self._miss.inc()
+            return None
+        response, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._evict(key)
+            self._miss.inc()
+            return None
+        self._entries.move_to_end(key)
+        self._hit.inc()
+        return response
+
+    def put(self, key: str, response: EncodedTextGetResponse, redis_data: dict, version: int) -> None:
+        if not self.enabled or version != self.version:
+            return
+        if redis_data.get('only_one_read') or redis_data.get('password'):
+            return
+        size = redis_data['size']
+        if size > self.max_entry_bytes:
+            return
+
+        ttl = self._remaining_ttl(redis_data)
+        if ttl <= 0:
+            return
+
+        self._evict(key)
+        self._entries[key] = (response, time.monotonic() + min(ttl, self.max_ttl), size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+        self._update_gauges()
+
+    @staticmethod
+    def _remaining_ttl(redis_data: dict) -> float:
+        expires_at = note_expires_at(redis_data)
+        return expires_at - time.time() if expires_at else 0
+
+    def _evict(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+            self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        NOTE_CACHE_BYTES.set(self._bytes)
+        NOTE_CACHE_ENTRIES.set(len(self._entries))
+
+    def clear(self) -> None:
+        self.version += 1
+        self._entries.clear()
+        self._bytes = 0
+        self._update_gauges()
+
+    async def invalidate(self, key: str) -> None:
+        """Скидає ключ локально і в усіх репліках"""
+        self.version += 1
+        self._evict(key)
+        if self.enabled:
+            try:
+                await self.redis.publish(INVALIDATION_CHANNEL, key)
+            except Exception as e:
+                logger.error(f"Cache invalidation publish failed key={key}: {e}")
+
+    def start(self) -> None:
+        if self.enabled and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                logger.info("Note cache subscribed to invalidations")
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    key = message["data"]
+                    key = key.decode("utf-8") if isinstance(key, bytes) else key
+                    self.version += 1
+                    self._evict(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Поки підписки немає, інвалідації можуть загубитись - кеш скидається повністю
+                logger.error(f"Note cache invalidation listener failed: {e}")
+                self.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from metrics import PASSWORD_IN_FLIGHT, PASSWORD_QUEUE_DEPTH, PASSWORD_WAIT_SECONDS
+from utils.utils import hash_password, verify_password
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordService:
+    """
+    bcrypt у окремому пулі (процеси за замовчуванням), щоб не блокувати event loop.
+    Кількість одночасних викликів обмежена семафором.
+    """
+
+    def __init__(self, executor: str, workers: int, max_concurrency: int, rounds: int):
+        self.executor_kind = executor
+        self.workers = workers
+        self.rounds = rounds
+        self._executor: Executor | None = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._hash_wait = PASSWORD_WAIT_SECONDS.labels(operation="hash")
+        self._verify_wait = PASSWORD_WAIT_SECONDS.labels(operation="verify")
+
+    def _get_executor(self) -> Executor:
+        # Пул створюється ліниво, щоб не форкати процеси під час імпорту
+        if self._executor is None:
+            if self.executor_kind == "thread":
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="bcrypt")
+            else:
+                self._executor = ProcessPoolExecutor(self.workers)
+            logger.info(f"Password executor started: {self.executor_kind} workers={self.workers}")
+        return self._executor
+
+    async def _run(self, wait_metric, fn, *args):
+        PASSWORD_QUEUE_DEPTH.inc()
+        start = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            PASSWORD_QUEUE_DEPTH.dec()
+        wait_metric.observe(time.perf_counter() - start)
+
+        PASSWORD_IN_FLIGHT.inc()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            PASSWORD_IN_FLIGHT.dec()
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hash_wait, hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self._verify_wait, verify_password, password, hashed_password)
+
+    async def warm_up(self) -> None:
+        """Запускає пул при старті: процеси створюються до першого запиту з паролем, а не під час нього"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, int) for _ in range(self.workers)))
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
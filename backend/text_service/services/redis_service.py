@@ -1,4 +1,10 @@
+import hashlib
+import secrets
+
 from schemas.text import RedisTextSmall, TextCreateRequest
+from utils.compression import compress, decompress
+from config import app_settings
+from utils.utils import note_etag
 
 
 class RedisService:
@@ -12,19 +18,83 @@ class RedisService:
             creator: str,
             size: int,
             password: str | None
-    ) -> None:
+    ) -> bool:
+        record = self.build_small_record(data, creator, size, password)
+        return await self.redis_client.create(key, record, ttl=data.ttl)
+
+    async def replace_small_text(
+            self,
+            key: str,
+            data: TextCreateRequest,
+            creator: str,
+            size: int,
+            password: str | None
+    ) -> dict | None:
+        """Перезаписує нотатку; повертає посилання заміненого запису на тіло, якщо той був великим"""
+        record = self.build_small_record(data, creator, size, password)
+        return await self.redis_client.set(key, record, ttl=data.ttl, replace=True)
+
+    async def save_small_texts(self, entries: list[tuple[str, dict, int]]) -> list[bool]:
+        """Пакетний create: entries - (key, record з build_small_record, ttl)"""
+        return await self.redis_client.create_many(entries)
+
+    @staticmethod
+    def build_small_record(
+            data: TextCreateRequest,
+            creator: str,
+            size: int,
+            password: str | None
+    ) -> dict:
+        text_bytes = data.text.encode('utf-8')
+        payload, codec = compress(text_bytes)
+        etag = None
+        if not data.only_one_read and not password:
+            etag = note_etag(hashlib.sha256(text_bytes).hexdigest(), data.summary, data.only_one_read, password)
         redis_data = RedisTextSmall(
-            text=data.text,
+            text=data.text if codec is None else "",
             creator=creator,
             size=size,
             only_one_read=data.only_one_read,
             password=password,
-            summary=data.summary
+            summary=data.summary,
+            codec=codec,
+            etag=etag
         )
-        await self.redis_client.set(key, redis_data.model_dump(), ttl=data.ttl)
+        record = redis_data.model_dump()
+        if codec is not None:
+            record['text'] = payload
+        return record
 
     async def get_from_redis(self, key: str) -> dict | None:
-        return await self.redis_client.get(key)
+        return self._decompress(await self.redis_client.get(key))
+
+    async def get_and_claim(self, key: str) -> dict | None:
+        return self._decompress(await self.redis_client.get_and_claim(key))
+
+    async def get_and_claim_many(self, keys: list[str]) -> list[dict | None]:
+        return [self._decompress(record) for record in await self.redis_client.get_and_claim_many(keys)]
+
+    @staticmethod
+    def _decompress(record: dict | None) -> dict | None:
+        if record and record.get('codec') and 'text' in record:
+            record['text'] = decompress(record['text'], record['codec']).decode('utf-8')
+        return record
+
+    async def enqueue_summaries(self, notes: list[tuple[str, str]]) -> list[int]:
+        """
+        Задачі на фоновий summary; notes - (key, creator). Текст у задачу не кладеться:
+        ai_service читає тіло сам (GET /raw?consume=false), тож stream лишається малим.
+        """
+        jobs = []
+        for key, creator in notes:
+            job = secrets.token_hex(8)
+            jobs.append((key, job, {"key": key, "job": job, "creator": creator}))
+        return await self.redis_client.enqueue_summaries(
+            app_settings.AUTO_SUMMARY_STREAM,
+            app_settings.AUTO_SUMMARY_STREAM_MAXLEN,
+            jobs
+        )
 
-    async def delete_from_redis(self, key: str) -> None:
-        await self.redis_client.delete(key)
\ No newline at end of file
+    async def delete_from_redis(self, key: str) -> dict | None:
+        """None - нотатки вже не було; інакше посилання видаленого запису на тіло (див. RedisClient.delete)"""
+        return await self.redis_client.delete(key)
\ No newline at end of file
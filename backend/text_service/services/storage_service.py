@@ -1,139 +1,570 @@
+from typing import AsyncIterator
+import asyncio
+import logging
+
+import orjson
+
 from schemas.text import (
     TextCreateRequest,
     TextCreateResponse,
     TextGetResponse,
     PasswordRequiredResponse,
-    TextUpdateRequest
+    TextUpdateRequest,
+    TextBatchCreateItem,
+    TextBatchGetItem,
+    EncodedTextGetResponse,
+    encode_text_get_response
 )
-from utils.utils import generate_key, hash_password, verify_password
+from services.note_cache import note_expires_at
+from utils.utils import generate_key, etag_matches
+from utils.streams import AsyncBodyReader, ClosingStream
+from utils.compression import stream_codec, stream_compressor
 from config import app_settings
-
-from fastapi.concurrency import run_in_threadpool
+from metrics import KEY_ALLOCATION_RETRIES, STAGE_SECONDS, PAYLOAD_BYTES, CONDITIONAL_GETS
+
+logger = logging.getLogger(__name__)
+
+# Дочірні гістограми прив'язані один раз, на запит лише observe()
+_CREATE_HASH = STAGE_SECONDS.labels(operation="create", stage="hash")
+_CREATE_WRITE = STAGE_SECONDS.labels(operation="create", stage="write")
+_CREATE_ENQUEUE = STAGE_SECONDS.labels(operation="create", stage="enqueue")
+_CREATE_BATCH_WRITE = STAGE_SECONDS.labels(operation="create_batch", stage="write")
+_GET_CACHE = STAGE_SECONDS.labels(operation="get", stage="cache")
+_GET_CLAIM = STAGE_SECONDS.labels(operation="get", stage="claim")
+_GET_BODY = STAGE_SECONDS.labels(operation="get", stage="body")
+_GET_BATCH_CLAIM = STAGE_SECONDS.labels(operation="get_batch", stage="claim")
+_GET_BATCH_BODY = STAGE_SECONDS.labels(operation="get_batch", stage="body")
+_STREAM_CLAIM = STAGE_SECONDS.labels(operation="get_stream", stage="claim")
+_STREAM_OPEN = STAGE_SECONDS.labels(operation="get_stream", stage="open")
+_VERIFY_READ = STAGE_SECONDS.labels(operation="verify", stage="read")
+_VERIFY_CHECK = STAGE_SECONDS.labels(operation="verify", stage="bcrypt")
+_VERIFY_BODY = STAGE_SECONDS.labels(operation="verify", stage="body")
+_UPDATE_READ = STAGE_SECONDS.labels(operation="update", stage="read")
+_UPDATE_HASH = STAGE_SECONDS.labels(operation="update", stage="hash")
+_UPDATE_WRITE = STAGE_SECONDS.labels(operation="update", stage="write")
+_DELETE_READ = STAGE_SECONDS.labels(operation="delete", stage="read")
+_DELETE_WRITE = STAGE_SECONDS.labels(operation="delete", stage="write")
+_CREATE_BYTES = PAYLOAD_BYTES.labels(operation="create")
+_GET_BYTES = PAYLOAD_BYTES.labels(operation="get")
+_UPDATE_BYTES = PAYLOAD_BYTES.labels(operation="update")
+_NOT_MODIFIED = CONDITIONAL_GETS.labels(result="not_modified")
+_MODIFIED = CONDITIONAL_GETS.labels(result="modified")
+
+
+class ReadOnceNoteError(Exception):
+    """Одноразову нотатку запитано без прочитання: віддати її тіло можна лише разом з видаленням"""
 
 
 class StorageService:
 
-    def __init__(self, redis_service, minio_service):
+    def __init__(self, redis_service, minio_service, password_service, note_cache):
         self.redis_service = redis_service
         self.minio_service = minio_service
+        self.password_service = password_service
+        self.note_cache = note_cache
 
     async def create_text(self, data: TextCreateRequest, creator: str) -> TextCreateResponse:
 
-        while True:
-            key = generate_key(data.ttl)
-            exists = await self.redis_service.get_from_redis(key)
-            if not exists:
-                break
+        text_bytes = data.text.encode('utf-8')
+        text_size = len(text_bytes)
+        _CREATE_BYTES.observe(text_size)
+
+        with _CREATE_HASH.time():
+            hashed_password = await self.password_service.hash(data.password) if data.password else None
+
+        # Ключ резервується самим записом (NX), окремої перевірки не потрібно
+        retries = 0
+        with _CREATE_WRITE.time():
+            # Тіло великої нотатки зберігається один раз: колізія ключа повторює лише запис hash
+            blob = None
+            if text_size >= app_settings.SIZE_THRESHOLD:
+                blob = await self.minio_service.store_blob(text_bytes)
+            try:
+                while True:
+                    key = generate_key(data.ttl)
+                    if blob is None:
+                        created = await self.redis_service.save_small_text(
+                            key=key,
+                            data=data,
+                            creator=creator,
+                            size=text_size,
+                            password=hashed_password
+                        )
+                    else:
+                        created = await self.minio_service.save_large_text(
+                            key=key,
+                            data=data,
+                            creator=creator,
+                            size=text_size,
+                            password=hashed_password,
+                            blob=blob
+                        )
+                    if created:
+                        break
+                    retries += 1
+            except Exception:
+                if blob is not None:
+                    await self.minio_service.release_blob(blob[2])
+                raise
+
+        KEY_ALLOCATION_RETRIES.labels(ttl=str(data.ttl)).observe(retries)
+
+        if self._wants_summary(data, text_size):
+            with _CREATE_ENQUEUE.time():
+                await self._enqueue_summaries([key], creator)
 
-        text_size = len(data.text.encode('utf-8'))
+        return TextCreateResponse(key=key)
 
-        hashed_password = hash_password(data.password) if data.password else None
+    @staticmethod
+    def _wants_summary(data: TextCreateRequest, size: int) -> bool:
+        if not data.auto_summary or data.summary:
+            return False
+        # ai_service читає тіло без пароля і без видалення: захищену чи одноразову нотатку він не отримає
+        if data.password:
+            logger.debug("Auto summary skipped: note is password protected")
+            return False
+        if data.only_one_read:
+            logger.debug("Auto summary skipped: note is read-once")
+            return False
+        if size > app_settings.AUTO_SUMMARY_MAX_BYTES:
+            logger.warning("Auto summary skipped: note is too large size=%d", size)
+            return False
+        return True
 
-        if text_size < app_settings.SIZE_THRESHOLD:
-            await self.redis_service.save_small_text(
-                key=key,
-                data=data,
+    async def _enqueue_summaries(self, keys: list[str], creator: str) -> None:
+        """Нотатка вже збережена, тож помилка черги її не скасовує - summary просто не з'явиться"""
+        try:
+            results = await self.redis_service.enqueue_summaries([(key, creator) for key in keys])
+        except Exception as e:
+            logger.error("Auto summary enqueue failed notes=%d: %s", len(keys), e)
+            return
+        rejected = results.count(-1)
+        if rejected:
+            logger.warning("Auto summary queue is full, skipped notes=%d", rejected)
+
+    async def create_texts(self, items: list[TextCreateRequest], creator: str) -> list[TextBatchCreateItem]:
+        """
+        Пакетне створення. Малі нотатки пишуться одним pipeline (колізії - наступним колом),
+        великі зберігаються паралельно з обмеженням на кількість одночасних завантажень в MinIO.
+        """
+        results: list[TextBatchCreateItem | None] = [None] * len(items)
+        small: dict[int, TextCreateRequest] = {}
+        large: dict[int, TextCreateRequest] = {}
+        for i, item in enumerate(items):
+            if len(item.text.encode('utf-8')) < app_settings.SIZE_THRESHOLD:
+                small[i] = item
+            else:
+                large[i] = item
+
+        semaphore = asyncio.Semaphore(app_settings.BATCH_MINIO_CONCURRENCY)
+
+        async def create_large(i: int, item: TextCreateRequest) -> None:
+            async with semaphore:
+                try:
+                    response = await self.create_text(item, creator)
+                    results[i] = TextBatchCreateItem(status="created", key=response.key)
+                except Exception as e:
+                    logger.error(f"Batch create error item={i}: {e}")
+                    results[i] = TextBatchCreateItem(status="error")
+
+        await asyncio.gather(
+            self._create_small_texts(small, creator, results),
+            *(create_large(i, item) for i, item in large.items())
+        )
+        return results
+
+    async def _create_small_texts(
+            self,
+            items: dict[int, TextCreateRequest],
+            creator: str,
+            results: list
+    ) -> None:
+        if not items:
+            return
+
+        hashed = await asyncio.gather(*(
+            self.password_service.hash(item.password) if item.password else asyncio.sleep(0)
+            for item in items.values()
+        ))
+        records = {
+            i: self.redis_service.build_small_record(
+                data=item,
                 creator=creator,
-                size=text_size,
-                password=hashed_password
+                size=len(item.text.encode('utf-8')),
+                password=password
             )
+            for (i, item), password in zip(items.items(), hashed)
+        }
+
+        pending = list(items)
+        retries = dict.fromkeys(items, 0)
+        try:
+            with _CREATE_BATCH_WRITE.time():
+                while pending:
+                    keys = {i: generate_key(items[i].ttl) for i in pending}
+                    created = await self.redis_service.save_small_texts(
+                        [(keys[i], records[i], items[i].ttl) for i in pending]
+                    )
+                    collided = []
+                    for i, ok in zip(pending, created):
+                        if ok:
+                            results[i] = TextBatchCreateItem(status="created", key=keys[i])
+                        else:
+                            collided.append(i)
+                            retries[i] += 1
+                    pending = collided
+        except Exception as e:
+            logger.error(f"Batch create error items={len(pending)}: {e}")
+            for i in pending:
+                results[i] = TextBatchCreateItem(status="error")
+
+        for i, count in retries.items():
+            KEY_ALLOCATION_RETRIES.labels(ttl=str(items[i].ttl)).observe(count)
+
+        summaries = [
+            results[i].key
+            for i, item in items.items()
+            if results[i].status == "created" and self._wants_summary(item, len(item.text.encode('utf-8')))
+        ]
+        if summaries:
+            await self._enqueue_summaries(summaries, creator)
+
+    async def create_text_stream(
+            self,
+            chunks: AsyncIterator[bytes],
+            ttl: int,
+            only_one_read: bool,
+            password: str | None,
+            summary: str | None,
+            creator: str
+    ) -> TextCreateResponse:
+        """
+        Створення нотатки з сирого тіла запиту без буферизації всього тексту.
+        Redis чи MinIO вирішується за кількістю прочитаних байтів.
+        """
+        head = bytearray()
+        async for chunk in chunks:
+            head += chunk
+            if len(head) >= app_settings.SIZE_THRESHOLD:
+                break
         else:
-            await self.minio_service.save_large_text(
+            # Тіло закінчилось до порогу - звичайна мала нотатка
+            data = TextCreateRequest(
+                text=head.decode('utf-8'),
+                ttl=ttl,
+                only_one_read=only_one_read,
+                password=password,
+                summary=summary
+            )
+            return await self.create_text(data, creator)
+
+        codec = stream_codec()
+        reader = AsyncBodyReader(chunks, prefix=bytes(head), compressor=stream_compressor(codec))
+        hashed_password = await self.password_service.hash(password) if password else None
+
+        retries = 0
+        while True:
+            key = generate_key(ttl)
+            created = await self.minio_service.save_large_stream(
                 key=key,
-                data=data,
+                reader=reader,
+                ttl=ttl,
+                only_one_read=only_one_read,
                 creator=creator,
-                size=text_size,
-                password=hashed_password
+                password=hashed_password,
+                summary=summary,
+                codec=codec
             )
+            if created:
+                break
+            retries += 1
+
+        KEY_ALLOCATION_RETRIES.labels(ttl=str(ttl)).observe(retries)
 
         return TextCreateResponse(key=key)
 
-    async def _build_text_response(self, key: str, redis_data: dict) -> TextGetResponse:
+    async def _build_text_response(
+            self,
+            key: str,
+            redis_data: dict,
+            claimed: bool = False
+    ) -> TextGetResponse | None:
+        text = await self._read_text(key, redis_data, claimed)
+        if text is None:
+            return None
+        return TextGetResponse(
+            text=text,
+            size=redis_data['size'],
+            summary=redis_data.get('summary')
+        )
+
+    async def _read_text(self, key: str, redis_data: dict, claimed: bool = False) -> str | None:
+
+        # Одноразову нотатку спочатку забираємо собі: DEL поверне 1 лише одному запиту.
+        # Звільняється тіло з того ж MULTI, що й DEL: update міг замінити запис після читання
+        deleted = redis_data
+        if redis_data.get('only_one_read') and not claimed:
+            deleted = await self.redis_service.delete_from_redis(key)
+            if deleted is None:
+                return None
+            claimed = True
 
         if 'link_text' in redis_data:
-            text_bytes = await run_in_threadpool(self.minio_service.get_from_minio, key)
+            text_bytes = await self.minio_service.get_from_minio(
+                redis_data['link_text'],
+                codec=redis_data.get('codec')
+            )
             text = text_bytes.decode('utf-8')
         else:
             text = redis_data['text']
+        if claimed and deleted.get('link_text'):
+            self.minio_service.schedule_release(deleted)
+        return text
+
+    async def get_text(
+            self,
+            key: str,
+            if_none_match: str | None = None
+    ) -> EncodedTextGetResponse | PasswordRequiredResponse | None:
+        """
+        Відповідь GET уже закодована в JSON (як TextGetResponse): роут віддає її без response_model.
+        В кеші лежать ці ж байти, тож влучання не кодує нічого.
+        Якщо ETag з запису збігся з if_none_match, тіло не читається (body=None, відповідь 304).
+        """
+        with _GET_CACHE.time():
+            cached = self.note_cache.get(key)
+        if cached is not None:
+            return self._check_not_modified(cached, if_none_match)
+        version = self.note_cache.version
+
+        # Одноразова нотатка без пароля видаляється цим же викликом
+        with _GET_CLAIM.time():
+            redis_data = await self.redis_service.get_and_claim(key)
+        if not redis_data:
+            return None
 
-        if redis_data.get('only_one_read'):
-            await self._delete_text_data(key, redis_data)
+        if redis_data.get('password'):
+            return PasswordRequiredResponse(password_required=True)
 
-        return TextGetResponse(
-            text=text,
-            size=redis_data['size'],
-            summary=redis_data.get('summary')
-        )
+        # Одноразова нотатка вже забрана цим читанням - їй лише повне тіло без ETag
+        etag = None if redis_data.get('only_one_read') else redis_data.get('etag')
+        expires_at = note_expires_at(redis_data)
+        if self._not_modified(etag, if_none_match):
+            return EncodedTextGetResponse(body=None, etag=etag, expires_at=expires_at)
 
-    async def get_text(self, key: str) -> TextGetResponse | PasswordRequiredResponse | None:
-        redis_data = await self.redis_service.get_from_redis(key)
+        with _GET_BODY.time():
+            text = await self._read_text(key, redis_data, claimed=redis_data.get('only_one_read', False))
+        if text is None:
+            return None
+        _GET_BYTES.observe(redis_data['size'])
+        response = EncodedTextGetResponse(
+            body=encode_text_get_response(text, redis_data['size'], redis_data.get('summary')),
+            etag=etag,
+            expires_at=expires_at
+        )
+        self.note_cache.put(key, response, redis_data, version)
+        return response
+
+    def _check_not_modified(
+            self,
+            response: EncodedTextGetResponse,
+            if_none_match: str | None
+    ) -> EncodedTextGetResponse:
+        if self._not_modified(response.etag, if_none_match):
+            return response._replace(body=None)
+        return response
+
+    @staticmethod
+    def _not_modified(etag: str | None, if_none_match: str | None) -> bool:
+        if not if_none_match or etag is None:
+            return False
+        if etag_matches(if_none_match, etag):
+            _NOT_MODIFIED.inc()
+            return True
+        _MODIFIED.inc()
+        return False
+
+    async def get_texts(self, keys: list[str]) -> list[TextBatchGetItem]:
+        """
+        Пакетне читання: кеш, потім один pipeline зі скриптом get_and_claim,
+        потім паралельне читання тіл з MinIO з обмеженням одночасних запитів.
+        """
+        results: list[TextBatchGetItem | None] = [None] * len(keys)
+        misses = []
+        for i, key in enumerate(keys):
+            cached = self.note_cache.get(key)
+            if cached is not None:
+                results[i] = TextBatchGetItem(key=key, status="ok", **orjson.loads(cached.body))
+            else:
+                misses.append(i)
+
+        if misses:
+            version = self.note_cache.version
+            with _GET_BATCH_CLAIM.time():
+                records = await self.redis_service.get_and_claim_many([keys[i] for i in misses])
+            semaphore = asyncio.Semaphore(app_settings.BATCH_MINIO_CONCURRENCY)
+
+            async def build(i: int, redis_data: dict) -> None:
+                key = keys[i]
+                async with semaphore:
+                    try:
+                        response = await self._build_text_response(
+                            key, redis_data, claimed=redis_data.get('only_one_read', False)
+                        )
+                    except Exception as e:
+                        logger.error(f"Batch get error key={key}: {e}")
+                        results[i] = TextBatchGetItem(key=key, status="error")
+                        return
+                if response is None:
+                    results[i] = TextBatchGetItem(key=key, status="not_found")
+                    return
+                encoded = EncodedTextGetResponse(
+                    body=encode_text_get_response(response.text, response.size, response.summary),
+                    etag=redis_data.get('etag'),
+                    expires_at=note_expires_at(redis_data)
+                )
+                self.note_cache.put(key, encoded, redis_data, version)
+                results[i] = TextBatchGetItem(key=key, status="ok", **response.model_dump())
+
+            builds = []
+            for i, redis_data in zip(misses, records):
+                if not redis_data:
+                    results[i] = TextBatchGetItem(key=keys[i], status="not_found")
+                elif redis_data.get('password'):
+                    results[i] = TextBatchGetItem(key=keys[i], status="password_required")
+                else:
+                    builds.append(build(i, redis_data))
+            with _GET_BATCH_BODY.time():
+                await asyncio.gather(*builds)
+
+        return results
+
+    async def get_text_stream(
+            self,
+            key: str,
+            consume: bool = True
+    ) -> tuple[dict, AsyncIterator[bytes]] | PasswordRequiredResponse | None:
+        """
+        Тіло нотатки як потік байтів: великі нотатки віддаються з MinIO частинами.
+        consume=False - читання без видалення (наприклад, для summary в ai_service):
+        одноразова нотатка лишається цілою, а замість тіла - ReadOnceNoteError.
+        """
+        with _STREAM_CLAIM.time():
+            if consume:
+                redis_data = await self.redis_service.get_and_claim(key)
+            else:
+                redis_data = await self.redis_service.get_from_redis(key)
         if not redis_data:
             return None
 
         if redis_data.get('password'):
             return PasswordRequiredResponse(password_required=True)
+        if not consume and redis_data.get('only_one_read'):
+            raise ReadOnceNoteError(key)
+
+        if 'link_text' not in redis_data:
+            body = redis_data['text'].encode('utf-8')
+            return {"Content-Length": str(len(body))}, self._single_chunk(body)
+
+        _GET_BYTES.observe(redis_data['size'])
+        with _STREAM_OPEN.time():
+            headers, chunks = await self.minio_service.stream_from_minio(
+                redis_data['link_text'],
+                codec=redis_data.get('codec'),
+                size=redis_data['size']
+            )
+        if redis_data.get('only_one_read'):
+            # Нотатку вже видалено GET_AND_CLAIM_LUA: посилання на тіло знімається при закритті потоку,
+            # хоч би скільки з нього встигли прочитати
+            chunks = ClosingStream(chunks, on_close=lambda: self.minio_service.schedule_release(redis_data))
+        return headers, chunks
 
-        return await self._build_text_response(key, redis_data)
+    @staticmethod
+    async def _single_chunk(body: bytes) -> AsyncIterator[bytes]:
+        yield body
 
     async def verify_text_password(self, key: str, password: str) -> TextGetResponse | None:
-        redis_data = await self.redis_service.get_from_redis(key)
+        with _VERIFY_READ.time():
+            redis_data = await self.redis_service.get_from_redis(key)
         if not redis_data:
             return None
 
         if not redis_data.get('password'):
             return None
 
-        if not verify_password(password, redis_data['password']):
+        with _VERIFY_CHECK.time():
+            verified = await self.password_service.verify(password, redis_data['password'])
+        if not verified:
             return None
 
-        return await self._build_text_response(key, redis_data)
+        with _VERIFY_BODY.time():
+            return await self._build_text_response(key, redis_data)
 
     async def update_text(self, key: str, data: TextUpdateRequest, creator: str) -> bool:
-        old_data = await self.redis_service.get_from_redis(key)
+        with _UPDATE_READ.time():
+            old_data = await self.redis_service.get_from_redis(key)
         if not old_data:
             return False
 
         if old_data['creator'] != creator:
             return False
 
-        await self._delete_text_data(key, old_data)
-
-        text_size = len(data.text.encode("utf-8"))
-        hashed_password = hash_password(data.password) if data.password else None
-
-        if text_size < app_settings.SIZE_THRESHOLD:
-            await self.redis_service.save_small_text(
-                key=key,
-                data=data,
-                creator=creator,
-                size=text_size,
-                password=hashed_password
-            )
-        else:
-            await self.minio_service.save_large_text(
-                key=key,
-                data=data,
-                creator=creator,
-                size=text_size,
-                password=hashed_password
-            )
-
+        text_bytes = data.text.encode("utf-8")
+        text_size = len(text_bytes)
+        _UPDATE_BYTES.observe(text_size)
+        with _UPDATE_HASH.time():
+            hashed_password = await self.password_service.hash(data.password) if data.password else None
+
+        # Старий запис перезаписується в тій самій транзакції, що й новий.
+        # Незмінене велике тіло знаходиться за sha256 і повторно не завантажується
+        with _UPDATE_WRITE.time():
+            if text_size < app_settings.SIZE_THRESHOLD:
+                replaced = await self.redis_service.replace_small_text(
+                    key=key,
+                    data=data,
+                    creator=creator,
+                    size=text_size,
+                    password=hashed_password
+                )
+            else:
+                blob = await self.minio_service.store_blob(text_bytes)
+                try:
+                    replaced = await self.minio_service.replace_large_text(
+                        key=key,
+                        data=data,
+                        creator=creator,
+                        size=text_size,
+                        password=hashed_password,
+                        blob=blob
+                    )
+                except Exception:
+                    await self.minio_service.release_blob(blob[2])
+                    raise
+            if replaced is not None:
+                await self.minio_service.release(replaced)
+
+        await self.note_cache.invalidate(key)
         return True
 
     async def delete_text(self, key: str, creator: str) -> bool:
 
-        redis_data = await self.redis_service.get_from_redis(key)
+        with _DELETE_READ.time():
+            redis_data = await self.redis_service.get_from_redis(key)
 
         if not redis_data or redis_data['creator'] != creator:
             return False
 
-        await self._delete_text_data(key, redis_data)
+        with _DELETE_WRITE.time():
+            await self._delete_text_data(key)
+        await self.note_cache.invalidate(key)
 
         return True
 
-    async def _delete_text_data(self, key: str, redis_data: dict) -> None:
+    async def _delete_text_data(self, key: str) -> None:
 
-        await self.redis_service.delete_from_redis(key)
+        deleted = await self.redis_service.delete_from_redis(key)
 
-        if 'link_text' in redis_data:
-            await run_in_threadpool(self.minio_service.delete_from_minio, key)
+        # Тіло звільняє лише той, хто справді видалив hash (а не одноразове читання чи sweeper),
+        # і саме те, на яке посилався видалений запис, а не прочитаний раніше
+        if deleted is not None and deleted['link_text']:
+            await self.minio_service.release(deleted)
@@ -0,0 +1,259 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+import clients.redis_client as redis_client_module
+from clients.redis_client import BLOB_PREFIX, RedisClient
+from schemas.text import TextCreateRequest, TextUpdateRequest
+from services.minio_service import MinioService
+from services.note_cache import NoteCache
+from services.password_service import PasswordService
+from services.redis_service import RedisService
+from services.storage_service import StorageService
+from utils.responses import ClosingStreamingResponse
+from utils.streams import AsyncBodyReader, ClosingStream
+
+CREATOR = "session-1"
+LARGE_A = "a" * 20000
+LARGE_B = "b" * 20000
+
+
+class FakeMinioClient:
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+        self.deleted: list[str] = []
+        self.released: list[str] = []
+        # Якщо задано, put_stream чекає його перед записом об'єкта
+        self.upload_gate: asyncio.Event | None = None
+
+    async def set(self, object_name: str, data: bytes):
+        self.objects[object_name] = data
+
+    async def put_stream(self, object_name: str, reader):
+        data = await reader.read()
+        if self.upload_gate is not None:
+            await self.upload_gate.wait()
+        self.objects[object_name] = data
+
+    async def get(self, object_name: str) -> bytes:
+        return self.objects[object_name]
+
+    async def stream(self, object_name: str):
+        data = self.objects[object_name]
+
+        async def chunks():
+            yield data
+
+        return {"Content-Length": str(len(data)), "ETag": "x"}, ClosingStream(
+            chunks(), on_close=lambda: self.released.append(object_name)
+        )
+
+    async def delete(self, object_name: str) -> bool:
+        self.deleted.append(object_name)
+        return self.objects.pop(object_name, None) is not None
+
+
+@pytest.fixture
+async def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(redis_client_module, "create_redis_client", lambda: client)
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+def redis(fake_redis):
+    return RedisClient()
+
+
+@pytest.fixture
+def minio():
+    return FakeMinioClient()
+
+
+@pytest.fixture
+def storage(fake_redis, redis, minio):
+    password_service = PasswordService(executor="thread", workers=1, max_concurrency=1, rounds=4)
+    yield StorageService(
+        redis_service=RedisService(redis_client=redis),
+        minio_service=MinioService(minio_client=minio, redis_client=redis),
+        password_service=password_service,
+        note_cache=NoteCache(redis=fake_redis, max_bytes=0, max_entry_bytes=0, max_ttl=0, enabled=False)
+    )
+    password_service.close()
+
+
+async def settle(storage: StorageService):
+    """Дочекатися фонових release/delete"""
+    while storage.minio_service._pending_deletes:
+        await asyncio.gather(*storage.minio_service._pending_deletes)
+
+
+async def blob_keys(fake_redis) -> list[bytes]:
+    return [key async for key in fake_redis.scan_iter(f"{BLOB_PREFIX}*")]
+
+
+async def create(storage: StorageService, text: str, only_one_read: bool = False) -> str:
+    data = TextCreateRequest(text=text, ttl=3600, only_one_read=only_one_read)
+    return (await storage.create_text(data, CREATOR)).key
+
+
+async def read(storage: StorageService, key: str) -> str | None:
+    redis_data = await storage.redis_service.get_from_redis(key)
+    return await storage._read_text(key, redis_data) if redis_data else None
+
+
+async def test_acquire_blob_only_for_registered_body(redis):
+    assert await redis.acquire_blob("d1") is None
+
+    assert await redis.register_blob("d1", "blobs/d1/x", "zstd", 100) == ("blobs/d1/x", "zstd")
+    assert await redis.acquire_blob("d1") == ("blobs/d1/x", "zstd", 100)
+    assert await redis.redis.hget(f"{BLOB_PREFIX}d1", "refs") == b"2"
+
+
+async def test_register_blob_race_keeps_first_upload(redis):
+    # Два паралельні завантаження того ж тексту: обидва посилаються на об'єкт першого
+    first, second = await asyncio.gather(
+        redis.register_blob("d1", "blobs/d1/first", "zstd", 100),
+        redis.register_blob("d1", "blobs/d1/second", None, 300),
+    )
+    assert first == second == ("blobs/d1/first", "zstd")
+    assert await redis.redis.hget(f"{BLOB_PREFIX}d1", "refs") == b"2"
+
+    assert await redis.release_blob("d1") is None
+    assert await redis.release_blob("d1") == "blobs/d1/first"
+    assert await redis.redis.exists(f"{BLOB_PREFIX}d1") == 0
+
+
+async def test_register_blob_skips_deleted_note(redis):
+    assert await redis.register_blob("d1", "blobs/d1/x", None, 100, note_key="gone", size=100) is None
+    assert await redis.redis.exists(f"{BLOB_PREFIX}d1") == 0
+
+
+async def test_identical_bodies_share_one_object(storage, fake_redis, minio):
+    first = await create(storage, LARGE_A)
+    second = await create(storage, LARGE_A)
+    assert len(minio.objects) == 1
+
+    assert await storage.delete_text(first, CREATOR)
+    assert len(minio.objects) == 1
+    assert await read(storage, second) == LARGE_A
+
+    assert await storage.delete_text(second, CREATOR)
+    assert minio.objects == {}
+    assert await blob_keys(fake_redis) == []
+
+
+async def test_replace_releases_old_body(storage, fake_redis, minio):
+    key = await create(storage, LARGE_A)
+    other = await create(storage, LARGE_A)
+
+    await storage.update_text(key, TextUpdateRequest(text=LARGE_B, ttl=3600, only_one_read=False), CREATOR)
+    assert await read(storage, key) == LARGE_B
+    assert await read(storage, other) == LARGE_A
+
+    await storage.update_text(key, TextUpdateRequest(text="small", ttl=3600, only_one_read=False), CREATOR)
+    assert len(minio.objects) == 1
+    assert await read(storage, other) == LARGE_A
+    assert len(await blob_keys(fake_redis)) == 1
+
+
+async def test_delete_releases_body_replaced_by_concurrent_update(storage, fake_redis, minio):
+    key = await create(storage, LARGE_A)
+    other = await create(storage, LARGE_A)
+
+    # update проходить між читанням нотатки в delete_text і її DEL
+    delete_from_redis = storage.redis_service.delete_from_redis
+
+    async def delete_after_update(k: str):
+        update = TextUpdateRequest(text=LARGE_B, ttl=3600, only_one_read=False)
+        await storage.update_text(k, update, CREATOR)
+        return await delete_from_redis(k)
+
+    storage.redis_service.delete_from_redis = delete_after_update
+    assert await storage.delete_text(key, CREATOR)
+    storage.redis_service.delete_from_redis = delete_from_redis
+
+    # Старе тіло звільнене рівно один раз (інша нотатка його ще читає), нове - не загубилось
+    assert await read(storage, other) == LARGE_A
+    assert len(minio.objects) == 1
+    [blob_key] = await blob_keys(fake_redis)
+    assert await fake_redis.hget(blob_key, "refs") == b"1"
+
+
+async def test_delete_releases_large_body_of_update_from_small(storage, fake_redis, minio):
+    key = await create(storage, "small")
+    delete_from_redis = storage.redis_service.delete_from_redis
+
+    async def delete_after_update(k: str):
+        await storage.update_text(k, TextUpdateRequest(text=LARGE_B, ttl=3600, only_one_read=False), CREATOR)
+        return await delete_from_redis(k)
+
+    storage.redis_service.delete_from_redis = delete_after_update
+    assert await storage.delete_text(key, CREATOR)
+
+    assert minio.objects == {}
+    assert await blob_keys(fake_redis) == []
+
+
+async def test_read_once_claim_releases_body(storage, fake_redis, minio):
+    key = await create(storage, LARGE_A, only_one_read=True)
+    kept = await create(storage, LARGE_A)
+
+    result = await storage.get_text(key)
+    assert LARGE_A in result.body.decode()
+    assert await storage.get_text(key) is None
+    await settle(storage)
+
+    assert len(minio.objects) == 1
+    assert await read(storage, kept) == LARGE_A
+
+    assert await storage.delete_text(kept, CREATOR)
+    assert minio.objects == {}
+    assert await blob_keys(fake_redis) == []
+
+
+async def test_read_once_stream_dropped_before_start_releases_body(storage, fake_redis, minio):
+    key = await create(storage, LARGE_A, only_one_read=True)
+    headers, chunks = await storage.get_text_stream(key)
+    response = ClosingStreamingResponse(chunks, on_close=chunks.aclose, headers=headers)
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        # Клієнт відключився ще до заголовків: тіло не почали ітерувати
+        raise OSError("connection reset")
+
+    with pytest.raises(Exception):
+        await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+    await settle(storage)
+
+    assert len(minio.released) == 1
+    assert minio.objects == {}
+    assert await blob_keys(fake_redis) == []
+
+
+async def test_streamed_note_hidden_until_upload_registered(storage, fake_redis, minio):
+    async def chunks():
+        yield LARGE_A.encode()
+
+    minio.upload_gate = asyncio.Event()
+    upload = asyncio.create_task(storage.minio_service.save_large_stream(
+        key="k1", reader=AsyncBodyReader(chunks()), ttl=3600, only_one_read=True,
+        creator=CREATOR, password=None, summary=None
+    ))
+    while not await fake_redis.exists("k1"):
+        await asyncio.sleep(0)
+
+    # Резерв не читається і не забирається як одноразова нотатка
+    assert await storage.get_text("k1") is None
+    assert await storage.redis_service.get_from_redis("k1") is None
+    assert await fake_redis.exists("k1")
+
+    minio.upload_gate.set()
+    assert await upload
+    result = await storage.get_text("k1")
+    assert LARGE_A in result.body.decode()
+    assert await storage.get_text("k1") is None
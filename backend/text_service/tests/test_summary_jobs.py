@@ -0,0 +1,34 @@
+import fakeredis
+import pytest
+
+import clients.redis_client as redis_client_module
+from clients.redis_client import RedisClient
+from config import app_settings
+from services.redis_service import RedisService
+
+STREAM = "notes:summary_jobs"
+
+
+@pytest.fixture
+async def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(redis_client_module, "create_redis_client", lambda: client)
+    yield client
+    await client.aclose()
+
+
+async def test_enqueue_carries_no_text_and_never_trims(fake_redis, monkeypatch):
+    monkeypatch.setattr(app_settings, "AUTO_SUMMARY_STREAM", STREAM)
+    monkeypatch.setattr(app_settings, "AUTO_SUMMARY_STREAM_MAXLEN", 2)
+    service = RedisService(redis_client=RedisClient())
+    for key in ("a", "b", "c"):
+        await fake_redis.hset(key, "r", b"x")
+
+    assert await service.enqueue_summaries([("a", "s"), ("b", "s"), ("gone", "s"), ("c", "s")]) == [1, 1, 0, -1]
+
+    entries = await fake_redis.xrange(STREAM)
+    assert [set(fields) for _, fields in entries] == [{b"key", b"job", b"creator"}] * 2
+    assert [fields[b"key"] for _, fields in entries] == [b"a", b"b"]
+    # Задача, що не влізла в чергу, не лишає токена в нотатці
+    assert await fake_redis.hget("c", "summary_job") is None
+    assert await fake_redis.hget("a", "summary_job") == entries[0][1][b"job"]
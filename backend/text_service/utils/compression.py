@@ -0,0 +1,87 @@
+import zstandard
+from typing import AsyncIterator
+
+from config import compression_settings
+
+# Маркер кодека зберігається в полі "codec" hash нотатки.
+# "zstd" - звичайний zstd, "zstd-d<id>" - zstd з навченим словником <id>
+CODEC_ZSTD = "zstd"
+_DICT_PREFIX = "zstd-d"
+
+
+def _load_dictionary() -> zstandard.ZstdCompressionDict | None:
+    if not compression_settings.COMPRESSION_DICT_PATH:
+        return None
+    with open(compression_settings.COMPRESSION_DICT_PATH, "rb") as f:
+        return zstandard.ZstdCompressionDict(f.read())
+
+
+_dictionary = _load_dictionary()
+_compressor = zstandard.ZstdCompressor(level=compression_settings.COMPRESSION_LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+if _dictionary is not None:
+    _dict_codec = f"{_DICT_PREFIX}{_dictionary.dict_id()}"
+    _dict_compressor = zstandard.ZstdCompressor(
+        level=compression_settings.COMPRESSION_LEVEL,
+        dict_data=_dictionary
+    )
+    _dict_decompressor = zstandard.ZstdDecompressor(dict_data=_dictionary)
+
+
+def compress(data: bytes) -> tuple[bytes, str | None]:
+    """
+    Стискає тіло нотатки. Повертає (payload, codec);
+    codec=None означає, що дані збережено як є (малий розмір або стиснення не дало виграшу).
+    """
+    if not compression_settings.COMPRESSION_ENABLED or len(data) < compression_settings.COMPRESSION_MIN_SIZE:
+        return data, None
+
+    if _dictionary is not None and len(data) <= compression_settings.COMPRESSION_DICT_MAX_SIZE:
+        compressed, codec = _dict_compressor.compress(data), _dict_codec
+    else:
+        compressed, codec = _compressor.compress(data), CODEC_ZSTD
+
+    if len(compressed) >= len(data):
+        return data, None
+    return compressed, codec
+
+
+def decompress(data: bytes, codec: str | None) -> bytes:
+    if not codec:
+        return data
+    # decompressobj, бо у фреймів з потокового завантаження немає розміру в заголовку
+    if codec == CODEC_ZSTD:
+        return _decompressor.decompressobj().decompress(data)
+    if _dictionary is not None and codec == _dict_codec:
+        return _dict_decompressor.decompressobj().decompress(data)
+    raise ValueError(f"Unknown codec {codec}")
+
+
+def stream_codec() -> str | None:
+    """Кодек для потокового завантаження: розмір невідомий, тому без словника"""
+    return CODEC_ZSTD if compression_settings.COMPRESSION_ENABLED else None
+
+
+def stream_compressor(codec: str | None):
+    if codec is None:
+        return None
+    return _compressor.compressobj()
+
+
+async def decompress_stream(chunks: AsyncIterator[bytes], codec: str | None) -> AsyncIterator[bytes]:
+    if not codec:
+        async for chunk in chunks:
+            yield chunk
+        return
+    if codec != CODEC_ZSTD:
+        raise ValueError(f"Codec {codec} can not be streamed")
+    decompressobj = _decompressor.decompressobj()
+    async for chunk in chunks:
+        data = decompressobj.decompress(chunk)
+        if data:
+            yield data
+
+
+def train_dictionary(samples: list[bytes], dict_size: int = 16 * 1024) -> bytes:
+    """Навчає словник на вибірці коротких нотаток (для COMPRESSION_DICT_PATH)"""
+    return zstandard.train_dictionary(dict_size, samples).as_bytes()
@@ -0,0 +1,15 @@
+import asyncio
+from time import perf_counter
+from typing import Awaitable, Callable
+
+
+async def probe(check: Callable[[], Awaitable], timeout: float) -> dict:
+    """Перевірка залежності для /ready: результат і затримка відповіді в мс"""
+    start = perf_counter()
+    result = {"ok": False}
+    try:
+        result["ok"] = bool(await asyncio.wait_for(check(), timeout))
+    except Exception as e:
+        result["error"] = type(e).__name__
+    result["latency_ms"] = round((perf_counter() - start) * 1000, 2)
+    return result
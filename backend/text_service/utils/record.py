@@ -0,0 +1,32 @@
+import msgpack
+
+# Компактний запис нотатки: одне поле hash "r" = заголовок (версія, прапорці) + msgpack-масив
+# значень у порядку RECORD_FIELDS, без імен полів. Ключ лишається hash-ем: поля, які читають
+# або пишуть Lua-скрипти (expiresAt, link_text, blob, summary, summary_job, etag), зберігаються поруч
+# окремими полями і при читанні мають пріоритет над "r".
+RECORD_FIELD = "r"
+RECORD_VERSION = 1
+# Нові поля лише дописуються в кінець: записи з коротшим масивом читаються без них
+RECORD_FIELDS = ("text", "creator", "size", "only_one_read", "password", "summary", "codec", "etag")
+
+# Прапорці другого байта заголовка. GET_AND_CLAIM_LUA читає їх без розбору msgpack
+FLAG_CLAIM_ON_READ = 1  # одноразова нотатка без пароля
+
+
+def pack_record(value: dict) -> tuple[bytes, dict]:
+    """Повертає (значення поля "r", решта полів для окремого зберігання)"""
+    flags = FLAG_CLAIM_ON_READ if value.get('only_one_read') and not value.get('password') else 0
+    body = msgpack.packb([value.get(field) for field in RECORD_FIELDS])
+    extra = {k: v for k, v in value.items() if k not in RECORD_FIELDS and v is not None}
+    return bytes((RECORD_VERSION, flags)) + body, extra
+
+
+def unpack_record(packed: bytes) -> dict:
+    if packed[0] != RECORD_VERSION:
+        raise ValueError(f"Unknown record version {packed[0]}")
+    # Стиснутий текст записано як bin і він повертається bytes, решта рядків - str
+    record = dict(zip(RECORD_FIELDS, msgpack.unpackb(packed[2:])))
+    # Тіло великої нотатки в MinIO: як і в старому форматі, поля text немає
+    if record['text'] is None:
+        del record['text']
+    return record
@@ -0,0 +1,35 @@
+from typing import Any, Awaitable, Callable
+
+import orjson
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON-відповідь, закодована orjson: швидше за json.dumps і одразу в bytes"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+class EncodedJSONResponse(Response):
+    """Тіло вже закодоване в JSON (див. schemas.text.encode_text_get_response): без валідації і кодування"""
+    media_type = "application/json"
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    Потокова відповідь, яка завжди викликає on_close - навіть якщо тіло не почали віддавати:
+    клієнт відключився до першого чанка або не вдалося надіслати заголовки.
+    background у цих випадках не запускається, а незапущений генератор тіла свій finally не виконає.
+    """
+
+    def __init__(self, content, on_close: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
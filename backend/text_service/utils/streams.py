@@ -0,0 +1,90 @@
+import codecs
+import hashlib
+import inspect
+from typing import AsyncIterator, Awaitable, Callable
+
+
+class AsyncBodyReader:
+    """
+    Файлоподібна обгортка над async-ітератором чанків тіла запиту.
+    read(size) віддає не більше size байтів, рахує розмір і sha256 вихідного тексту
+    і на льоту перевіряє, що тіло - валідний UTF-8.
+    Якщо передано compressor (zstd compressobj), read() віддає стиснуті байти.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], prefix: bytes = b"", compressor=None):
+        self._chunks = chunks
+        self._buffer = bytearray()
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._compressor = compressor
+        self._eof = False
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+        # Скільки байтів віддано з read(), тобто збережено
+        self.stored = 0
+        if prefix:
+            self._feed(prefix)
+
+    def _feed(self, chunk: bytes) -> None:
+        # UnicodeDecodeError піднімається одразу, до завантаження решти тіла
+        self._decoder.decode(chunk)
+        self.size += len(chunk)
+        self._sha256.update(chunk)
+        self._buffer += self._compressor.compress(chunk) if self._compressor else chunk
+
+    async def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            try:
+                chunk = await anext(self._chunks)
+            except StopAsyncIteration:
+                self._decoder.decode(b"", final=True)
+                if self._compressor:
+                    self._buffer += self._compressor.flush()
+                self._eof = True
+                break
+            if chunk:
+                self._feed(chunk)
+
+        if size < 0 or size >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        self.stored += len(data)
+        return data
+
+    @property
+    def digest(self) -> str:
+        """sha256 прочитаного тексту; повний - лише після того, як read() дійшов до кінця"""
+        return self._sha256.hexdigest()
+
+
+class ClosingStream:
+    """
+    Async-ітератор чанків з гарантованим прибиранням. Незапущений async-генератор при aclose()
+    не виконує свій finally, тож on_close викликається тут - рівно один раз, навіть якщо
+    віддачу так і не почали (клієнт відключився до першого чанка).
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], on_close: Callable[[], Awaitable[None] | None]):
+        self._chunks = chunks
+        self._on_close = on_close
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        return self._chunks.__anext__()
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self._chunks.aclose()
+        finally:
+            result = self._on_close()
+            if inspect.isawaitable(result):
+                await result
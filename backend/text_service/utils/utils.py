@@ -4,23 +4,32 @@ import hashlib
 from passlib.hash import bcrypt
 
 
-def generate_key(ttl: int) -> str:
-    ttl_length_map = {600 : 4,
-                      3600 : 5,
-                      28800 : 6,
-                      86400: 7
-                    }
+TTL_KEY_LENGTH = {600: 4,
+                  3600: 5,
+                  28800: 6,
+                  86400: 7
+                  }
 
-    alphabet = string.ascii_letters + string.digits
-    return "".join(secrets.choice(alphabet) for _ in range(ttl_length_map.get(ttl)))
+KEY_ALPHABET = string.ascii_letters + string.digits
+# Байти >= 248 відкидаються, щоб b % 62 лишався рівномірним
+_KEY_BYTE_LIMIT = 256 - 256 % len(KEY_ALPHABET)
 
 
+def generate_key(ttl: int) -> str:
+    length = TTL_KEY_LENGTH[ttl]
+    key = ""
+    while len(key) < length:
+        # Один виклик token_bytes на ключ; запас покриває відкинуті байти
+        batch = secrets.token_bytes(length + 4)
+        key += "".join(KEY_ALPHABET[b % len(KEY_ALPHABET)] for b in batch if b < _KEY_BYTE_LIMIT)
+    return key[:length]
 
 
-def hash_password(password: str) -> str:
+def hash_password(password: str, rounds: int | None = None) -> str:
     password_bytes = password.encode("utf-8")
     sha = hashlib.sha256(password_bytes).digest()  # всегда 32 байта
-    return bcrypt.hash(sha)
+    hasher = bcrypt.using(rounds=rounds) if rounds else bcrypt
+    return hasher.hash(sha)
 
 
 
@@ -28,5 +37,31 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     sha = hashlib.sha256(plain_password.encode("utf-8")).digest()
     return bcrypt.verify(sha, hashed_password)
 
+def note_etag(text_sha256: str, summary: str | None, only_one_read: bool, password: str | None) -> str | None:
+    """
+    ETag нотатки, що рахується при записі: sha256 тексту, разом із summary - sha256 від обох.
+    Одноразові нотатки і нотатки з паролем не кешуються - None.
+    Фоновий summary з ai_service замінює ETag токеном своєї задачі.
+    """
+    if only_one_read or password:
+        return None
+    if summary:
+        return hashlib.sha256(f"{text_sha256}:{summary}".encode("utf-8")).hexdigest()[:32]
+    return text_sha256[:32]
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match: "*" або ETag-и через кому; порівняння слабке (W/ ігнорується)"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == f'"{etag}"':
+            return True
+    return False
+
+
 def text_size(text: str) -> int:
     return len(text.encode("utf-8"))
\ No newline at end of file
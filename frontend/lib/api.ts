@@ -15,6 +15,7 @@ export type SaveTextOptions = {
   only_one_read?: boolean;
   password?: string;
   summary?: string;
+  auto_summary?: boolean;
 };
 
 
@@ -26,7 +27,8 @@ export async function createText(options: SaveTextOptions): Promise<{ key: strin
     ttl: options.ttl || 3600,
     only_one_read: options.only_one_read ?? false, 
     password: options.password || "",
-    summary: options.summary || ""
+    summary: options.summary || "",
+    auto_summary: options.auto_summary ?? false
   };
 
   const res = await fetch(`${TEXT_API}/`, {